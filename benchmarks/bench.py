@@ -0,0 +1,250 @@
+"""
+Benchmarks for llm-fragments-us-legislation, run over the bundled test fixtures.
+
+Reports the best-of-N wall time and the peak traced memory of each case. Save
+the results as a baseline, then compare later runs against it to catch
+regressions:
+
+    python benchmarks/bench.py
+    python benchmarks/bench.py --save baseline.json
+    python benchmarks/bench.py --compare baseline.json --threshold 0.25
+
+Timings are only comparable on the same machine; peak memory is portable.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional
+
+import httpx
+import respx
+
+import llm_fragments_us_legislation as bills
+
+FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "fixtures"
+TEXT_URL = "https://www.congress.gov/119/bills/hr1/BILLS-119hr1eh.xml"
+API_URL = "https://api.congress.gov/v3/bill/119/hr/1/text"
+
+
+class Benchmark(NamedTuple):
+    name: str
+    run: Callable[[], object]
+    setup: Optional[Callable[[], None]] = None
+    # run() returns its own elapsed seconds, e.g. measured in a subprocess
+    timed_by_run: bool = False
+
+
+class Result(NamedTuple):
+    name: str
+    seconds: float
+    peak_bytes: int
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def build_benchmarks() -> List[Benchmark]:
+    hr1 = load_fixture("hr1-119_text.xml")
+    hr1968 = load_fixture("hr1968-119_text.xml")
+    section_numbers = list(bills._section_index(hr1))
+
+    def cold_index():
+        bills._section_index.cache_clear()
+        bills._document_root.cache_clear()
+
+    def sections(count: int) -> Benchmark:
+        wanted = section_numbers[:count]
+        return Benchmark(
+            f"parse_xml_section hr1-119 ({count} section{'s' if count > 1 else ''})",
+            lambda: bills.parse_xml_section(hr1, wanted),
+            setup=cold_index,
+        )
+
+    full = bills.parse_argument("hr1-119")
+    return [
+        Benchmark("parse_argument", lambda: bills.parse_argument("hr1-119:section-1,2,3")),
+        Benchmark("parse_xml_toc hr1-119", lambda: bills.parse_xml_toc(hr1)),
+        Benchmark("parse_xml_toc hr1968-119", lambda: bills.parse_xml_toc(hr1968)),
+        sections(1),
+        sections(10),
+        sections(100),
+        Benchmark(
+            "full mode passthrough hr1-119",
+            lambda: bills._parse_content_by_mode(hr1, full),
+        ),
+        *loader_benchmarks(hr1),
+        *import_benchmarks(),
+    ]
+
+
+def import_benchmarks() -> List[Benchmark]:
+    """
+    Importing the plugin in a fresh interpreter that already imported llm,
+    which is the plugin's share of every `llm` invocation's startup.
+    """
+    code = (
+        "import time, llm\n"
+        "start = time.perf_counter()\n"
+        "import llm_fragments_us_legislation\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    # Startup with cached bytecode is what installed plugins get
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+
+    def run() -> float:
+        result = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, check=True
+        )
+        return float(result.stdout)
+
+    return [Benchmark("import plugin (after llm)", run, timed_by_run=True)]
+
+
+def loader_benchmarks(hr1: str) -> List[Benchmark]:
+    """End-to-end bill_loader runs against respx-mocked Congress.gov responses."""
+    cache_dir = Path(tempfile.mkdtemp(prefix="bill-bench-"))
+    bills.CACHE_DIR = str(cache_dir)
+    bills.CACHE_DISABLED = False
+    bills.CONGRESS_API_KEY = bills.CONGRESS_API_KEY or "bench-key"
+
+    router = respx.mock(assert_all_called=False)
+    router.get(API_URL).mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "textVersions": [
+                    {
+                        "date": "2025-05-22",
+                        "formats": [{"type": "Formatted XML", "url": TEXT_URL}],
+                    }
+                ]
+            },
+        )
+    )
+    router.get(TEXT_URL).mock(return_value=httpx.Response(200, text=hr1))
+
+    def mocked(argument: str):
+        def run():
+            with router:
+                return bills.bill_loader(argument)
+
+        return run
+
+    def empty_cache():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        bills._section_index.cache_clear()
+        bills._document_root.cache_clear()
+
+    return [
+        Benchmark("bill_loader hr1-119:toc (cold cache)", mocked("hr1-119:toc"), empty_cache),
+        Benchmark(
+            "bill_loader hr1-119:section-110101 (cold cache)",
+            mocked("hr1-119:section-110101"),
+            empty_cache,
+        ),
+        Benchmark("bill_loader hr1-119 (cold cache)", mocked("hr1-119"), empty_cache),
+        Benchmark(
+            "bill_loader hr1-119:text (cold cache)", mocked("hr1-119:text"), empty_cache
+        ),
+        Benchmark("bill_loader hr1-119:toc (warm cache)", mocked("hr1-119:toc")),
+    ]
+
+
+def measure(benchmark: Benchmark, repeat: int) -> Result:
+    """Best-of-repeat wall time, then one extra traced run for peak memory."""
+    timings = []
+    for _ in range(repeat):
+        if benchmark.setup:
+            benchmark.setup()
+        start = time.perf_counter()
+        elapsed = benchmark.run()
+        if not benchmark.timed_by_run:
+            elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+
+    if benchmark.setup:
+        benchmark.setup()
+    tracemalloc.start()
+    benchmark.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return Result(benchmark.name, min(timings), peak)
+
+
+def compare(results: List[Result], baseline: dict, threshold: float) -> List[str]:
+    """Describe every result that is worse than its baseline beyond threshold."""
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            continue
+        if result.seconds > base["seconds"] * (1 + threshold):
+            regressions.append(
+                f"{result.name}: {result.seconds * 1000:.2f} ms "
+                f"vs baseline {base['seconds'] * 1000:.2f} ms"
+            )
+        if result.peak_bytes > base["peak_bytes"] * (1 + threshold):
+            regressions.append(
+                f"{result.name}: {result.peak_bytes / 1024:.0f} KiB peak "
+                f"vs baseline {base['peak_bytes'] / 1024:.0f} KiB"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark")
+    parser.add_argument("--filter", default="", help="Only run names containing this")
+    parser.add_argument("--save", metavar="FILE", help="Write results as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="Fail on regressions vs FILE")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown / memory growth as a fraction (default 0.25)",
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    for benchmark in build_benchmarks():
+        if args.filter not in benchmark.name:
+            continue
+        result = measure(benchmark, args.repeat)
+        results.append(result)
+        print(
+            f"{result.name:<55} {result.seconds * 1000:>10.2f} ms "
+            f"{result.peak_bytes / 1024:>10.0f} KiB peak"
+        )
+
+    if args.save:
+        Path(args.save).write_text(
+            json.dumps(
+                {r.name: {"seconds": r.seconds, "peak_bytes": r.peak_bytes} for r in results},
+                indent=2,
+            )
+        )
+
+    if args.compare:
+        regressions = compare(
+            results, json.loads(Path(args.compare).read_text()), args.threshold
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
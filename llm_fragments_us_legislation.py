@@ -2,26 +2,277 @@
 Congress.gov Bill Loader Plugin for LLM
 
 This module provides functionality to load and parse bills from Congress.gov API.
-Supports full text, table of contents, and specific sections.
+Supports full text, plain text, table of contents, and specific sections.
 """
 
+from __future__ import annotations
+
+import asyncio
+import bisect
+import concurrent.futures
+import contextlib
+import contextvars
+import difflib
+import email.utils
+import functools
+import importlib.util
+import hashlib
+import html
+import http.client
+import itertools
 import json
+import logging
+import mmap
+import multiprocessing
 import os
+import random
 import re
+import socket
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
 import xml.etree.ElementTree as ET
-from typing import List, Literal, Optional, TypedDict, Union
+import zipfile
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypedDict,
+    Union,
+)
 
-import httpx
+import click
 import llm
 
 
+def _lazy_import(name: str):
+    """
+    Return a module that is only imported on first attribute access, or the
+    module itself if something imported it already.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# `llm` imports every plugin on each invocation, including ones that never
+# load a bill, and httpx takes longer to import than the rest of this module.
+# Every entry point creates its client on the calling thread before handing
+# work to other threads, so the first access never races.
+httpx = _lazy_import("httpx")
+http_server = _lazy_import("http.server")  # Only the sidecar uses it
+
+
 # Configuration
 CONGRESS_API_KEY = os.environ.get("CONGRESS_API_KEY")
 DEBUG = os.environ.get("DEBUG", "").lower() in ("1", "true", "yes")
 
+# Per-stage timings are logged at DEBUG level, and appended as JSON lines to
+# this file when set ("-" for stderr)
+TRACE_FILE = os.environ.get("BILL_TRACE_FILE")
+
+logger = logging.getLogger(__name__)
+
+# On-disk HTTP cache for API responses and bill XML
+CACHE_DIR = os.environ.get("BILL_CACHE_DIR")  # Defaults to a dir in llm.user_dir()
+CACHE_TTL = int(os.environ.get("BILL_CACHE_TTL", str(24 * 60 * 60)))
+CACHE_MAX_BYTES = int(os.environ.get("BILL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_EVICT_TO = 0.9  # Eviction frees space down to this share of CACHE_MAX_BYTES
+CACHE_SIZE_DB = "cachesize.db"  # Running size of the cache, see _add_cache_bytes
+CACHE_DISABLED = os.environ.get("BILL_CACHE_DISABLE", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+IMMUTABLE = float("inf")  # max_age for versioned text URLs
+COMPILED_SUFFIX = "#compiled"  # Cache key suffix for CompiledBill files
+RENDERED_SUFFIX = "#rendered"  # Marks versions rendered once, see _render_fragment
+
+# Full-text search over sections of fetched bills (billsearch: loader)
+SEARCH_DB = "search.db"  # Inside the cache directory
+SEARCH_RESULTS = int(os.environ.get("BILL_SEARCH_RESULTS", "10"))
+
+# Batch loading: bills in flight at once, and Congress.gov's hourly quota
+BATCH_CONCURRENCY = int(os.environ.get("BILL_BATCH_CONCURRENCY", "8"))
+MAX_BATCH_SIZE = 1000
+API_RATE_LIMIT = int(os.environ.get("BILL_API_RATE_LIMIT", "5000"))
+RATE_LIMIT_BURST = 10
+HOST_RATE_LIMITS = {"api.congress.gov": API_RATE_LIMIT / 3600}
+RATE_LIMIT_DB = "ratelimit.db"  # Inside the cache directory, see _RateLimiter
+# Worker processes parsing bills in a batch; 0 or 1 parses in threads
+PARSE_WORKERS = int(os.environ.get("BILL_PARSE_WORKERS", "0"))
+
+# Optional sidecar process that keeps rendered bills in memory for many
+# short-lived llm processes; bill_loader asks it first when this is set
+SIDECAR_SOCKET = os.environ.get("BILL_SIDECAR_SOCKET")
+SIDECAR_MAX_BYTES = int(
+    os.environ.get("BILL_SIDECAR_MAX_BYTES", str(256 * 1024 * 1024))
+)
+SIDECAR_TIMEOUT = 300.0  # Seconds to wait for the sidecar to render a bill
+
+# HTTP timeouts in seconds, and retries of network errors and 429/5xx
+# responses, after exponential backoff or the server's Retry-After
+HTTP_TIMEOUT = float(os.environ.get("BILL_HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("BILL_HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.environ.get("BILL_HTTP_RETRIES", "4"))
+RETRY_BACKOFF = 0.5  # Upper bound of the first wait, doubling on each retry
+RETRY_MAX_WAIT = 60.0  # A longer Retry-After fails the request instead
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Modes answered from Congress.gov's small JSON endpoints without ever
+# fetching the XML, and the bill endpoints each reads ("" is the bill itself)
+API_MODES = {
+    "summary": ("summaries",),
+    "meta": ("", "text"),
+    "actions": ("actions",),
+    "amendments": ("amendments",),
+    "cosponsors": ("cosponsors",),
+}
+# Endpoints listing PAGE_SIZE items per page; every page after the first is
+# fetched concurrently, at most PAGE_CONCURRENCY at once
+PAGINATED_ENDPOINTS = ("actions", "amendments", "cosponsors")
+PAGE_SIZE = 250
+PAGE_CONCURRENCY = int(os.environ.get("BILL_PAGE_CONCURRENCY", "8"))
+
 # XML namespace for USLM documents
 XML_NAMESPACE = {"uslm": "http://schemas.gpo.gov/xml/uslm"}
 
+# Rough characters-per-token ratio used to size chunks (see estimate_tokens)
+CHARS_PER_TOKEN = 4
+
+# Binary layout of CompiledBill: header, node records, section records
+_COMPILED_MAGIC = b"BILLC003"
+_COMPILED_HEADER = struct.Struct("<8s8I")
+_NODE_RECORD = struct.Struct("<Bi8I")
+_SECTION_RECORD = struct.Struct("<4I")
+_NO_SPAN = 0xFFFFFFFF
+
+# Size of the pieces fed to the XML pull parser when streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Number of parsed documents whose section index is kept in memory
+SECTION_INDEX_CACHE_SIZE = 8
+
+# Elements holding text quoted from other laws (bill DTD and USLM)
+QUOTED_CONTAINERS = ("quoted-block", "quotedContent")
+
+# Plain-text rendering (text mode). Hierarchy levels are indented, block
+# elements start a new line, anything else is treated as inline text.
+STRUCTURAL_LEVELS = (
+    "division",
+    "subdivision",
+    "title",
+    "subtitle",
+    "part",
+    "subpart",
+    "chapter",
+    "subchapter",
+    "section",
+)
+TEXT_LEVELS = STRUCTURAL_LEVELS + (
+    "subsection",
+    "paragraph",
+    "subparagraph",
+    "clause",
+    "subclause",
+    "item",
+    "subitem",
+    "subsubitem",
+    "level",
+)
+TEXT_BLOCKS = (
+    # Bill DTD
+    "congress",
+    "session",
+    "legis-num",
+    "legis-type",
+    "official-title",
+    "text",
+    "continuation-text",
+    "toc-entry",
+    "attestation-date",
+    "role",
+    # USLM
+    "docTitle",
+    "officialTitle",
+    "enactingFormula",
+    "chapeau",
+    "content",
+    "continuation",
+    "p",
+    "referenceItem",
+    "action",
+)
+TEXT_SKIPPED = (
+    "meta",
+    "preface",
+    "sidenote",
+    "page",
+    "legislativeHistory",
+    "endMarker",
+    "endorsement",
+)
+_LEVEL_PREFIXES = {
+    "division": "DIVISION",
+    "subdivision": "Subdivision",
+    "title": "TITLE",
+    "subtitle": "Subtitle",
+    "part": "PART",
+    "subpart": "Subpart",
+    "chapter": "CHAPTER",
+    "subchapter": "Subchapter",
+    "section": "SEC.",
+}
+
+_BILL_RANGE = re.compile(r"^(s|hr)(\d+)-(s|hr)(\d+)-(\d+)$")
+
+# Level selectors, e.g. "title-viii" or "subtitle-viii-a"
+_LEVEL_SPEC = re.compile(
+    r"^(division|subdivision|title|subtitle|part|subpart|chapter|subchapter)"
+    r"-([a-z0-9]+(?:-[a-z0-9]+)*)$"
+)
+
+# Text versions are named by code ("ih", "eh", "enr") or date ("2025-05-20")
+_VERSION = r"[a-z]+|\d{4}-\d{2}-\d{2}"
+_DIFF_SPEC = re.compile(rf"^diff-({_VERSION})(?:\.\.({_VERSION}))?$")
+_VERSION_CODE = re.compile(r"BILLS-\d+[a-z]+\d+([a-z]+)\.xml$", re.IGNORECASE)
+
+# GovInfo bulk-data member names, e.g. BILLS-119hr1ih.xml
+_BULK_MEMBER = re.compile(r"^BILLS-(\d+)(hr|s)(\d+)([a-z]+)\.xml$", re.IGNORECASE)
+_BULK_DATE = re.compile(
+    rb"<dc:date>(\d{4})-(\d{2})-(\d{2})|"
+    rb"<(?:action|attestation)-date[^>]*\bdate=\"(\d{4})(\d{2})(\d{2})\""
+)
+
+# "Sec. 10001. Thrifty food plan." / "Title I—Committee on Agriculture"
+_TOC_ENTRY = re.compile(
+    r"^((?:sec\.|section|division|subdivision|title|subtitle|part|subpart|chapter"
+    r"|subchapter)\s+[^\s.—]+)(?:\.\s*|\s*—\s*)(.*)$",
+    re.IGNORECASE,
+)
+_SECTION_NUMBER_PREFIX = re.compile(
+    r"^(?:Sec\.|Section)\s+([^\s.]+)|^([^\s.]+)\.", re.IGNORECASE
+)
+
+# CRS summaries are HTML: paragraphs, lists and the odd line break
+_HTML_LIST_ITEM = re.compile(r"<li\b[^>]*>", re.IGNORECASE)
+_HTML_BREAK = re.compile(r"<br\s*/?>|</(?:p|li|ul|ol|h\d)>", re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+
 
 class ParsedArgument(TypedDict):
     """Typed dictionary for parsed bill arguments."""
@@ -29,8 +280,28 @@ class ParsedArgument(TypedDict):
     bill_type: Literal["s", "hr"]
     bill_number: str
     congress: str
-    mode: Literal["full", "toc", "section"]
+    mode: Literal[
+        "full",
+        "toc",
+        "section",
+        "text",
+        "chunks",
+        "diff",
+        "json",
+        "views",
+        "summary",
+        "meta",
+        "actions",
+        "amendments",
+        "cosponsors",
+    ]
     section: Optional[List[str]]
+    level: Optional[List[str]]
+    heading: Optional[List[str]]
+    chunks: Optional[int]
+    budget: Optional[int]
+    diff: Optional[List[Optional[str]]]
+    views: Optional[List["ParsedArgument"]]
 
 
 class TOCItem(TypedDict):
@@ -39,14 +310,130 @@ class TOCItem(TypedDict):
     role: str
     designator: Optional[str]
     label: Optional[str]
+    idref: Optional[str]
+
+
+class BillNode(TypedDict):
+    """Typed dictionary for one structural level (division ... section) of a bill."""
+
+    kind: str
+    number: Optional[str]
+    heading: str
+    label: str
+    parent: Optional[int]
+    text: str
+
+
+class BillTreeNode(TypedDict):
+    """
+    Typed dictionary for one level of a bill as a nested tree (see
+    parse_xml_tree). id is the element's XML id, which TOCItem.idref points
+    at; identifier is the USLM path such as "/us/pl/119/4/s2", when present.
+    """
+
+    kind: str
+    number: Optional[str]
+    id: Optional[str]
+    identifier: Optional[str]
+    heading: str
+    label: str
+    text: str
+    children: List["BillTreeNode"]
+
+
+class BillTree(TypedDict):
+    """Typed dictionary for a whole bill: its table of contents and levels."""
+
+    toc: List[TOCItem]
+    nodes: List[BillTreeNode]
+
+
+class TraceRecord(TypedDict):
+    """
+    Typed dictionary for one timed stage of loading a bill.
+
+    Field names follow OpenTelemetry spans, so a trace hook can replay a
+    record as a span with the same ids, timestamps and attributes.
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: Optional[str]
+    start_time_ns: int
+    end_time_ns: int
+    duration_ms: float
+    attributes: dict
 
 
 @llm.hookimpl
 def register_fragment_loaders(register):
-    """Register the bill loader with the LLM framework."""
-    if not CONGRESS_API_KEY:
-        raise EnvironmentError("Missing CONGRESS_API_KEY environment variable")
+    """
+    Register the bill loader with the LLM framework. The API key is only
+    checked once a bill is loaded, so other llm commands work without it.
+    """
     register("bill", bill_loader)
+    register("billsearch", billsearch_loader)
+
+
+@llm.hookimpl
+def register_commands(cli):
+    """Register the 'llm bills' commands."""
+
+    @cli.group()
+    def bills():
+        """Manage the local cache of Congress.gov bills."""
+
+    @bills.command()
+    @click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+    def ingest(paths):
+        """
+        Load GovInfo BILLS bulk-data ZIPs or XML files into the cache.
+
+        Afterwards bill: fragments for the ingested bills are served without
+        network access. Directories are searched for .zip and .xml files.
+        """
+        try:
+            stats = ingest_bulk_data(paths)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(
+            f"Ingested {stats['versions']} text versions of {stats['bills']} bills "
+            f"({stats['bytes']} bytes), skipped {stats['skipped']} files"
+        )
+        if stats["bytes"] > CACHE_MAX_BYTES:
+            click.echo(
+                "Warning: more than BILL_CACHE_MAX_BYTES was ingested, so the "
+                "least recently used entries were evicted",
+                err=True,
+            )
+
+    bills.add_command(serve_command)
+
+
+@click.command(name="serve")
+@click.option("--socket", "socket_path", help="Unix socket to listen on")
+@click.option(
+    "--max-bytes",
+    type=int,
+    help="Memory for rendered bills (default BILL_SIDECAR_MAX_BYTES)",
+)
+def serve_command(socket_path, max_bytes):
+    """
+    Run a sidecar that loads bills for other llm processes.
+
+    Set BILL_SIDECAR_SOCKET to the printed socket path in the environment of
+    those processes. Also runs as: python -m llm_fragments_us_legislation serve
+    """
+    socket_path = socket_path or _sidecar_socket_path()
+    click.echo(f"Serving bills on {socket_path}", err=True)
+    click.echo(f"export BILL_SIDECAR_SOCKET={socket_path}", err=True)
+    try:
+        serve_sidecar(socket_path, max_bytes)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
 
 
 def parse_argument(argument: str) -> ParsedArgument:
@@ -62,8 +449,20 @@ def parse_argument(argument: str) -> ParsedArgument:
         - bill_type: 's' or 'hr'
         - bill_number: Bill number as string
         - congress: Congress number as string
-        - mode: 'full', 'toc', or 'section'
-        - section: List of section numbers (only when mode='section')
+        - mode: 'full', 'toc', 'section', 'text', 'chunks', 'diff', 'json',
+          'views', or one of API_MODES ('summary', 'meta', 'actions', ...)
+        - section: List of section numbers or "first..last" ranges (only
+          when mode='section')
+        - level: [kind, number, ...] of a level whose sections to return,
+          e.g. ['subtitle', 'viii', 'a'] (only for 'title-VIII' style specs)
+        - heading: Words the headings of the sections to return start with
+          (only for 'heading-QUERY', e.g. 'heading-work requirement')
+        - chunks: Number of fragments to split into (only for 'chunks-N')
+        - budget: Token budget per fragment (only for 'budget-N')
+        - diff: [old, new] text versions, by code or date (only for
+          'diff-OLD..NEW'); new is None for the latest version
+        - views: One ParsedArgument per view of a composite spec such as
+          'toc+section-1,2+text' (only when mode='views')
 
     Raises:
         ValueError: If bill ID format or section specification is invalid
@@ -77,12 +476,28 @@ def parse_argument(argument: str) -> ParsedArgument:
     parsed_bill = _parse_bill_id(bill_id)
     mode_info = _parse_section_spec(section_spec)
 
+    return _parsed_argument(parsed_bill, mode_info)
+
+
+def _parsed_argument(parsed_bill: dict, mode_info: dict) -> ParsedArgument:
+    """Combine a parsed bill ID and section specification."""
+    views = mode_info.get("views")
     return ParsedArgument(
         bill_type=parsed_bill["type"],
         bill_number=parsed_bill["number"],
         congress=parsed_bill["congress"],
         mode=mode_info["mode"],
         section=mode_info.get("sections"),
+        level=mode_info.get("level"),
+        heading=mode_info.get("heading"),
+        chunks=mode_info.get("chunks"),
+        budget=mode_info.get("budget"),
+        diff=mode_info.get("diff"),
+        views=(
+            None
+            if views is None
+            else [_parsed_argument(parsed_bill, view) for view in views]
+        ),
     )
 
 
@@ -111,17 +526,65 @@ def _parse_section_spec(section_spec: Optional[str]) -> dict:
     if section_spec is None:
         return {"mode": "full"}
 
+    if "+" in section_spec:
+        views = [_parse_section_spec(spec) for spec in section_spec.split("+")]
+        if any(view["mode"] == "diff" for view in views):
+            raise ValueError(
+                f"Invalid section specification: '{section_spec}'. "
+                "A diff cannot be combined with other views"
+            )
+        api_modes = [view["mode"] for view in views if view["mode"] in API_MODES]
+        if api_modes:
+            raise ValueError(
+                f"Invalid section specification: '{section_spec}'. "
+                f"'{api_modes[0]}' cannot be combined with other views"
+            )
+        return {"mode": "views", "views": views}
+
     if section_spec == "toc":
         return {"mode": "toc"}
 
+    if section_spec == "text":
+        return {"mode": "text"}
+
+    if section_spec == "json":
+        return {"mode": "json"}
+
+    if section_spec in API_MODES:
+        return {"mode": section_spec}
+
+    chunk_match = re.match(r"^(chunks|budget)-(\d+)$", section_spec)
+    if chunk_match and int(chunk_match.group(2)) > 0:
+        return {"mode": "chunks", chunk_match.group(1): int(chunk_match.group(2))}
+
     if section_spec.startswith("section-"):
         section_part = section_spec.removeprefix("section-")
         sections = [s.strip() for s in section_part.split(",")]
-        return {"mode": "section", "sections": sections}
+        if all(s and "" not in s.split("..", 1) for s in sections):
+            return {"mode": "section", "sections": sections}
+
+    level_match = _LEVEL_SPEC.match(section_spec)
+    if level_match:
+        kind, path = level_match.groups()
+        return {"mode": "section", "level": [kind, *path.split("-")]}
+
+    if section_spec.startswith("heading-"):
+        words = _heading_words(section_spec.removeprefix("heading-"))
+        if words:
+            return {"mode": "section", "heading": words}
+
+    diff_match = _DIFF_SPEC.match(section_spec)
+    if diff_match:
+        return {"mode": "diff", "diff": list(diff_match.groups())}
 
     raise ValueError(
         f"Invalid section specification: '{section_spec}'. "
-        "Supported formats: 'toc', 'section-1', 'section-1,2,3'"
+        "Supported formats: 'toc', 'text', 'json', 'summary', 'meta', 'actions', "
+        "'amendments', 'cosponsors', 'section-1', 'section-1,2,3', "
+        "'section-80101..80151', 'title-viii', 'subtitle-viii-a', "
+        "'heading-medicaid', 'chunks-4', "
+        "'budget-50000', 'diff-ih..eh', 'diff-2025-05-20', or several joined "
+        "with '+' ('toc+section-1+text')"
     )
 
 
@@ -182,7 +645,7 @@ def parse_xml_toc2(xml_content: str) -> str:
     return "\n".join(toc_lines)
 
 
-def parse_xml_toc(xml_content: str) -> str:
+def parse_xml_toc(xml_content: Union[str, bytes]) -> str:
     """
     Parse the table of contents from bill XML and return as formatted string.
 
@@ -192,14 +655,48 @@ def parse_xml_toc(xml_content: str) -> str:
     Returns:
         Formatted string containing the table of contents
     """
-    root = ET.fromstring(xml_content)
-    # Try namespaced toc first, then fallback to non-namespaced toc
-    toc_element = root.find(".//uslm:toc", XML_NAMESPACE)
-    if toc_element is None:
-        toc_element = root.find(".//toc")
-    if toc_element is None:
-        raise ValueError("No table of contents found in this bill.")
+    return stream_xml_toc(_iter_chunks(xml_content))
+
 
+def stream_xml_toc(chunks: Iterable[Union[str, bytes]]) -> str:
+    """
+    Extract the table of contents from a stream of XML chunks.
+
+    Parsing stops as soon as the <toc> element closes, so the body of the
+    bill is never parsed (or, when streaming from the network, downloaded).
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    toc_depth = 0
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            is_toc = _localname(element.tag) == "toc" and _is_toc_tag(element.tag)
+            if event == "start":
+                toc_depth += is_toc
+            elif is_toc:
+                toc_depth -= 1
+                if toc_depth == 0:
+                    return _format_toc(element)
+            elif toc_depth == 0:
+                element.clear()
+
+    parser.close()
+    raise ValueError("No table of contents found in this bill.")
+
+
+def _is_toc_tag(tag: str) -> bool:
+    """Whether tag is a USLM-namespaced or un-namespaced <toc>."""
+    return tag in ("toc", "{%s}toc" % XML_NAMESPACE["uslm"])
+
+
+def _is_bill_tag(tag: str) -> bool:
+    """Whether tag belongs to the bill DTD or USLM (not e.g. Dublin Core)."""
+    return "}" not in tag or tag.startswith("{%s}" % XML_NAMESPACE["uslm"])
+
+
+def _format_toc(toc_element: ET.Element) -> str:
+    """Format a <toc> element as plain text lines."""
     toc_lines = ["TABLE OF CONTENTS", "=" * 18, ""]
 
     # Try namespaced referenceItem, then fallback to non-namespaced toc-entry
@@ -244,197 +741,4054 @@ def parse_xml_toc(xml_content: str) -> str:
     return "\n".join(toc_lines)
 
 
-def parse_xml_section(xml_content: str, sections: list[str]) -> str:
+def parse_xml_section(xml_content: Union[str, bytes], sections: list[str]) -> str:
     """
     Parse specific sections from bill XML and return plain text.
-    Looks for <section> elements that start with "Sec. XXX", "Section XXX", or "XXX.".
+
+    Sections are looked up in a per-document index (see _section_index), so
+    asking the same bill for many sections costs one parse, not one full
+    scan per section. A number selects every section with that number, as
+    numbering restarts in each division of some omnibus bills. Sections
+    are returned in document order.
     """
-    root = ET.fromstring(xml_content)
-    found = []
-
-    # Helper function to get tag name without namespace
-    def localname(tag):
-        return tag.split("}")[-1] if "}" in tag else tag
-
-    section_patterns = []
-    for section_num in sections:
-        patterns = [
-            rf"^Sec\.\s+{re.escape(section_num)}\b",
-            rf"^Section\s+{re.escape(section_num)}\b",
-            rf"^{re.escape(section_num)}\.",
-        ]
-        section_patterns.append((section_num, patterns))
+    found = sorted(set(_select_entries(_section_index(xml_content), sections)))
+    return "\n\n".join(
+        ET.tostring(element, encoding="unicode", method="text")
+        for _, element in found
+    )
 
-    for element in root.iter():
-        if localname(element.tag) != "section":
-            continue
 
-        section_text = ET.tostring(element, encoding="unicode", method="text")
-        found_match = False
-        for section_num, patterns in section_patterns:
-            for pattern in patterns:
-                if re.search(pattern, section_text, re.IGNORECASE):
-                    found.append(section_text)
-                    found_match = True
-                    break
-            if found_match:
-                break
-
-    if len(found) < len(sections):
-        found_section_nums = []
-        for text in found:
-            match = re.search(
-                r"^(?:Sec\.|Section)\s+(\S+)|^(\S+)\.", text, re.IGNORECASE
-            )
-            if match:
-                found_section_nums.append(match.group(1) or match.group(2))
-
-        missing = set(sections) - set(found_section_nums)
+def _select_entries(index: dict[str, list], sections: List[str]) -> list:
+    """
+    Look up the requested sections in an index of section number -> entries
+    in document order (see _section_index), returning the entries of all.
+    "N" selects every section numbered N, "N@K" only the K-th of them (see
+    _OutlineIndex.key).
+
+    Raises:
+        ValueError: If any requested section is not in the index
+    """
+    selected = []
+    missing = []
+    for section in sections:
+        number, _, occurrence = section.lower().partition("@")
+        entries = index.get(number, [])
+        if occurrence:
+            k = int(occurrence) if occurrence.isdigit() else 0
+            entries = entries[k - 1 : k] if k > 0 else []
+        if not entries:
+            missing.append(section)
+        selected.extend(entries)
+    if missing:
         raise ValueError(f"Not all sections found. Missing: {', '.join(missing)}")
+    return selected
 
-    return "\n\n".join(found)
 
+def stream_xml_sections(chunks: Iterable[Union[str, bytes]], sections: list[str]) -> str:
+    """
+    Extract specific sections from a stream of XML chunks.
 
-def bill_loader(argument: str) -> llm.Fragment:
+    Each top-level <section> is cleared once it has been checked, so memory
+    stays bounded by the largest section rather than the whole bill. As in
+    parse_xml_section, every section with a requested number is returned,
+    so the whole document is read. Quoted sections are only used for
+    numbers the bill itself lacks.
     """
-    Load bill text from Congress.gov API.
+    wanted = {s.lower() for s in sections}
+    found: dict[str, List[tuple[int, str]]] = {}
+    quoted_found: dict[str, List[tuple[int, str]]] = {}
 
-    Args:
-        argument: Bill ID in format [type][number]-[congress][:mode]
-                 Examples: "hr1-119", "s1046-119:toc"
+    parser = ET.XMLPullParser(events=("start", "end"))
+    open_sections: list[int] = []
+    quoted_depth = 0
+    position = 0
 
-    Returns:
-        llm.Fragment containing the requested bill content
+    def collect():
+        nonlocal quoted_depth, position
+        for event, element in parser.read_events():
+            name = _localname(element.tag)
+            if event == "start":
+                if name == "section":
+                    open_sections.append(position)
+                    position += 1
+                elif name in QUOTED_CONTAINERS:
+                    quoted_depth += 1
+                continue
 
-    Raises:
-        ValueError: If bill text is not available or argument format is invalid
-        httpx.HTTPStatusError: If API request fails
-    """
-    parsed_argument = parse_argument(argument)
+            if name in QUOTED_CONTAINERS:
+                quoted_depth -= 1
+            elif name == "section":
+                section_position = open_sections.pop()
+                number = _section_number(element)
+                if number in wanted:
+                    target = quoted_found if quoted_depth else found
+                    target.setdefault(number, []).append(
+                        (
+                            section_position,
+                            ET.tostring(element, encoding="unicode", method="text"),
+                        )
+                    )
+            if not open_sections:
+                element.clear()
 
-    with httpx.Client() as client:
-        bill_data = _fetch_bill_data(client, parsed_argument, argument)
-        return _process_bill_content(client, bill_data, parsed_argument, argument)
+    for chunk in chunks:
+        parser.feed(chunk)
+        collect()
+    parser.close()
+    collect()
+    _count("sections_scanned", position)
 
+    for number, entries in quoted_found.items():
+        found.setdefault(number, entries[:1])
 
-def _fetch_bill_data(
-    client: httpx.Client, parsed_argument: ParsedArgument, argument: str
-) -> dict:
-    """Fetch bill metadata from Congress.gov API."""
-    api_url = (
-        f"https://api.congress.gov/v3/bill/"
-        f"{parsed_argument['congress']}/{parsed_argument['bill_type']}/"
-        f"{parsed_argument['bill_number']}/text"
-        f"?api_key={CONGRESS_API_KEY}"
+    return "\n\n".join(
+        text for _, text in sorted(set(_select_entries(found, sections)))
     )
 
-    try:
-        response = client.get(api_url)
-        response.raise_for_status()
-        data = response.json()
 
-        _debug_save_response(data, f"{argument}_api.json")
-        return data
+def parse_xml_text(xml_content: Union[str, bytes]) -> str:
+    """
+    Render bill XML as structured plain text.
 
-    except httpx.HTTPStatusError as e:
-        raise ValueError(f"Failed to fetch bill {argument}: {e}") from e
+    Headings keep their designations ("SEC. 10001. Thrifty food plan."),
+    nested levels are indented two spaces per level, and markup, processing
+    instructions and marginal notes are dropped. Works for both bill DTD and
+    USLM documents.
+    """
+    return stream_xml_text(_iter_chunks(xml_content))
 
 
-def _process_bill_content(
-    client: httpx.Client,
-    bill_data: dict,
-    parsed_argument: ParsedArgument,
-    argument: str,
-) -> llm.Fragment:
-    """Process bill data and return content based on requested mode."""
-    text_versions = bill_data.get("textVersions", [])
-    if not text_versions:
-        raise ValueError(f"No text versions available for bill {argument}")
+def stream_xml_text(chunks: Iterable[Union[str, bytes]]) -> str:
+    """
+    Render a stream of XML chunks as plain text in a single pass.
 
-    # Get most recent version with XML format
-    xml_url = _find_latest_xml_url(text_versions)
-    if not xml_url:
-        raise ValueError(f"No XML text format available for bill {argument}")
+    Each outermost level or block is rendered and cleared as soon as it
+    closes, so memory stays bounded by the largest top-level element.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    renderer = _TextRenderer()
+    unit_depth = 0
 
-    return _fetch_and_parse_content(client, xml_url, parsed_argument, argument)
+    def render_events():
+        nonlocal unit_depth
+        for event, element in parser.read_events():
+            name = _localname(element.tag)
+            is_unit = name in TEXT_LEVELS or name in TEXT_BLOCKS or name in TEXT_SKIPPED
+            if event == "start":
+                unit_depth += is_unit
+                continue
+            if is_unit:
+                unit_depth -= 1
+                if unit_depth == 0:
+                    renderer.render(element, depth=0)
+            if unit_depth == 0:
+                element.clear()
 
+    for chunk in chunks:
+        parser.feed(chunk)
+        render_events()
+    parser.close()
+    render_events()
 
-def _find_latest_xml_url(text_versions: List[dict]) -> Optional[str]:
-    """Find XML format URL from the most recent text version."""
-    # Sort versions by date (most recent first)
-    sorted_versions = sorted(
-        text_versions, key=lambda x: x.get("date") or "", reverse=True
-    )
+    return renderer.result()
 
-    # Find XML format in most recent versions
-    for version in sorted_versions:
-        xml_url = _extract_xml_url(version)
-        if xml_url:
-            return xml_url
 
-    return None
+def _tree_toc(root: ET.Element) -> str:
+    """Format the table of contents of an already parsed bill, like parse_xml_toc."""
+    for element in root.iter():
+        if _is_toc_tag(element.tag):
+            return _format_toc(element)
+    raise ValueError("No table of contents found in this bill.")
 
 
-def _extract_xml_url(version: dict) -> Optional[str]:
-    """Extract XML format URL from a version dictionary."""
-    for format_info in version.get("formats", []):
-        if format_info.get("type") == "Formatted XML":
-            return format_info.get("url")
+def _tree_text(root: ET.Element) -> str:
+    """Render an already parsed bill as plain text, like parse_xml_text."""
+    renderer = _TextRenderer()
+
+    def render_units(element: ET.Element):
+        name = _localname(element.tag)
+        if name in TEXT_LEVELS or name in TEXT_BLOCKS or name in TEXT_SKIPPED:
+            renderer.render(element, depth=0)
+        else:
+            for child in element:
+                render_units(child)
+
+    render_units(root)
+    return renderer.result()
+
+
+class _TextRenderer:
+    """Accumulates indented plain-text lines for parse_xml_text."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.buffer: List[str] = []
+        self.buffer_depth = 0
+        self.label_pending = False
+
+    def result(self) -> str:
+        self.flush()
+        return "\n".join(self.lines).strip("\n") + "\n"
+
+    def flush(self) -> None:
+        """Emit the pending inline text as one indented line."""
+        text = _collapse_whitespace("".join(self.buffer))
+        self.buffer = []
+        self.label_pending = False
+        if text:
+            self.lines.append("  " * self.buffer_depth + text)
+
+    def write(self, text: Optional[str], depth: int) -> None:
+        """Append inline text, starting a line at depth if none is pending."""
+        if not text:
+            return
+        if not self.buffer:
+            self.buffer_depth = depth
+        self.buffer.append(text)
+        self.label_pending = self.label_pending and not text.strip()
+
+    def render(self, element: ET.Element, depth: int) -> None:
+        name = _localname(element.tag)
+        if name in TEXT_SKIPPED or element.get("display") == "no":
+            return
+
+        if name in TEXT_LEVELS:
+            self.flush()
+            if name in STRUCTURAL_LEVELS and self.lines and self.lines[-1]:
+                self.lines.append("")
+            self.write(_level_label(element, name), depth)
+            if name in STRUCTURAL_LEVELS:
+                self.flush()
+            else:
+                # Keep the label pending so the first block of text joins it:
+                # "(a) In general.—The Secretary shall ..."
+                self.label_pending = True
+            self.render_children(element, depth + 1, skip_labels=True)
+            self.flush()
+        elif name in TEXT_BLOCKS:
+            if not self.label_pending:
+                self.flush()
+            if name == "referenceItem":
+                self.write(_reference_item_text(element), depth)
+            else:
+                self.write(element.text, depth)
+                self.render_children(element, depth, skip_labels=False)
+            self.flush()
+        elif name in QUOTED_CONTAINERS:
+            self.flush()
+            first_line = len(self.lines)
+            self.write(element.text, depth + 1)
+            self.render_children(element, depth + 1, skip_labels=False)
+            self.flush()
+            if name == "quoted-block" and len(self.lines) > first_line:
+                # The bill DTD leaves quotation marks to the stylesheet
+                indent, text = _split_indent(self.lines[first_line])
+                self.lines[first_line] = f"{indent}\u201c{text}"
+                self.lines[-1] += "\u201d"
+        elif name == "after-quoted-block" and self.lines:
+            self.lines[-1] += _inline_text(element)
+        elif name == "quote":
+            self.write("\u201c", depth)
+            self.write(element.text, depth)
+            self.render_children(element, depth, skip_labels=False)
+            self.write("\u201d", depth)
+        else:
+            self.write(element.text, depth)
+            self.render_children(element, depth, skip_labels=False)
+
+    def render_children(
+        self, element: ET.Element, depth: int, skip_labels: bool
+    ) -> None:
+        for child in element:
+            if not (skip_labels and _localname(child.tag) in _LABEL_ELEMENTS):
+                self.render(child, depth)
+            self.write(child.tail, depth)
+
+
+_LABEL_ELEMENTS = ("enum", "num", "header", "heading")
+
+
+def _level_label(element: ET.Element, name: str) -> str:
+    """
+    Build a level's heading line from <enum>/<header> (bill DTD), whose
+    designations are bare ("10001.", "I"), or <num>/<heading> (USLM), whose
+    designations are already written out ("SEC. 3105. ", "TITLE I—").
+    """
+    number = heading = ""
+    uslm = False
+    for child in element:
+        child_name = _localname(child.tag)
+        if child_name in ("enum", "num") and not number:
+            number = _inline_text(child)
+            uslm = uslm or child_name == "num"
+        elif child_name in ("header", "heading") and not heading:
+            heading = _inline_text(child)
+
+    if not number and not heading:
+        return ""
+    if uslm:
+        return _join_designation(number, heading) + " "
+
+    if name == "section":
+        return f"SEC. {number} {heading}.".strip() + " " if heading else f"SEC. {number} "
+    if name in _LEVEL_PREFIXES:
+        prefix = _LEVEL_PREFIXES[name]
+        if prefix.isupper():
+            heading = heading.upper()
+        label = f"{prefix} {number}".strip()
+        return f"{label}—{heading}" if heading else label
+    if heading:
+        return f"{number} {heading}.—"
+    return f"{number} "
+
+
+def _reference_item_text(element: ET.Element) -> str:
+    """Render a USLM <referenceItem> TOC entry as "designator label"."""
+    designator = label = ""
+    for child in element:
+        child_name = _localname(child.tag)
+        if child_name == "designator":
+            designator = _inline_text(child)
+        elif child_name == "label":
+            label = _inline_text(child)
+    return _join_designation(designator, label)
+
+
+def _inline_text(element: ET.Element) -> str:
+    """Collect an element's text, leaving out page breaks and margin notes."""
+    parts = [element.text or ""]
+    for child in element:
+        if _localname(child.tag) not in TEXT_SKIPPED:
+            parts.append(_inline_text(child))
+        parts.append(child.tail or "")
+    return _collapse_whitespace("".join(parts))
+
+
+def _join_designation(designation: str, heading: str) -> str:
+    """Join "TITLE I—" / "SEC. 3." style designations to their headings."""
+    designation = designation.strip()
+    separator = "" if designation.endswith("—") else " "
+    return (designation + separator + heading).strip()
+
+
+def _split_indent(line: str) -> tuple[str, str]:
+    """Split a rendered line into its indentation and text."""
+    text = line.lstrip(" ")
+    return line[: len(line) - len(text)], text
+
+
+def _collapse_whitespace(text: str) -> str:
+    """Normalize whitespace and typesetting characters to single spaces."""
+    return " ".join(text.replace("\u00ad", "").split())
+
+
+def _iter_chunks(
+    content: Union[str, bytes],
+) -> Iterator[Union[str, bytes, memoryview]]:
+    """
+    Split in-memory content into STREAM_CHUNK_SIZE pieces for a pull parser.
+    Bytes are sliced through a memoryview, so no piece is copied.
+    """
+    view = memoryview(content) if isinstance(content, bytes) else content
+    for start in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield view[start : start + STREAM_CHUNK_SIZE]
+
+
+def _localname(tag) -> str:
+    """Return an element's tag name without its namespace."""
+    if not isinstance(tag, str):
+        return ""
+    return tag.split("}")[-1] if "}" in tag else tag
+
+
+@functools.lru_cache(maxsize=SECTION_INDEX_CACHE_SIZE)
+def _document_root(xml_content: Union[str, bytes]) -> ET.Element:
+    """Parse a bill once for both its section index and its outline."""
+    return ET.fromstring(xml_content)
+
+
+@functools.lru_cache(maxsize=SECTION_INDEX_CACHE_SIZE)
+def _section_index(
+    xml_content: Union[str, bytes],
+) -> dict[str, List[tuple[int, ET.Element]]]:
+    """
+    Map each section number in a bill to the (document position, <section>)
+    of every section with that number, in document order.
+
+    Built in one pass over the tree and memoized per document. Sections of
+    the bill itself take precedence over same-numbered sections quoted from
+    other laws inside amendments; of those, only the first is kept, for
+    numbers the bill itself lacks.
+    """
+    root = _document_root(xml_content)
+    index: dict[str, List[tuple[int, ET.Element]]] = {}
+    quoted_index: dict[str, List[tuple[int, ET.Element]]] = {}
+
+    position = -1
+    for position, (element, quoted) in enumerate(_iter_sections(root)):
+        number = _section_number(element)
+        if not number:
+            continue
+        target = quoted_index if quoted else index
+        target.setdefault(number, []).append((position, element))
+
+    for number, entries in quoted_index.items():
+        index.setdefault(number, entries[:1])
+    _count("sections_scanned", position + 1)
+    return index
+
+
+def _iter_sections(element: ET.Element, quoted: bool = False):
+    """Yield (section, is_quoted) for every <section> below element."""
+    for child in element:
+        name = _localname(child.tag)
+        if name == "section":
+            yield child, quoted
+        yield from _iter_sections(child, quoted or name in QUOTED_CONTAINERS)
+
+
+def _section_number(section: ET.Element) -> Optional[str]:
+    """
+    Extract a section's number from <num value="..."> (USLM) or <enum>
+    (bill DTD), falling back to the "Sec. N" / "N." text prefix.
+    """
+    for child in section:
+        name = _localname(child.tag)
+        if name == "num" and child.get("value"):
+            return child.get("value").strip().lower()
+        if name in ("num", "enum") and child.text:
+            number = _SECTION_NUMBER_PREFIX.match(clean_text(child.text))
+            if number:
+                return (number.group(1) or number.group(2)).lower()
+
+    text = clean_text("".join(itertools.islice(section.itertext(), 4)))
+    number = _SECTION_NUMBER_PREFIX.match(text)
+    if number:
+        return (number.group(1) or number.group(2)).lower()
     return None
 
 
-def _fetch_and_parse_content(
-    client: httpx.Client, text_url: str, parsed_argument: ParsedArgument, argument: str
-) -> llm.Fragment:
-    """Fetch XML content and parse according to specified mode."""
-    try:
-        response = client.get(text_url)
-        response.raise_for_status()
-        xml_content = response.text
+@functools.lru_cache(maxsize=SECTION_INDEX_CACHE_SIZE)
+def _outline_index(xml_content: Union[str, bytes]) -> "_OutlineIndex":
+    """Memoized _OutlineIndex of a bill's XML (see _outline_nodes)."""
+    return _OutlineIndex(_outline_nodes(_document_root(xml_content)))
 
-        _debug_save_response(xml_content, f"{argument}_text.xml")
 
-        # Process content based on mode
-        content, source_suffix = _parse_content_by_mode(xml_content, parsed_argument)
+def _outline_nodes(root: ET.Element) -> List[BillNode]:
+    """
+    Structural levels of a parsed bill, numbered and headed like
+    parse_xml_structure but without labels or text, which makes this a
+    cheap walk.
+    """
+    nodes: List[BillNode] = []
 
-        return llm.Fragment(content=content, source=text_url + source_suffix)
+    def walk(element: ET.Element, parent: Optional[int]):
+        for child in element:
+            name = _localname(child.tag)
+            if name in QUOTED_CONTAINERS:
+                continue
+            if name in STRUCTURAL_LEVELS and _is_bill_tag(child.tag):
+                number = heading = None
+                for label in child:
+                    label_name = _localname(label.tag)
+                    if label_name in ("enum", "num") and number is None:
+                        number = _level_number(label)
+                    elif label_name in ("header", "heading") and heading is None:
+                        heading = _inline_text(label)
+                nodes.append(
+                    BillNode(
+                        kind=name,
+                        number=number,
+                        heading=heading or "",
+                        label="",
+                        parent=parent,
+                        text="",
+                    )
+                )
+                walk(child, len(nodes) - 1)
+            else:
+                walk(child, parent)
 
-    except httpx.HTTPStatusError as e:
-        raise ValueError(f"Failed to fetch bill text from {text_url}: {e}") from e
+    walk(root, None)
+    return nodes
 
 
-def _parse_content_by_mode(
-    xml_content: str, parsed_argument: ParsedArgument
-) -> tuple[str, str]:
-    """Parse XML content according to the specified mode."""
-    mode = parsed_argument["mode"]
+class _OutlineIndex:
+    """
+    Sorted index of a bill's sections for range, level and heading selectors.
 
-    if mode == "full":
-        return xml_content, "#full"
+    Section numbers are kept in natural order ("9" < "10" < "10a"), so a
+    range is two binary searches. Each numbered level (title, subtitle,
+    division, ...) maps to the contiguous run of sections it contains,
+    returned as keys that stay unique when numbering restarts in each
+    division (see key). The
+    words of each section's heading and its enclosing levels' headings are
+    kept sorted too, so a word prefix is also found by binary search.
+    """
 
-    elif mode == "toc":
-        return parse_xml_toc(xml_content), "#toc"
+    __slots__ = (
+        "numbers",
+        "occurrences",
+        "positions",
+        "keys",
+        "sorted_numbers",
+        "levels",
+        "words",
+    )
 
-    elif mode == "section":
-        sections = parsed_argument["section"] or []
-        content = parse_xml_section(xml_content, sections)
-        return content, f"#section-{','.join(sections)}"
+    def __init__(self, nodes: List[BillNode]):
+        # Sections in document order, each level's first/last section, and
+        # (word, section position) for the words of the headings above it
+        self.numbers: List[str] = []
+        spans: dict[int, List[int]] = {}
+        words: set[tuple[str, int]] = set()
+        for index, node in enumerate(nodes):
+            if node["kind"] != "section" or not node["number"]:
+                continue
+            position = len(self.numbers)
+            self.numbers.append(node["number"])
+            ancestors = _ancestors(nodes, node)
+            for ancestor in ancestors:
+                spans.setdefault(ancestor, [position, position])[1] = position
+            for headed in [index, *ancestors]:
+                words.update(
+                    (word, position)
+                    for word in _heading_words(nodes[headed]["heading"])
+                )
+        self.words = sorted(words)
 
-    else:
-        raise ValueError(f"Unknown mode: {mode}")
+        self._number_positions()
+        ordered = sorted(self.positions, key=_section_sort_key)
+        self.keys = [_section_sort_key(number) for number in ordered]
+        self.sorted_numbers = ordered
 
+        # (kind, number) -> [(enclosing level numbers, first, last)]
+        self.levels: dict[tuple[str, str], List[tuple[tuple, int, int]]] = {}
+        for index, (first, last) in spans.items():
+            node = nodes[index]
+            if node["number"]:
+                enclosing = tuple(nodes[i]["number"] for i in _ancestors(nodes, node))
+                self.levels.setdefault((node["kind"], node["number"]), []).append(
+                    (enclosing, first, last)
+                )
 
-def _debug_save_response(data: Union[dict, str], filename: str) -> None:
-    """Save API response to file if DEBUG mode is enabled."""
-    if not DEBUG:
-        return
+    def dump(self) -> dict:
+        """JSON-serializable form of the index, see load."""
+        return {
+            "numbers": self.numbers,
+            "sorted_numbers": self.sorted_numbers,
+            "levels": [
+                [kind, number, list(enclosing), first, last]
+                for (kind, number), spans in self.levels.items()
+                for enclosing, first, last in spans
+            ],
+            "words": self.words,
+        }
 
-    os.makedirs("debug-responses", exist_ok=True)
-    filepath = os.path.join("debug-responses", filename)
+    @classmethod
+    def load(cls, data: dict) -> "_OutlineIndex":
+        """Rebuild an index from dump() without walking nodes or sorting."""
+        index = cls.__new__(cls)
+        index.numbers = data["numbers"]
+        index._number_positions()
+        index.sorted_numbers = data["sorted_numbers"]
+        index.keys = [_section_sort_key(number) for number in index.sorted_numbers]
+        index.levels = {}
+        for kind, number, enclosing, first, last in data["levels"]:
+            index.levels.setdefault((kind, number), []).append(
+                (tuple(enclosing), first, last)
+            )
+        index.words = [(word, position) for word, position in data["words"]]
+        return index
 
-    if isinstance(data, str):
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(data)
-    else:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+    def _number_positions(self) -> None:
+        """
+        Index each number's first position and each section's occurrence of
+        its number (1-based, 0 when the number is unique in the bill).
+        """
+        counts: dict[str, int] = {}
+        for number in self.numbers:
+            counts[number] = counts.get(number, 0) + 1
+        self.positions: dict[str, int] = {}
+        self.occurrences: List[int] = []
+        seen: dict[str, int] = {}
+        for position, number in enumerate(self.numbers):
+            self.positions.setdefault(number, position)
+            seen[number] = seen.get(number, 0) + 1
+            self.occurrences.append(seen[number] if counts[number] > 1 else 0)
+
+    def key(self, position: int) -> str:
+        """
+        Key selecting the section at position through _select_entries: its
+        number, qualified as "N@K" (its K-th occurrence) when numbering
+        restarts and the number repeats.
+        """
+        occurrence = self.occurrences[position]
+        number = self.numbers[position]
+        return f"{number}@{occurrence}" if occurrence else number
+
+    def range(self, start: str, end: str) -> List[str]:
+        """Sections numbered start through end, in document order."""
+        low = bisect.bisect_left(self.keys, _section_sort_key(start))
+        high = bisect.bisect_right(self.keys, _section_sort_key(end))
+        numbers = sorted(self.sorted_numbers[low:high], key=self.positions.__getitem__)
+        if not numbers:
+            raise ValueError(f"No sections found in range {start}..{end}")
+        return numbers
+
+    def level(self, selector: List[str]) -> List[str]:
+        """
+        Sections inside a level, e.g. ["title", "viii"] or, qualified by
+        enclosing levels' numbers, ["subtitle", "viii", "a"].
+        """
+        kind, *path = selector
+        *outer, number = path
+        matches = [
+            (enclosing, first, last)
+            for enclosing, first, last in self.levels.get((kind, number), [])
+            if len(outer) <= len(enclosing)
+            and list(enclosing[len(enclosing) - len(outer) :]) == outer
+        ]
+        name = "-".join(selector)
+        if not matches:
+            raise ValueError(f"No {kind} '{name}' found in this bill")
+        if len(matches) > 1:
+            enclosing = [n or "?" for n in matches[0][0][-len(path) :]]
+            example = "-".join([kind, *enclosing, number])
+            raise ValueError(
+                f"'{name}' matches {len(matches)} {kind}s. Qualify it with the "
+                f"numbers of enclosing levels, e.g. '{example}'"
+            )
+        _, first, last = matches[0]
+        return [self.key(position) for position in range(first, last + 1)]
+
+    def headings(self, query: List[str]) -> List[str]:
+        """
+        Sections where every query word starts a word of the section's
+        heading or of a heading enclosing it, in document order, as keys
+        (see key) so a repeated number selects only the matching section.
+        """
+        matches: Optional[set[int]] = None
+        for prefix in query:
+            found = set()
+            i = bisect.bisect_left(self.words, (prefix,))
+            while i < len(self.words) and self.words[i][0].startswith(prefix):
+                found.add(self.words[i][1])
+                i += 1
+            matches = found if matches is None else matches & found
+        if not matches:
+            raise ValueError(f"No section headings match '{' '.join(query)}'")
+        return [self.key(position) for position in sorted(matches)]
+
+
+def _heading_words(text: str) -> List[str]:
+    """Lowercase words of a heading or heading query, for _OutlineIndex.headings."""
+    return re.findall(r"\w+", text.casefold())
+
+
+def _section_sort_key(number: str) -> tuple:
+    """Natural sort key: "10a" -> ((0, 10), (1, "a"))."""
+    return tuple(
+        (0, int(part)) if part.isdecimal() else (1, part)
+        for part in re.findall(r"\d+|\D+", number.lower())
+    )
+
+
+def parse_xml_structure(xml_content: Union[str, bytes]) -> List[BillNode]:
+    """
+    Parse the structural outline of a bill: its divisions, titles, subtitles,
+    parts, chapters and sections, in document order.
+
+    Each node records its parent's index in the returned list. Sections
+    carry their plain-text rendering (see parse_xml_text); container levels
+    only carry their label. Levels quoted from other laws are part of the
+    section quoting them, not nodes of their own.
+    """
+    return stream_xml_structure(_iter_chunks(xml_content))
+
+
+def stream_xml_structure(chunks: Iterable[Union[str, bytes]]) -> List[BillNode]:
+    """
+    Parse a bill's structural outline from a stream of XML chunks.
+
+    Sections are rendered and cleared as they close, so this is a single
+    pass with memory bounded by the largest section.
+    """
+    return _stream_structure(chunks)
+
+
+def parse_xml_tree(xml_content: Union[str, bytes]) -> BillTree:
+    """
+    Parse a bill into a nested tree of its levels plus its table of contents.
+
+    This is the structure behind the "json" mode, for storing a bill rather
+    than prompting with it.
+
+    Args:
+        xml_content: Bill XML, in the bill DTD or USLM format
+
+    Returns:
+        BillTree whose nodes are the top-level divisions, titles or sections,
+        each with its children; sections carry their plain-text rendering.
+        toc is empty for bills without a table of contents.
+    """
+    return stream_xml_tree(_iter_chunks(xml_content))
+
+
+def stream_xml_tree(chunks: Iterable[Union[str, bytes]]) -> BillTree:
+    """
+    Parse a bill tree (see parse_xml_tree) from a stream of XML chunks, in
+    the same single pass as stream_xml_structure.
+    """
+    element_ids: List[tuple[Optional[str], Optional[str]]] = []
+    toc: List[TOCItem] = []
+    nodes = _stream_structure(chunks, element_ids, toc)
+
+    tree: List[BillTreeNode] = []
+    for node, (element_id, identifier) in zip(nodes, element_ids):
+        tree.append(
+            BillTreeNode(
+                kind=node["kind"],
+                number=node["number"],
+                id=element_id,
+                identifier=identifier,
+                heading=node["heading"],
+                label=node["label"],
+                text=node["text"],
+                children=[],
+            )
+        )
+    roots = []
+    for node, tree_node in zip(nodes, tree):
+        if node["parent"] is None:
+            roots.append(tree_node)
+        else:
+            tree[node["parent"]]["children"].append(tree_node)
+    return BillTree(toc=toc, nodes=roots)
+
+
+def _stream_structure(
+    chunks: Iterable[Union[str, bytes]],
+    element_ids: Optional[List[tuple[Optional[str], Optional[str]]]] = None,
+    toc: Optional[List[TOCItem]] = None,
+) -> List[BillNode]:
+    """
+    Single pass behind stream_xml_structure and stream_xml_tree. When given,
+    element_ids receives the (id, identifier) attributes of each node and toc
+    the entries of the bill's table of contents.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    nodes: List[BillNode] = []
+    # (element depth, node index) of each open structural level
+    open_levels: List[tuple[int, int]] = []
+    depth = 0
+    quoted_depth = 0
+    toc_depth = 0
+
+    def read_events():
+        nonlocal depth, quoted_depth, toc_depth
+        for event, element in parser.read_events():
+            name = _localname(element.tag)
+            if event == "start":
+                depth += 1
+                if name in QUOTED_CONTAINERS:
+                    quoted_depth += 1
+                elif name == "toc" and not quoted_depth and _is_toc_tag(element.tag):
+                    toc_depth += 1
+                elif (
+                    name in STRUCTURAL_LEVELS
+                    and not quoted_depth
+                    and _is_bill_tag(element.tag)
+                ):
+                    if element_ids is not None:
+                        element_ids.append(
+                            (element.get("id"), element.get("identifier"))
+                        )
+                    nodes.append(
+                        BillNode(
+                            kind=name,
+                            number=None,
+                            heading="",
+                            label="",
+                            parent=open_levels[-1][1] if open_levels else None,
+                            text="",
+                        )
+                    )
+                    open_levels.append((depth, len(nodes) - 1))
+                continue
+
+            if name in QUOTED_CONTAINERS:
+                quoted_depth -= 1
+            elif name == "toc" and toc_depth and _is_toc_tag(element.tag):
+                toc_depth -= 1
+            elif (
+                name in ("toc-entry", "referenceItem")
+                and toc_depth
+                and not quoted_depth
+                and toc is not None
+            ):
+                toc.append(_toc_item(element))
+            elif (
+                name in _LABEL_ELEMENTS
+                and open_levels
+                and open_levels[-1][0] == depth - 1
+            ):
+                node = nodes[open_levels[-1][1]]
+                if name in ("enum", "num") and node["number"] is None:
+                    node["number"] = _level_number(element)
+                elif name in ("header", "heading") and not node["heading"]:
+                    node["heading"] = _inline_text(element)
+            elif open_levels and open_levels[-1][0] == depth:
+                _, index = open_levels.pop()
+                node = nodes[index]
+                node["label"] = _level_label(element, name).strip()
+                if name == "section":
+                    renderer = _TextRenderer()
+                    renderer.render(element, depth=0)
+                    node["text"] = renderer.result()
+                    element.clear()
+            depth -= 1
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        read_events()
+    parser.close()
+    read_events()
+
+    return nodes
+
+
+def _toc_item(item: ET.Element) -> TOCItem:
+    """
+    Normalize a USLM <referenceItem> or a bill DTD <toc-entry>. The latter
+    has a single line of text, which is split into designator and label.
+    """
+    if _localname(item.tag) == "referenceItem":
+        parts = {_localname(child.tag): _inline_text(child) for child in item}
+        return TOCItem(
+            role=clean_text(item.get("role", "")),
+            designator=parts.get("designator", "").rstrip(" .—") or None,
+            label=parts.get("label") or None,
+            idref=item.get("idref"),
+        )
+
+    text = _inline_text(item)
+    entry_match = _TOC_ENTRY.match(text)
+    designator, label = entry_match.groups() if entry_match else (None, text)
+    return TOCItem(
+        role=item.get("level", ""),
+        designator=designator,
+        label=label or None,
+        idref=item.get("idref"),
+    )
+
+
+def _level_number(element: ET.Element) -> Optional[str]:
+    """Normalize a <num value> or <enum> designation: "10001." -> "10001"."""
+    if element.get("value"):
+        return element.get("value").strip().lower()
+    number = clean_text("".join(element.itertext())).strip("().").lower()
+    return number or None
+
+
+def _section_anchor(nodes: List[BillNode]) -> str:
+    """Source anchor for a run of sections: "#section-1" or "#section-1..9"."""
+    numbers = [node["number"] or "?" for node in nodes if node["kind"] == "section"]
+    if not numbers:
+        return "#section-"
+    if len(numbers) == 1:
+        return f"#section-{numbers[0]}"
+    return f"#section-{numbers[0]}..{numbers[-1]}"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text without a model-specific tokenizer.
+
+    Uses the common ~4 characters per token approximation for English,
+    which is close enough for packing fragments under a context budget.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def chunk_structure(
+    nodes: List[BillNode],
+    budget: Optional[int] = None,
+    chunks: Optional[int] = None,
+) -> List[tuple[str, str]]:
+    """
+    Pack a bill's sections into (content, source anchor) chunks.
+
+    Sections are never split. With budget, each chunk holds as many
+    consecutive sections as fit in that many tokens (a section larger than
+    the budget gets a chunk of its own). With chunks, the bill is cut into
+    at most that many pieces of roughly equal token count. Each chunk opens
+    with the labels of the divisions/titles/subtitles its first section
+    sits in, so it can be read on its own.
+
+    Raises:
+        ValueError: If the bill has no sections
+    """
+    sections = [node for node in nodes if node["kind"] == "section"]
+    if not sections:
+        raise ValueError("No sections found in this bill.")
+
+    sizes = [estimate_tokens(node["text"]) for node in sections]
+    if chunks is not None:
+        groups = _split_evenly(sizes, chunks)
+    else:
+        groups = _pack_greedily(sizes, budget or 0)
+
+    result = []
+    for start, end in groups:
+        group = sections[start:end]
+        context = [nodes[i]["label"] for i in _ancestors(nodes, group[0])]
+        content = "\n".join(context + [node["text"].rstrip("\n") for node in group])
+        result.append((content + "\n", _section_anchor(group)))
+    return result
+
+
+def _pack_greedily(sizes: List[int], budget: int) -> List[tuple[int, int]]:
+    """Group consecutive sizes into (start, end) runs totalling <= budget."""
+    groups = []
+    start, total = 0, 0
+    for i, size in enumerate(sizes):
+        if i > start and total + size > budget:
+            groups.append((start, i))
+            start, total = i, 0
+        total += size
+    groups.append((start, len(sizes)))
+    return groups
+
+
+def _split_evenly(sizes: List[int], count: int) -> List[tuple[int, int]]:
+    """Cut sizes into at most count runs, at the boundaries nearest equal shares."""
+    total = sum(sizes)
+    groups = []
+    start, running = 0, 0
+    for i, size in enumerate(sizes):
+        running += size
+        target = total * (len(groups) + 1) / count
+        if running >= target and len(groups) < count - 1 and i + 1 < len(sizes):
+            # Cut before this section if that lands closer to the target
+            if i > start and running - target > size / 2:
+                groups.append((start, i))
+                start = i
+            else:
+                groups.append((start, i + 1))
+                start = i + 1
+    groups.append((start, len(sizes)))
+    return [(a, b) for a, b in groups if a < b]
+
+
+def _ancestors(nodes: List[BillNode], node: BillNode) -> List[int]:
+    """Indexes of a node's enclosing levels, outermost first."""
+    indexes = []
+    parent = node["parent"]
+    while parent is not None:
+        indexes.append(parent)
+        parent = nodes[parent]["parent"]
+    return indexes[::-1]
+
+
+def diff_structures(
+    old: List[BillNode],
+    new: List[BillNode],
+    old_name: str = "old",
+    new_name: str = "new",
+) -> str:
+    """
+    Report the sections that differ between two versions of a bill.
+
+    Sections are aligned by their structural identifier (section number,
+    qualified by division where numbering restarts) through a dict, so
+    alignment is linear in the number of sections and only sections whose
+    text changed are line-diffed. Changed and added sections follow the new
+    version's order; removed sections come last.
+
+    Args:
+        old, new: Outlines from parse_xml_structure
+        old_name, new_name: Version names used in the summary line
+
+    Returns:
+        A summary line followed by a unified diff (one line of context) of
+        each changed section, the text of each added section, and the label
+        of each removed section
+    """
+    old_sections = _sections_by_key(old)
+    new_sections = _sections_by_key(new)
+    changes = []
+    counts = {"changed": 0, "added": 0, "removed": 0}
+
+    for key, node in new_sections.items():
+        previous = old_sections.get(key)
+        if previous is None:
+            counts["added"] += 1
+            changes.append(f"=== {node['label']} (added)\n{node['text']}")
+        elif previous["text"] != node["text"]:
+            counts["changed"] += 1
+            diff = difflib.unified_diff(
+                previous["text"].splitlines(),
+                node["text"].splitlines(),
+                lineterm="",
+                n=1,
+            )
+            # Drop the ---/+++ file header lines
+            hunks = itertools.islice(diff, 2, None)
+            changes.append(f"=== {node['label']} (changed)\n" + "\n".join(hunks))
+
+    for key, node in old_sections.items():
+        if key not in new_sections:
+            counts["removed"] += 1
+            changes.append(f"=== {node['label']} (removed)")
+
+    summary = (
+        f"Changes from {old_name} to {new_name}: {counts['changed']} sections "
+        f"changed, {counts['added']} added, {counts['removed']} removed."
+    )
+    return "\n\n".join([summary] + changes)
+
+
+def _sections_by_key(nodes: List[BillNode]) -> dict[str, BillNode]:
+    """Index numbered sections by division path and number, in document order."""
+    sections: dict[str, BillNode] = {}
+    for node in nodes:
+        if node["kind"] != "section" or not node["number"]:
+            continue
+        divisions = [
+            f"{nodes[i]['kind']}-{nodes[i]['number']}/"
+            for i in _ancestors(nodes, node)
+            if nodes[i]["kind"] in ("division", "subdivision")
+        ]
+        sections.setdefault("".join(divisions) + node["number"], node)
+    return sections
+
+
+class CompiledBill:
+    """
+    Compact, pre-parsed form of one bill text version.
+
+    Everything the toc, section, text and chunks modes need is rendered once
+    by compile_bill() and laid out as fixed-size records pointing into a
+    single UTF-8 text buffer:
+
+        header | node records | section records | text buffer
+
+    Node records mirror parse_xml_structure() (kind, parent and spans of the
+    number, heading, label and rendered text). Section records map every
+    section number, including ones only found in quoted law, to the text
+    parse_xml_section() would return. The _OutlineIndex for range, level
+    and heading selectors is stored in the buffer too, as JSON. The buffer
+    can be memory-mapped (see CompiledBill.open), so answering a request
+    reads only the bytes it needs and never touches the XML.
+    """
+
+    __slots__ = (
+        "buffer",
+        "node_count",
+        "section_count",
+        "spans",
+        "_sections",
+        "_outline",
+    )
+
+    def __init__(self, buffer):
+        (
+            magic,
+            self.node_count,
+            self.section_count,
+            toc_offset,
+            toc_length,
+            text_offset,
+            text_length,
+            outline_offset,
+            outline_length,
+        ) = _COMPILED_HEADER.unpack_from(buffer, 0)
+        if magic != _COMPILED_MAGIC:
+            raise ValueError("Not a compiled bill")
+        self.buffer = buffer
+        self.spans = {
+            "toc": (toc_offset, toc_length),
+            "text": (text_offset, text_length),
+            "outline": (outline_offset, outline_length),
+        }
+        self._sections: Optional[dict[str, List[tuple[int, int]]]] = None
+        self._outline: Optional[_OutlineIndex] = None
+
+    @classmethod
+    def open(cls, path: str) -> "CompiledBill":
+        """Memory-map a compiled bill file."""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._buffer_start() + offset
+        return bytes(self.buffer[start : start + length]).decode("utf-8")
+
+    def _buffer_start(self) -> int:
+        return (
+            _COMPILED_HEADER.size
+            + self.node_count * _NODE_RECORD.size
+            + self.section_count * _SECTION_RECORD.size
+        )
+
+    def toc(self) -> str:
+        """Return the formatted table of contents, like parse_xml_toc."""
+        offset, length = self.spans["toc"]
+        if offset == _NO_SPAN:
+            raise ValueError("No table of contents found in this bill.")
+        return self._string(offset, length)
+
+    def text(self) -> str:
+        """Return the plain-text rendering, like parse_xml_text."""
+        return self._string(*self.spans["text"])
+
+    def sections(self, sections: List[str]) -> str:
+        """Return the requested sections, like parse_xml_section."""
+        if self._sections is None:
+            self._sections = {}
+            base = _COMPILED_HEADER.size + self.node_count * _NODE_RECORD.size
+            for i in range(self.section_count):
+                number_offset, number_length, offset, length = _SECTION_RECORD.unpack_from(
+                    self.buffer, base + i * _SECTION_RECORD.size
+                )
+                number = self._string(number_offset, number_length)
+                self._sections.setdefault(number, []).append((offset, length))
+
+        # Section records are stored in document order, as are their texts
+        spans = sorted(set(_select_entries(self._sections, sections)))
+        return "\n\n".join(self._string(offset, length) for offset, length in spans)
+
+    def outline(self) -> _OutlineIndex:
+        """Return the section index compile_bill stored, like _outline_index."""
+        if self._outline is None:
+            self._outline = _OutlineIndex.load(
+                json.loads(self._string(*self.spans["outline"]))
+            )
+        return self._outline
+
+    def nodes(self, text: bool = True) -> List[BillNode]:
+        """
+        Return the structural outline, like parse_xml_structure. With
+        text=False, section texts are left empty instead of being decoded.
+        """
+        nodes = []
+        for i in range(self.node_count):
+            kind, parent, *spans = _NODE_RECORD.unpack_from(
+                self.buffer, _COMPILED_HEADER.size + i * _NODE_RECORD.size
+            )
+            number, heading, label = (
+                self._string(spans[j], spans[j + 1]) for j in range(0, 6, 2)
+            )
+            nodes.append(
+                BillNode(
+                    kind=STRUCTURAL_LEVELS[kind],
+                    number=number or None,
+                    heading=heading,
+                    label=label,
+                    parent=parent if parent >= 0 else None,
+                    text=self._string(spans[6], spans[7]) if text else "",
+                )
+            )
+        return nodes
+
+
+def compile_bill(xml_content: Union[str, bytes]) -> bytes:
+    """
+    Render everything CompiledBill serves from one bill XML document.
+
+    Returns:
+        The compiled bill as bytes, ready to be written to disk
+    """
+    text_buffer = bytearray()
+
+    def add(text: str) -> tuple[int, int]:
+        encoded = text.encode("utf-8")
+        text_buffer.extend(encoded)
+        return len(text_buffer) - len(encoded), len(encoded)
+
+    try:
+        toc_span = add(parse_xml_toc(xml_content))
+    except ValueError:
+        toc_span = (_NO_SPAN, 0)
+    text_span = add(parse_xml_text(xml_content))
+
+    nodes = parse_xml_structure(xml_content)
+    outline_span = add(json.dumps(_OutlineIndex(nodes).dump()))
+    node_records = bytearray()
+    for node in nodes:
+        node_records += _NODE_RECORD.pack(
+            STRUCTURAL_LEVELS.index(node["kind"]),
+            -1 if node["parent"] is None else node["parent"],
+            *add(node["number"] or ""),
+            *add(node["heading"]),
+            *add(node["label"]),
+            *add(node["text"]),
+        )
+
+    section_records = bytearray()
+    sections = sorted(
+        (position, number, element)
+        for number, entries in _section_index(xml_content).items()
+        for position, element in entries
+    )
+    for _, number, element in sections:
+        section_records += _SECTION_RECORD.pack(
+            *add(number),
+            *add(ET.tostring(element, encoding="unicode", method="text")),
+        )
+
+    header = _COMPILED_HEADER.pack(
+        _COMPILED_MAGIC,
+        len(node_records) // _NODE_RECORD.size,
+        len(section_records) // _SECTION_RECORD.size,
+        *toc_span,
+        *text_span,
+        *outline_span,
+    )
+    return bytes(header + node_records + section_records + text_buffer)
+
+
+def bill_loader(argument: str) -> Union[llm.Fragment, List[llm.Fragment]]:
+    """
+    Load bill text from Congress.gov API.
+
+    Args:
+        argument: Bill ID in format [type][number]-[congress][:mode]
+                 Examples: "hr1-119", "s1046-119:toc"
+                 A comma list ("hr1-119,s5-118") or range ("hr1-hr50-119")
+                 of bills loads them all, see load_bills.
+
+    Returns:
+        llm.Fragment containing the requested bill content, or a list of
+        fragments when several bills were requested. With BILL_SIDECAR_SOCKET
+        set, a running sidecar (see serve_sidecar) renders it instead.
+
+    Raises:
+        ValueError: If bill text is not available or argument format is invalid
+        httpx.HTTPStatusError: If API request fails
+    """
+    fragments = _sidecar_fragments(argument)
+    if fragments is not None:
+        return fragments
+
+    arguments = expand_bill_arguments(argument)
+    if len(arguments) > 1:
+        return load_bills(arguments)
+
+    with _stage("bill_loader", argument=argument):
+        parsed_argument = parse_argument(argument)
+
+        client = _http_client()
+        if parsed_argument["mode"] in API_MODES:
+            return _api_fragment(client, parsed_argument, argument)
+        bill_data = _fetch_bill_data(client, parsed_argument, argument)
+        return _process_bill_content(client, bill_data, parsed_argument, argument)
+
+
+def expand_bill_arguments(argument: str) -> List[str]:
+    """
+    Expand a comma list and/or ranges of bill IDs into single-bill arguments.
+
+    Examples:
+        "hr1-119"             -> ["hr1-119"]
+        "hr1-hr3-119:toc"     -> ["hr1-119:toc", "hr2-119:toc", "hr3-119:toc"]
+        "hr1-119,s5-118"      -> ["hr1-119", "s5-118"]
+
+    Raises:
+        ValueError: If a range is malformed or larger than MAX_BATCH_SIZE
+    """
+    bill_part, separator, section_spec = argument.partition(":")
+    suffix = separator + section_spec
+
+    arguments = []
+    for item in bill_part.split(","):
+        item = item.strip()
+        range_match = _BILL_RANGE.match(item.lower())
+        if not range_match:
+            arguments.append(item + suffix)
+            continue
+
+        start_type, start, end_type, end, congress = range_match.groups()
+        if start_type != end_type or int(start) > int(end):
+            raise ValueError(
+                f"Invalid bill range: '{item}'. "
+                "Expected format: [type][start]-[type][end]-[congress] "
+                "(e.g., 'hr1-hr50-119')"
+            )
+        arguments.extend(
+            f"{start_type}{number}-{congress}{suffix}"
+            for number in range(int(start), int(end) + 1)
+        )
+
+    if len(arguments) > MAX_BATCH_SIZE:
+        raise ValueError(
+            f"Too many bills requested ({len(arguments)}); "
+            f"the limit is {MAX_BATCH_SIZE}"
+        )
+    return arguments
+
+
+def load_bills(
+    arguments: List[str],
+    max_concurrency: Optional[int] = None,
+    parse_workers: Optional[int] = None,
+) -> List[llm.Fragment]:
+    """
+    Load many bills concurrently, returning fragments in argument order.
+
+    All downloads share one pooled httpx.AsyncClient (HTTP/2 when the h2
+    package is installed), at most max_concurrency bills are in flight at
+    once, and requests to api.congress.gov are throttled to
+    BILL_API_RATE_LIMIT per hour. Responses go through the same on-disk
+    cache as bill_loader.
+
+    Args:
+        arguments: Bill arguments as accepted by bill_loader; ranges and
+                   comma lists are expanded
+        max_concurrency: Bills fetched at once, defaults to BATCH_CONCURRENCY
+        parse_workers: Processes parsing bills in parallel, defaults to
+                       PARSE_WORKERS; 0 or 1 parses in threads
+
+    Raises:
+        ValueError: If any bill fails to load
+    """
+    return _run_sync(async_load_bills(arguments, max_concurrency, parse_workers))
+
+
+def _run_sync(coroutine):
+    """
+    Run a coroutine to completion for the sync API. Inside a running event
+    loop (Jupyter, an async app calling bill_loader) asyncio.run raises, so
+    the coroutine then runs on a loop of its own in a worker thread, which
+    blocks the caller just like a sync download would.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        context = contextvars.copy_context()
+        return pool.submit(context.run, asyncio.run, coroutine).result()
+
+
+async def async_bill_loader(
+    argument: str,
+) -> Union[llm.Fragment, List[llm.Fragment]]:
+    """
+    Async counterpart of bill_loader, for use inside a running event loop.
+
+    Downloads go through httpx.AsyncClient and the shared on-disk cache;
+    parsing and rendering run in a worker thread (asyncio.to_thread), so the
+    event loop keeps serving other tasks while a bill is parsed.
+
+    Args:
+        argument: Bill argument as accepted by bill_loader
+
+    Returns:
+        Same as bill_loader
+    """
+    arguments = expand_bill_arguments(argument)
+    with _stage("bill_loader", argument=argument, run="async"):
+        rendered = await _load_bills([parse_argument(a) for a in arguments], arguments)
+    if len(rendered) > 1:
+        return _flatten_fragments(rendered)
+    return rendered[0]
+
+
+async def async_load_bills(
+    arguments: List[str],
+    max_concurrency: Optional[int] = None,
+    parse_workers: Optional[int] = None,
+) -> List[llm.Fragment]:
+    """Async counterpart of load_bills, see async_bill_loader."""
+    expanded = [a for argument in arguments for a in expand_bill_arguments(argument)]
+    parsed_arguments = [parse_argument(argument) for argument in expanded]
+
+    with _stage("load_bills", bills=len(expanded)):
+        rendered = await _load_bills(
+            parsed_arguments, expanded, max_concurrency, parse_workers
+        )
+    return _flatten_fragments(rendered)
+
+
+def _flatten_fragments(
+    rendered: List[Union[llm.Fragment, List[llm.Fragment]]],
+) -> List[llm.Fragment]:
+    """Flatten per-bill results, some of which are lists of chunks."""
+    fragments = []
+    for item in rendered:
+        fragments.extend(item if isinstance(item, list) else [item])
+    return fragments
+
+
+def load_bill_tree(argument: str) -> BillTree:
+    """
+    Load a bill as a nested tree of its levels, the structure behind the
+    "json" mode, without going through JSON.
+
+    The XML is parsed once and the tree's JSON rendering is cached like any
+    other view, so a later "json" fragment of the same version is free; if
+    that view is already cached, it is decoded instead of parsing the XML.
+
+    Args:
+        argument: Bill ID in format [type][number]-[congress], optionally
+                  followed by ":json"
+
+    Returns:
+        BillTree of the newest text version, see parse_xml_tree
+
+    Raises:
+        ValueError: If bill text is not available or argument format is invalid
+    """
+    parsed_argument = parse_argument(argument)
+    if parsed_argument["mode"] not in ("full", "json"):
+        raise ValueError(
+            f"load_bill_tree returns the whole bill; remove the "
+            f"'{argument.split(':', 1)[1]}' option from '{argument}'"
+        )
+    parsed_argument["mode"] = "json"
+
+    with _stage("bill_loader", argument=argument, mode="json"):
+        client = _http_client()
+        bill_data = _fetch_bill_data(client, parsed_argument, argument)
+        _record_text_versions(parsed_argument, bill_data)
+        text_url = _select_xml_url(bill_data, argument)
+        _register_search_document(parsed_argument, text_url)
+
+        cached_view = _cached_view(text_url, "#json")
+        if cached_view is not None:
+            return json.loads(cached_view)
+        try:
+            xml_content = _cached_get(client, text_url, max_age=IMMUTABLE)
+        except httpx.HTTPStatusError as e:
+            raise ValueError(
+                f"Failed to fetch bill text from {text_url}: {e}"
+            ) from e
+
+        with _stage("parse", mode="json"):
+            tree = parse_xml_tree(xml_content)
+        if _cache_dir() is not None:
+            _store_view(text_url, "#json", _serialize_tree(tree))
+        return tree
+
+
+def refresh_bills(arguments: List[str]) -> dict[str, List[dict]]:
+    """
+    Check bills for new text versions, downloading XML only where one appeared.
+
+    The textVersions metadata is always revalidated, but a bill's XML is only
+    fetched (and its requested view re-rendered and cached) when the newest
+    version's URL was not seen before. Unchanged bills cost one metadata
+    request and are afterwards served from the cached rendering.
+
+    Args:
+        arguments: Bill arguments as accepted by bill_loader
+
+    Returns:
+        Mapping of each argument to the text versions first seen in this
+        refresh (empty when the bill is unchanged)
+    """
+    expanded = [a for argument in arguments for a in expand_bill_arguments(argument)]
+    new_versions = {}
+
+    # Always revalidates, so the key is needed even for cached bills
+    _require_api_key()
+    client = _http_client()
+    for argument in expanded:
+        parsed_argument = parse_argument(argument)
+        try:
+            bill_data = json.loads(
+                _cached_get(client, _bill_api_url(parsed_argument), max_age=0)
+            )
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"Failed to fetch bill {argument}: {e}") from e
+
+        new_versions[argument] = _record_text_versions(parsed_argument, bill_data)
+        if parsed_argument["mode"] in API_MODES:
+            # Rendered from small JSON responses on request; no XML to fetch
+            continue
+        _register_search_document(
+            parsed_argument, _select_xml_url(bill_data, argument)
+        )
+        xml_url, base_url = _select_text_urls(bill_data, parsed_argument, argument)
+        _fetch_and_parse_content(
+            client, xml_url, parsed_argument, argument, base_url
+        )
+
+    return new_versions
+
+
+def ingest_bulk_data(paths: Iterable[str]) -> dict[str, int]:
+    """
+    Populate the cache from GovInfo BILLS bulk data, for offline bill: use.
+
+    Reads BILLS-*.zip dumps (each member is streamed out of the archive, not
+    extracted to disk), loose BILLS-*.xml files, or directories of either.
+    Every text version is stored under the congress.gov URL the API would
+    list for it, and each bill gets a textVersions record merged into its
+    cached API response, so bill_loader finds everything in the cache.
+    Bills are also queued for billsearch. Eviction runs once at the end.
+
+    Args:
+        paths: ZIP files, XML files or directories
+
+    Returns:
+        Counts of "bills", "versions", "bytes" ingested and files "skipped"
+        (not a House or Senate bill text)
+
+    Raises:
+        ValueError: If the cache is disabled
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        raise ValueError("Bulk ingestion requires the bill cache to be enabled")
+
+    stats = {"bills": 0, "versions": 0, "bytes": 0, "skipped": 0}
+    versions: dict[str, List[dict]] = {}
+
+    with _stage("ingest") as attributes:
+        for name, read, fallback_date in _iter_bulk_files(paths):
+            match = _BULK_MEMBER.match(os.path.basename(name))
+            if not match:
+                stats["skipped"] += 1
+                continue
+            congress, bill_type, number, code = match.group(1, 2, 3, 4)
+            bill_type, code = bill_type.lower(), code.lower()
+            body = read()
+
+            url = (
+                f"https://www.congress.gov/{congress}/bills/{bill_type}{number}/"
+                f"BILLS-{congress}{bill_type}{number}{code}.xml"
+            )
+            entry = _cache_entry(url)
+            _write_cache_entry(
+                cache_dir,
+                entry["body_path"],
+                entry["meta_path"],
+                body,
+                httpx.Headers(),
+                evict=False,
+            )
+            versions.setdefault(f"{bill_type}{number}-{congress}", []).append(
+                {
+                    "date": _bulk_version_date(body) or fallback_date,
+                    "type": code.upper(),
+                    "formats": [{"type": "Formatted XML", "url": url}],
+                }
+            )
+            stats["versions"] += 1
+            stats["bytes"] += len(body)
+
+        documents = []
+        for bill_id, bill_versions in versions.items():
+            parsed_argument = parse_argument(bill_id)
+            bill_data = _merge_text_versions(parsed_argument, bill_versions)
+            _record_text_versions(parsed_argument, bill_data)
+            documents.append((parsed_argument, _select_xml_url(bill_data, bill_id)))
+        _register_search_documents(documents)
+        stats["bills"] = len(versions)
+        attributes.update(stats)
+
+    _evict_cache(cache_dir)
+    return stats
+
+
+def _iter_bulk_files(paths: Iterable[str]):
+    """
+    Yield (name, read, fallback_date) for each file in the given ZIPs, XML
+    files and directories. read() returns the file's bytes; ZIP members are
+    decompressed straight from the archive.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                yield from _iter_bulk_files(
+                    os.path.join(dirpath, filename)
+                    for filename in sorted(filenames)
+                    if filename.lower().endswith((".zip", ".xml"))
+                )
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    date = "{:04d}-{:02d}-{:02d}".format(*info.date_time[:3])
+                    read = functools.partial(archive.read, info)
+                    yield info.filename, read, date
+        else:
+            date = time.strftime("%Y-%m-%d", time.gmtime(os.path.getmtime(path)))
+
+            def read(path=path):
+                with open(path, "rb") as f:
+                    return f.read()
+
+            yield path, read, date
+
+
+def _bulk_version_date(body: bytes) -> Optional[str]:
+    """Date of a bulk-data text version from its Dublin Core or action dates."""
+    match = _BULK_DATE.search(body)
+    if not match:
+        return None
+    year, month, day = (group for group in match.groups() if group)
+    return f"{year.decode()}-{month.decode()}-{day.decode()}"
+
+
+def _merge_text_versions(
+    parsed_argument: ParsedArgument, bill_versions: List[dict]
+) -> dict:
+    """
+    Add ingested text versions to a bill's cached API response (creating it
+    if needed) and return the merged response.
+    """
+    api_url = _bill_api_url(parsed_argument)
+    entry = _cache_entry(api_url)
+    bill_data = {"textVersions": []}
+    if entry["meta"] is not None:
+        bill_data = json.loads(_read_cache_body(entry["body_path"]))
+
+    known_urls = {
+        _extract_xml_url(version) for version in bill_data.get("textVersions", [])
+    }
+    bill_data.setdefault("textVersions", []).extend(
+        version
+        for version in bill_versions
+        if _extract_xml_url(version) not in known_urls
+    )
+    _write_cache_entry(
+        entry["cache_dir"],
+        entry["body_path"],
+        entry["meta_path"],
+        json.dumps(bill_data).encode("utf-8"),
+        httpx.Headers(),
+        evict=False,
+    )
+    return bill_data
+
+
+def billsearch_loader(argument: str) -> List[llm.Fragment]:
+    """
+    Search the sections of every bill fetched so far.
+
+    Bills are added to a local SQLite FTS5 index as bill_loader fetches
+    them; their sections are indexed on the next search, from the cached
+    CompiledBill or XML. Results are ranked by BM25.
+
+    Args:
+        argument: FTS5 query, e.g. '"work requirements" AND medicaid'.
+                  Queries that are not valid FTS5 syntax are searched as
+                  plain words.
+
+    Returns:
+        One fragment per matching section (at most SEARCH_RESULTS), headed
+        by the bill ID and the titles the section belongs to, with the
+        text version's URL plus section anchor as source
+
+    Raises:
+        ValueError: If the cache is disabled or nothing matches
+    """
+    query = argument.strip()
+    if not query:
+        raise ValueError("Empty search query. Expected format: billsearch:QUERY")
+
+    with _stage("billsearch", query=query) as attributes:
+        with _search_db() as db:
+            if db is None:
+                raise ValueError("billsearch requires the bill cache to be enabled")
+            attributes["sections_indexed"] = _update_search_index(db)
+            rows = _search_sections(db, query, SEARCH_RESULTS)
+
+        attributes["results"] = len(rows)
+        if not rows:
+            raise ValueError(
+                f"No fetched bills match '{query}'. "
+                "Bills are searchable once loaded with bill:BILL_ID."
+            )
+        return [
+            llm.Fragment(
+                content="\n".join(filter(None, [bill_id, context])) + "\n\n" + text,
+                source=text_url + anchor,
+            )
+            for bill_id, text_url, anchor, context, text in rows
+        ]
+
+
+def serve_sidecar(
+    socket_path: Optional[str] = None, max_bytes: Optional[int] = None
+) -> None:
+    """
+    Serve bill_loader over HTTP on a Unix socket until interrupted.
+
+    Short-lived llm processes with BILL_SIDECAR_SOCKET pointing at the
+    socket send their bill: arguments here instead of loading bills
+    themselves. The sidecar keeps rendered fragments in memory, plus the
+    parsed XML trees behind them, so each bill is fetched and parsed once
+    for all processes, and a repeat request skips even the disk cache.
+
+    Args:
+        socket_path: Where to listen, defaults to _sidecar_socket_path()
+        max_bytes: Memory for rendered fragments, defaults to
+                   SIDECAR_MAX_BYTES; least recently used ones are dropped
+                   beyond it, and all expire after CACHE_TTL like API
+                   responses do
+
+    Raises:
+        ValueError: If another sidecar is already listening on the socket
+    """
+    socket_path = socket_path or _sidecar_socket_path()
+    server = _sidecar_server(socket_path, max_bytes or SIDECAR_MAX_BYTES)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+
+
+def _sidecar_socket_path() -> str:
+    """BILL_SIDECAR_SOCKET, or sidecar.sock in the cache directory."""
+    if SIDECAR_SOCKET:
+        return SIDECAR_SOCKET
+    return os.path.join(_cache_dir() or str(llm.user_dir()), "sidecar.sock")
+
+
+def _sidecar_server(socket_path: str, max_bytes: int):
+    """
+    Bind a threading HTTP server to socket_path. GET /bill?argument=...
+    answers with the fragments as JSON, or a 400 with the ValueError.
+    """
+    # Touch httpx on this thread before handler threads do, see _lazy_import
+    _http_client()
+    cache = _SidecarCache(max_bytes)
+
+    class Handler(http_server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            argument = urllib.parse.parse_qs(url.query).get("argument", [""])[0]
+            if url.path != "/bill" or not argument:
+                self._reply(404, {"error": f"Unknown request: {self.path}"})
+                return
+
+            payload = cache.get(argument)
+            if payload is None:
+                token = _in_sidecar.set(True)
+                try:
+                    result = bill_loader(argument)
+                except ValueError as e:
+                    self._reply(400, {"error": str(e)})
+                    return
+                except Exception as e:  # noqa: BLE001 - reported to the client
+                    logger.exception("Sidecar failed to load %s", argument)
+                    self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+                    return
+                finally:
+                    _in_sidecar.reset(token)
+                payload = json.dumps(_fragments_payload(result)).encode("utf-8")
+                cache.put(argument, payload)
+            self._send(200, payload)
+
+        def _reply(self, status: int, data: dict):
+            self._send(status, json.dumps(data).encode("utf-8"))
+
+        def _send(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def address_string(self):
+            # Unix socket peers have no address
+            return "sidecar"
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    socketserver = http_server.socketserver
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    if os.path.exists(socket_path):
+        if _sidecar_running(socket_path):
+            raise ValueError(f"A sidecar is already listening on {socket_path}")
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    server = Server(socket_path, Handler)
+    os.chmod(socket_path, 0o600)
+    return server
+
+
+class _SidecarCache:
+    """
+    LRU of serialized sidecar responses, bounded in bytes. Entries expire
+    after CACHE_TTL, when the API response they were rendered from would be
+    revalidated.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: dict[str, tuple[float, bytes]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, argument: str) -> Optional[bytes]:
+        """The cached response for argument, marking it recently used."""
+        key = argument.strip().lower()
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            if time.time() - entry[0] >= CACHE_TTL:
+                self.size -= len(entry[1])
+                return None
+            self.entries[key] = entry
+            return entry[1]
+
+    def put(self, argument: str, payload: bytes) -> None:
+        """Cache a response, dropping least recently used ones beyond max_bytes."""
+        key = argument.strip().lower()
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            if len(payload) > self.max_bytes:
+                return
+            self.entries[key] = (time.time(), payload)
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self.size -= len(self.entries.pop(oldest)[1])
+
+
+# Set while the sidecar itself runs bill_loader, so it does not ask itself
+_in_sidecar = contextvars.ContextVar("in_sidecar", default=False)
+
+
+def _sidecar_fragments(
+    argument: str,
+) -> Optional[Union[llm.Fragment, List[llm.Fragment]]]:
+    """
+    Ask the sidecar at BILL_SIDECAR_SOCKET for a bill: argument's fragments.
+    Returns None, to load the bill in this process, when no sidecar is
+    configured or it cannot be reached.
+
+    Raises:
+        ValueError: If the sidecar could not load the bill
+    """
+    if not SIDECAR_SOCKET or _in_sidecar.get():
+        return None
+    with _stage("sidecar", argument=argument) as attributes:
+        try:
+            status, data = _sidecar_get(
+                SIDECAR_SOCKET,
+                "/bill?" + urllib.parse.urlencode({"argument": argument}),
+                SIDECAR_TIMEOUT,
+            )
+        except OSError as e:
+            logger.debug("Sidecar unavailable (%s), loading locally", e)
+            attributes["available"] = False
+            return None
+        if status != 200:
+            raise ValueError(data["error"])
+        fragments = [
+            llm.Fragment(content=fragment["content"], source=fragment["source"])
+            for fragment in data["fragments"]
+        ]
+        return fragments if data["list"] else fragments[0]
+
+
+def _sidecar_get(socket_path: str, path: str, timeout: float) -> Tuple[int, dict]:
+    """
+    GET a JSON response from the sidecar. Uses http.client rather than httpx
+    so that asking the sidecar never pays for importing httpx.
+
+    Raises:
+        OSError: If nothing answers on socket_path
+    """
+    connection = _UnixHTTPConnection(socket_path, timeout)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix domain socket."""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("sidecar", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(min(self.timeout, HTTP_CONNECT_TIMEOUT))
+        self.sock.connect(self.socket_path)
+        self.sock.settimeout(self.timeout)
+
+
+def _sidecar_running(socket_path: str) -> bool:
+    """Whether a sidecar answers on socket_path, rather than a stale socket file."""
+    try:
+        _sidecar_get(socket_path, "/", HTTP_CONNECT_TIMEOUT)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def _fragments_payload(result: Union[llm.Fragment, List[llm.Fragment]]) -> dict:
+    """JSON-serializable form of a bill_loader result, see _sidecar_fragments."""
+    fragments = result if isinstance(result, list) else [result]
+    return {
+        "list": isinstance(result, list),
+        "fragments": [
+            {"content": str(fragment), "source": fragment.source}
+            for fragment in fragments
+        ],
+    }
+
+
+async def _load_bills(
+    parsed_arguments: List[ParsedArgument],
+    arguments: List[str],
+    max_concurrency: Optional[int] = None,
+    parse_workers: Optional[int] = None,
+) -> List[Union[llm.Fragment, List[llm.Fragment]]]:
+    """
+    Download and render each bill on one pooled client, in argument order.
+
+    A bill is rendered in a worker thread as soon as its download finishes,
+    outside the download semaphore, so parsing one bill overlaps with
+    fetching the next ones. With more than one parse worker and more than
+    one bill, the CPU-bound parsing itself runs in a process pool, since
+    ElementTree holds the GIL.
+    """
+    max_concurrency = max_concurrency or BATCH_CONCURRENCY
+    if parse_workers is None:
+        parse_workers = PARSE_WORKERS
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def load(parsed_argument: ParsedArgument, argument: str):
+        if parsed_argument["mode"] in API_MODES:
+            async with semaphore:
+                return await _async_api_fragment(client, parsed_argument, argument)
+        async with semaphore:
+            xml_url, xml_content, base = await _async_download_bill(
+                client, parsed_argument, argument
+            )
+        return await asyncio.to_thread(
+            _render_fragment, xml_url, xml_content, parsed_argument, base, pool
+        )
+
+    use_pool = parse_workers > 1 and len(arguments) > 1
+    with (
+        # Not forked: this process already runs the event loop's and
+        # to_thread's threads, whose locks a fork could copy while held
+        concurrent.futures.ProcessPoolExecutor(
+            parse_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        if use_pool
+        else contextlib.nullcontext()
+    ) as pool:
+        async with _async_http_client(max_concurrency) as client:
+            return await asyncio.gather(
+                *(
+                    load(parsed_argument, argument)
+                    for parsed_argument, argument in zip(parsed_arguments, arguments)
+                )
+            )
+
+
+async def _async_download_bill(
+    client: httpx.AsyncClient,
+    parsed_argument: ParsedArgument,
+    argument: str,
+) -> tuple[str, Optional[bytes], Optional[tuple[str, bytes]]]:
+    """
+    Fetch a bill's metadata and newest XML text without parsing it, as
+    (xml_url, xml_content, base). xml_content is the undecoded body, or None
+    when the request can be served from the cache; base is the (url,
+    xml_content) of the older version compared in diff mode.
+    """
+    with _stage("fetch_bill_data", argument=argument):
+        try:
+            bill_data = json.loads(
+                await _async_cached_get(client, _bill_api_url(parsed_argument))
+            )
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"Failed to fetch bill {argument}: {e}") from e
+        _debug_save_response(bill_data, f"{argument}_api.json")
+
+    # The version list, search queue and view cache live on disk
+    await asyncio.to_thread(_record_text_versions, parsed_argument, bill_data)
+    await asyncio.to_thread(
+        _register_search_document,
+        parsed_argument,
+        _select_xml_url(bill_data, argument),
+    )
+    xml_url, base_url = _select_text_urls(bill_data, parsed_argument, argument)
+    if not await asyncio.to_thread(_needs_xml, xml_url, parsed_argument):
+        return xml_url, None, None
+
+    async def get_text(url: str) -> bytes:
+        try:
+            return await _async_cached_get(client, url, max_age=IMMUTABLE)
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"Failed to fetch bill text from {url}: {e}") from e
+
+    xml_content = await get_text(xml_url)
+    _debug_save_response(xml_content, f"{argument}_text.xml")
+    base = None
+    if base_url is not None:
+        base = (base_url, await get_text(base_url))
+
+    return xml_url, xml_content, base
+
+
+class _RateLimiter:
+    """
+    Per-host token bucket shared by every thread and, through a SQLite table
+    in the cache directory, by every process using the same cache, so
+    parallel jobs together stay under Congress.gov's hourly quota.
+    """
+
+    def __init__(self, rates: dict[str, float], burst: int = RATE_LIMIT_BURST):
+        self.rates = rates
+        self.burst = burst
+        # Buckets of this process, used when the cache is disabled
+        self.buckets: dict[str, tuple[float, float]] = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, url: str) -> float:
+        """
+        Take a token for a request to url's host, returning the seconds to
+        wait before sending it. Waiting callers have already been counted,
+        so the bucket goes negative rather than handing out a token twice.
+        """
+        host = httpx.URL(url).host
+        rate = self.rates.get(host)
+        if not rate:
+            return 0.0
+        tokens = self._update(
+            host, lambda tokens, elapsed: min(self.burst, tokens + elapsed * rate) - 1
+        )
+        return max(0.0, -tokens / rate)
+
+    def pause(self, url: str, seconds: float) -> None:
+        """Hold back all requests to url's host for seconds, e.g. after a 429."""
+        host = httpx.URL(url).host
+        rate = self.rates.get(host)
+        if rate:
+            self._update(
+                host,
+                lambda tokens, elapsed: min(
+                    tokens + elapsed * rate, self.burst, -seconds * rate
+                ),
+            )
+
+    def _update(self, host: str, update: Callable[[float, float], float]) -> float:
+        """Apply update(tokens, seconds since last update) to a host's bucket."""
+        with self.lock, _rate_limit_db() as db:
+            now = time.time()
+            if db is None:
+                tokens, updated = self.buckets.get(host, (float(self.burst), now))
+            else:
+                row = db.execute(
+                    "SELECT tokens, updated FROM buckets WHERE host = ?", (host,)
+                ).fetchone()
+                tokens, updated = row or (float(self.burst), now)
+            tokens = update(tokens, max(0.0, now - updated))
+            if db is None:
+                self.buckets[host] = (tokens, now)
+            else:
+                db.execute(
+                    "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                    (host, tokens, now),
+                )
+            return tokens
+
+
+@contextlib.contextmanager
+def _rate_limit_db() -> Iterator[Optional[sqlite3.Connection]]:
+    """
+    Open the rate limit table in the cache directory inside an IMMEDIATE
+    transaction, which serializes updates across processes; None if caching
+    is disabled.
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        yield None
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    db = sqlite3.connect(
+        os.path.join(cache_dir, RATE_LIMIT_DB), timeout=30, isolation_level=None
+    )
+    try:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "host TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        db.execute("BEGIN IMMEDIATE")
+        yield db
+        db.execute("COMMIT")
+    finally:
+        db.close()
+
+
+_rate_limiter = _RateLimiter(HOST_RATE_LIMITS)
+
+
+@functools.lru_cache(maxsize=None)
+def _ssl_context():
+    """
+    Certificate store shared by all clients. Loading it takes longer than
+    anything else in creating a client, or than a cached request.
+    """
+    return httpx.create_ssl_context()
+
+
+def _http_timeout() -> httpx.Timeout:
+    """Request timeouts, see HTTP_TIMEOUT and HTTP_CONNECT_TIMEOUT."""
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+@functools.lru_cache(maxsize=None)
+def _http_client() -> httpx.Client:
+    """
+    Client shared by all synchronous loads in this process, so repeated
+    bill_loader calls reuse its connections.
+    """
+    return httpx.Client(timeout=_http_timeout(), verify=_ssl_context())
+
+
+def _async_http_client(max_concurrency: int) -> httpx.AsyncClient:
+    """Client for one batch of async loads, with a connection per bill in flight."""
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+        ),
+        timeout=_http_timeout(),
+        verify=_ssl_context(),
+    )
+
+
+def _http2_available() -> bool:
+    """Whether httpx can negotiate HTTP/2 (requires the optional h2 package)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _fetch_bill_data(
+    client: httpx.Client, parsed_argument: ParsedArgument, argument: str
+) -> dict:
+    """Fetch bill metadata from Congress.gov API."""
+    api_url = _bill_api_url(parsed_argument)
+
+    with _stage("fetch_bill_data", argument=argument):
+        try:
+            data = json.loads(_cached_get(client, api_url))
+
+            _debug_save_response(data, f"{argument}_api.json")
+            return data
+
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"Failed to fetch bill {argument}: {e}") from e
+
+
+def _bill_api_url(parsed_argument: ParsedArgument, endpoint: str = "text") -> str:
+    """
+    Build the URL of a Congress.gov bill endpoint, by default textVersions;
+    endpoint "" is the bill itself. The API key is only required once the
+    URL has to be requested rather than served from the cache (see
+    _cached_get), so ingested bills load without one.
+    """
+    return (
+        f"https://api.congress.gov/v3/bill/"
+        f"{parsed_argument['congress']}/{parsed_argument['bill_type']}/"
+        f"{parsed_argument['bill_number']}{'/' + endpoint if endpoint else ''}"
+        f"?api_key={CONGRESS_API_KEY}"
+    )
+
+
+def _require_api_key() -> None:
+    """
+    Check that the Congress.gov API key is set.
+
+    Raises:
+        ValueError: If CONGRESS_API_KEY is not set
+    """
+    if not CONGRESS_API_KEY:
+        raise ValueError(
+            "Missing CONGRESS_API_KEY environment variable. "
+            "Sign up for a key at https://api.congress.gov/sign-up/"
+        )
+
+
+def _missing_api_key(url: str) -> bool:
+    """Whether url is a Congress.gov API request that cannot be sent keyless."""
+    return not CONGRESS_API_KEY and httpx.URL(url).host == "api.congress.gov"
+
+
+def _process_bill_content(
+    client: httpx.Client,
+    bill_data: dict,
+    parsed_argument: ParsedArgument,
+    argument: str,
+) -> Union[llm.Fragment, List[llm.Fragment]]:
+    """Process bill data and return content based on requested mode."""
+    _record_text_versions(parsed_argument, bill_data)
+    _register_search_document(parsed_argument, _select_xml_url(bill_data, argument))
+    xml_url, base_url = _select_text_urls(bill_data, parsed_argument, argument)
+    return _fetch_and_parse_content(
+        client, xml_url, parsed_argument, argument, base_url
+    )
+
+
+def _api_fragment(
+    client: httpx.Client, parsed_argument: ParsedArgument, argument: str
+) -> llm.Fragment:
+    """
+    Render a summary, meta, ... request from the bill's JSON endpoints (see
+    API_MODES) through the same cache as _fetch_bill_data, never the XML.
+    Paginated endpoints are read by _async_api_fragment, on a client of
+    their own.
+    """
+    if any(
+        endpoint in PAGINATED_ENDPOINTS
+        for endpoint in API_MODES[parsed_argument["mode"]]
+    ):
+        return _run_sync(_paginated_api_fragment(parsed_argument, argument))
+
+    responses = {}
+    with _stage("fetch_bill_data", argument=argument, mode=parsed_argument["mode"]):
+        for endpoint in API_MODES[parsed_argument["mode"]]:
+            url = _bill_api_url(parsed_argument, endpoint=endpoint)
+            try:
+                responses[endpoint] = json.loads(_cached_get(client, url))
+            except httpx.HTTPStatusError as e:
+                raise ValueError(f"Failed to fetch bill {argument}: {e}") from e
+    return _render_api_mode(parsed_argument, argument, responses)
+
+
+async def _paginated_api_fragment(
+    parsed_argument: ParsedArgument, argument: str
+) -> llm.Fragment:
+    """Run _async_api_fragment on a pooled client sized for PAGE_CONCURRENCY."""
+    async with _async_http_client(PAGE_CONCURRENCY) as client:
+        return await _async_api_fragment(client, parsed_argument, argument)
+
+
+async def _async_api_fragment(
+    client: httpx.AsyncClient, parsed_argument: ParsedArgument, argument: str
+) -> llm.Fragment:
+    """Async counterpart of _api_fragment, fetching its endpoints concurrently."""
+    endpoints = API_MODES[parsed_argument["mode"]]
+
+    async def fetch(endpoint: str) -> dict:
+        url = _bill_api_url(parsed_argument, endpoint=endpoint)
+        if endpoint in PAGINATED_ENDPOINTS:
+            return await _async_get_pages(client, url, endpoint)
+        return json.loads(await _async_cached_get(client, url))
+
+    with _stage("fetch_bill_data", argument=argument, mode=parsed_argument["mode"]):
+        try:
+            pages = await asyncio.gather(*(fetch(endpoint) for endpoint in endpoints))
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"Failed to fetch bill {argument}: {e}") from e
+    # meta records the text versions it lists
+    return await asyncio.to_thread(
+        _render_api_mode, parsed_argument, argument, dict(zip(endpoints, pages))
+    )
+
+
+async def _async_get_pages(client: httpx.AsyncClient, url: str, key: str) -> dict:
+    """
+    Read every page of a paginated endpoint listing its items under key.
+
+    The first page's pagination count tells how many pages follow; those
+    are fetched concurrently, at most PAGE_CONCURRENCY at once, and each
+    page is cached on its own. Returns the first page with the items of
+    all pages merged in order.
+    """
+    semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+    async def page(offset: int) -> dict:
+        async with semaphore:
+            return json.loads(
+                await _async_cached_get(
+                    client, f"{url}&offset={offset}&limit={PAGE_SIZE}"
+                )
+            )
+
+    with _stage("fetch_pages", url=_redact_url(url)) as attributes:
+        first = await page(0)
+        count = (first.get("pagination") or {}).get("count", 0)
+        rest = await asyncio.gather(
+            *(page(offset) for offset in range(PAGE_SIZE, count, PAGE_SIZE))
+        )
+        attributes["pages"] = 1 + len(rest)
+        first[key] = [
+            item for data in [first, *rest] for item in data.get(key, [])
+        ]
+        return first
+
+
+def _render_api_mode(
+    parsed_argument: ParsedArgument, argument: str, responses: dict[str, dict]
+) -> llm.Fragment:
+    """
+    Turn the JSON responses _api_fragment fetched into a fragment whose
+    source is the main endpoint's URL, without the API key.
+    """
+    mode = parsed_argument["mode"]
+    bill_id = (
+        f"{parsed_argument['bill_type'].upper()}{parsed_argument['bill_number']}"
+        f"-{parsed_argument['congress']}"
+    )
+    source = _redact_url(_bill_api_url(parsed_argument, endpoint=API_MODES[mode][0]))
+    for endpoint, data in responses.items():
+        _debug_save_response(data, f"{argument}_{endpoint or 'bill'}.json")
+
+    with _stage("render", mode=mode):
+        if mode == "summary":
+            content = _format_summary(
+                bill_id, responses["summaries"].get("summaries", []), argument
+            )
+        elif mode in PAGINATED_ENDPOINTS:
+            content = _format_items(bill_id, mode, responses[mode][mode])
+        else:
+            _record_text_versions(parsed_argument, responses["text"])
+            content = _format_meta(
+                bill_id,
+                responses[""].get("bill", {}),
+                responses["text"].get("textVersions", []),
+            )
+    return llm.Fragment(content=content, source=source)
+
+
+def _format_summary(bill_id: str, summaries: List[dict], argument: str) -> str:
+    """Plain text of a bill's latest CRS summary, headed by the version it covers."""
+    if not summaries:
+        raise ValueError(f"No CRS summary available for bill {argument} yet")
+    latest = max(
+        summaries,
+        key=lambda summary: (
+            summary.get("actionDate") or "",
+            summary.get("updateDate") or "",
+        ),
+    )
+    described = ", ".join(
+        filter(None, [latest.get("actionDesc"), latest.get("actionDate")])
+    )
+    heading = f"CRS summary of {bill_id}" + (f" ({described})" if described else "")
+    return f"{heading}\n\n{_html_to_text(latest.get('text') or '')}\n"
+
+
+def _format_meta(bill_id: str, bill: dict, text_versions: List[dict]) -> str:
+    """Plain-text overview of a bill: title, sponsor, status and text versions."""
+    lines = [f"{bill_id}: {bill['title']}" if bill.get("title") else bill_id]
+    latest_action = bill.get("latestAction") or {}
+    fields = [
+        ("Introduced", bill.get("introducedDate")),
+        (
+            "Sponsor",
+            "; ".join(
+                sponsor["fullName"]
+                for sponsor in bill.get("sponsors", [])
+                if sponsor.get("fullName")
+            ),
+        ),
+        ("Policy area", (bill.get("policyArea") or {}).get("name")),
+        (
+            "Latest action",
+            " ".join(
+                filter(None, [latest_action.get("actionDate"), latest_action.get("text")])
+            ),
+        ),
+        (
+            "Law",
+            ", ".join(
+                f"{law.get('type', 'Law')} {law['number']}"
+                for law in bill.get("laws", [])
+                if law.get("number")
+            ),
+        ),
+    ]
+    lines.extend(f"{name}: {value}" for name, value in fields if value)
+
+    lines += ["", "Text versions:"]
+    for version in sorted(
+        text_versions, key=lambda version: version.get("date") or "", reverse=True
+    ):
+        date = (version.get("date") or "")[:10]
+        lines.append(f"  {date or '(undated)'} {version.get('type') or ''}".rstrip())
+    if not text_versions:
+        lines.append("  (none published yet)")
+    return "\n".join(lines) + "\n"
+
+
+def _format_items(bill_id: str, mode: str, items: List[dict]) -> str:
+    """One line per action, amendment or cosponsor, in the API's order."""
+    lines = [f"{mode.capitalize()} of {bill_id} ({len(items)})", ""]
+    for item in items:
+        if mode == "actions":
+            line = " ".join(filter(None, [item.get("actionDate"), item.get("text")]))
+        elif mode == "amendments":
+            description = item.get("description") or item.get("purpose")
+            latest_action = item.get("latestAction") or {}
+            line = " ".join(
+                filter(None, [item.get("type"), str(item.get("number") or "")])
+            )
+            line += f": {description}" if description else ""
+            if latest_action.get("text"):
+                line += (
+                    f"\n  Latest action: {latest_action.get('actionDate', '')} "
+                    f"{latest_action['text']}"
+                )
+        else:
+            line = " ".join(
+                filter(None, [item.get("sponsorshipDate"), item.get("fullName")])
+            )
+            if item.get("isOriginalCosponsor"):
+                line += " (original cosponsor)"
+            if item.get("sponsorshipWithdrawnDate"):
+                line += f" (withdrawn {item['sponsorshipWithdrawnDate']})"
+        lines.append(line)
+    if not items:
+        lines.append(f"(no {mode} recorded)")
+    return "\n".join(lines) + "\n"
+
+
+def _html_to_text(text: str) -> str:
+    """Plain text of a CRS summary's HTML: one paragraph or "- " item per line."""
+    text = _HTML_LIST_ITEM.sub("\n- ", text)
+    text = _HTML_TAG.sub("", _HTML_BREAK.sub("\n", text))
+    lines = [_collapse_whitespace(line) for line in html.unescape(text).split("\n")]
+    paragraphs = []
+    for line in filter(None, lines):
+        if paragraphs and line.startswith("- ") and paragraphs[-1].startswith("- "):
+            paragraphs[-1] += "\n" + line
+        else:
+            paragraphs.append(line)
+    return "\n\n".join(paragraphs)
+
+
+def _select_xml_url(bill_data: dict, argument: str) -> str:
+    """Pick the XML URL of the newest text version, or explain why there is none."""
+    text_versions = bill_data.get("textVersions", [])
+    if not text_versions:
+        raise ValueError(f"No text versions available for bill {argument}")
+
+    # Get most recent version with XML format
+    xml_url = _find_latest_xml_url(text_versions)
+    if not xml_url:
+        raise ValueError(f"No XML text format available for bill {argument}")
+
+    return xml_url
+
+
+def _select_text_urls(
+    bill_data: dict, parsed_argument: ParsedArgument, argument: str
+) -> tuple[str, Optional[str]]:
+    """
+    Pick the XML URL to render and, in diff mode, the older version's URL
+    it is compared against.
+    """
+    if parsed_argument["mode"] != "diff":
+        return _select_xml_url(bill_data, argument), None
+
+    old, new = parsed_argument["diff"] or [None, None]
+    base_url = _select_version_url(bill_data, old, argument)
+    if new is None:
+        return _select_xml_url(bill_data, argument), base_url
+    return _select_version_url(bill_data, new, argument), base_url
+
+
+def _select_version_url(bill_data: dict, version: str, argument: str) -> str:
+    """
+    Find the XML URL of a text version by its code ("ih", "eh"), taken from
+    the GovInfo file name, or by its date ("2025-05-20").
+    """
+    available = []
+    for text_version in bill_data.get("textVersions", []):
+        xml_url = _extract_xml_url(text_version)
+        if not xml_url:
+            continue
+        code_match = _VERSION_CODE.search(xml_url)
+        code = code_match.group(1).lower() if code_match else None
+        date = (text_version.get("date") or "")[:10]
+        if version in (code, date):
+            return xml_url
+        available.append(code or date)
+
+    raise ValueError(
+        f"No XML text version '{version}' for bill {argument}. "
+        f"Available: {', '.join(available) or 'none'}"
+    )
+
+
+def _find_latest_xml_url(text_versions: List[dict]) -> Optional[str]:
+    """Find XML format URL from the most recent text version."""
+    # Sort versions by date (most recent first)
+    sorted_versions = sorted(
+        text_versions, key=lambda x: x.get("date") or "", reverse=True
+    )
+
+    # Find XML format in most recent versions
+    for version in sorted_versions:
+        xml_url = _extract_xml_url(version)
+        if xml_url:
+            return xml_url
+
+    return None
+
+
+def _extract_xml_url(version: dict) -> Optional[str]:
+    """Extract XML format URL from a version dictionary."""
+    for format_info in version.get("formats", []):
+        if format_info.get("type") == "Formatted XML":
+            return format_info.get("url")
+    return None
+
+
+def _fetch_and_parse_content(
+    client: httpx.Client,
+    text_url: str,
+    parsed_argument: ParsedArgument,
+    argument: str,
+    base_url: Optional[str] = None,
+) -> Union[llm.Fragment, List[llm.Fragment]]:
+    """
+    Fetch XML content and parse according to specified mode. In diff mode
+    base_url is the older text version compared against text_url.
+    """
+    with _stage(
+        "fetch_and_parse_content",
+        url=_redact_url(text_url),
+        mode=parsed_argument["mode"],
+    ) as attributes:
+        source_suffix = _source_suffix(parsed_argument)
+        cached_view = _cached_view(text_url, source_suffix)
+        if cached_view is not None:
+            attributes["view_cache"] = "hit"
+            return _view_fragments(text_url, cached_view, parsed_argument)
+
+        try:
+            if (
+                _cache_dir() is None
+                and not DEBUG
+                and base_url is None
+                and parsed_argument["mode"] != "views"
+            ):
+                # Nothing needs the whole body, so parse straight off the wire
+                # and hang up as soon as the requested content has been seen.
+                chunks = _stream_with_retries(client, text_url, attributes)
+                try:
+                    content, source_suffix = _stream_content_by_mode(
+                        _count_bytes(chunks, attributes), parsed_argument
+                    )
+                finally:
+                    chunks.close()
+                return _view_fragments(text_url, content, parsed_argument)
+
+            xml_content = None
+            if _needs_xml(text_url, parsed_argument):
+                # Kept as bytes: expat parses UTF-8 directly, so decoding
+                # here would only add a copy it re-encodes
+                xml_content = _cached_get(client, text_url, max_age=IMMUTABLE)
+                _debug_save_response(xml_content, f"{argument}_text.xml")
+
+        except httpx.HTTPStatusError as e:
+            raise ValueError(f"Failed to fetch bill text from {text_url}: {e}") from e
+
+        base = None
+        if base_url is not None and xml_content is not None:
+            try:
+                base_content = _cached_get(client, base_url, max_age=IMMUTABLE)
+            except httpx.HTTPStatusError as e:
+                raise ValueError(
+                    f"Failed to fetch bill text from {base_url}: {e}"
+                ) from e
+            base = (base_url, base_content)
+
+        return _render_fragment(text_url, xml_content, parsed_argument, base)
+
+
+def _render_fragment(
+    text_url: str,
+    xml_content: Optional[bytes],
+    parsed_argument: ParsedArgument,
+    base: Optional[tuple[str, bytes]] = None,
+    pool: Optional[concurrent.futures.Executor] = None,
+) -> Union[llm.Fragment, List[llm.Fragment]]:
+    """
+    Turn downloaded XML into a fragment, reusing a cached rendering if one
+    exists. xml_content may be None only when _needs_xml() said so. In diff
+    mode base is the (url, xml_content) of the older version. Parsing and
+    compiling run in pool when one is given (see _run_parser).
+
+    With the cache enabled, non-full modes are rendered from the version's
+    CompiledBill once one exists. Compiling costs several passes over the
+    XML, so it only happens the second time a version's XML is needed; a
+    one-off toc request stays a cheap streaming parse.
+    """
+    if parsed_argument["mode"] == "views":
+        return _render_views(text_url, xml_content, parsed_argument, pool)
+
+    source_suffix = _source_suffix(parsed_argument)
+    with _stage("render", mode=parsed_argument["mode"]) as attributes:
+        content = _cached_view(text_url, source_suffix)
+        attributes["view_cache"] = "miss" if content is None else "hit"
+        if content is None:
+            compiled = None
+            if (
+                parsed_argument["mode"] not in ("full", "diff", "json")
+                and _cache_dir() is not None
+            ):
+                compiled = _load_compiled(text_url)
+                if compiled is None and _rendered_before(text_url):
+                    compiled = _store_compiled(text_url, xml_content, pool)
+
+            if parsed_argument["mode"] == "diff":
+                content = _diff_content(base, (text_url, xml_content), parsed_argument)
+            elif compiled is None:
+                # Full mode is a passthrough, not worth shipping to a process
+                content, source_suffix = _run_parser(
+                    pool if parsed_argument["mode"] != "full" else None,
+                    _parse_content_by_mode,
+                    xml_content,
+                    parsed_argument,
+                )
+            else:
+                content = _compiled_content_by_mode(compiled, parsed_argument)
+            _store_view(text_url, source_suffix, content)
+        return _view_fragments(text_url, content, parsed_argument)
+
+
+def _render_views(
+    text_url: str,
+    xml_content: Optional[bytes],
+    parsed_argument: ParsedArgument,
+    pool: Optional[concurrent.futures.Executor] = None,
+) -> List[llm.Fragment]:
+    """
+    Render each view of a composite request ("toc+section-1+text") from one
+    download, returning their fragments in request order. Each view is
+    cached like a request of its own; the ones not cached yet are rendered
+    from the version's CompiledBill when there is one, and otherwise from a
+    single parse of the XML (see _parse_views).
+    """
+    views = parsed_argument["views"] or []
+    with _stage("render", mode="views", views=len(views)) as attributes:
+        contents = [_cached_view(text_url, _source_suffix(view)) for view in views]
+        missing = [i for i, content in enumerate(contents) if content is None]
+        attributes["view_cache_misses"] = len(missing)
+
+        compiled = None
+        if _cache_dir() is not None and any(
+            views[i]["mode"] not in ("full", "json") for i in missing
+        ):
+            compiled = _load_compiled(text_url)
+            if compiled is None and _rendered_before(text_url):
+                compiled = _store_compiled(text_url, xml_content, pool)
+
+        parsed = []
+        for i in missing:
+            if compiled is not None and views[i]["mode"] not in ("full", "json"):
+                contents[i] = _compiled_content_by_mode(compiled, views[i])
+            else:
+                parsed.append(i)
+        if parsed:
+            rendered = _run_parser(
+                pool, _parse_views, xml_content, [views[i] for i in parsed]
+            )
+            for i, content in zip(parsed, rendered):
+                contents[i] = content
+
+        for i in missing:
+            _store_view(text_url, _source_suffix(views[i]), contents[i])
+        return _flatten_fragments(
+            [
+                _view_fragments(text_url, content, view)
+                for content, view in zip(contents, views)
+            ]
+        )
+
+
+def _run_parser(pool: Optional[concurrent.futures.Executor], parser, *args):
+    """
+    Call parser inline, or in a worker process when given a pool. The
+    calling thread blocks on the result; only the XML and the rendered
+    string cross the process boundary.
+    """
+    if pool is None:
+        return parser(*args)
+    return pool.submit(parser, *args).result()
+
+
+def _needs_xml(text_url: str, parsed_argument: ParsedArgument) -> bool:
+    """Whether rendering this request requires downloading the XML."""
+    if parsed_argument["mode"] == "full":
+        return True
+    if parsed_argument["mode"] == "views":
+        return any(_needs_xml(text_url, view) for view in parsed_argument["views"] or [])
+    if _cached_view(text_url, _source_suffix(parsed_argument)) is not None:
+        return False
+    if parsed_argument["mode"] in ("diff", "json"):
+        return True
+    # Opening it (not just finding the entry) weeds out unreadable files,
+    # which _render_fragment would otherwise have to recompile without XML
+    return _cache_dir() is None or _load_compiled(text_url) is None
+
+
+def _diff_content(
+    base: tuple[str, bytes], current: tuple[str, bytes], parsed_argument: ParsedArgument
+) -> str:
+    """Diff two (url, xml_content) versions, using their CompiledBill if cached."""
+    old_name, new_name = parsed_argument["diff"] or [None, None]
+    with _stage("parse", mode="diff"):
+        old_nodes, new_nodes = (
+            _version_structure(url, xml_content) for url, xml_content in (base, current)
+        )
+        return diff_structures(
+            old_nodes,
+            new_nodes,
+            old_name=(old_name or "").upper(),
+            new_name=new_name.upper() if new_name else "latest",
+        )
+
+
+def _version_structure(text_url: str, xml_content: bytes) -> List[BillNode]:
+    """Outline of a text version, from its CompiledBill when one is cached."""
+    compiled = _load_compiled(text_url) if _cache_dir() is not None else None
+    if compiled is not None:
+        return compiled.nodes()
+    return parse_xml_structure(xml_content)
+
+
+def _rendered_before(text_url: str) -> bool:
+    """Whether a view of this text version was rendered before, marking it so."""
+    entry = _cache_entry(text_url + RENDERED_SUFFIX)
+    if entry is None:
+        return False
+    if entry["meta"] is not None:
+        return True
+    _write_cache_entry(
+        entry["cache_dir"], entry["body_path"], entry["meta_path"], b"", httpx.Headers()
+    )
+    return False
+
+
+def _load_compiled(text_url: str) -> Optional[CompiledBill]:
+    """
+    Memory-map the cached CompiledBill for a text version, if any. An entry
+    that cannot be read (an older format, a truncated file) is removed, so
+    the version gets compiled again.
+    """
+    entry = _cache_entry(text_url + COMPILED_SUFFIX)
+    if entry is None or entry["meta"] is None:
+        return None
+    try:
+        compiled = CompiledBill.open(entry["body_path"])
+    except (OSError, ValueError, struct.error):
+        logger.info("Discarding unreadable compiled bill for %s", text_url)
+        _remove_cache_entry(entry)
+        return None
+    os.utime(entry["body_path"])
+    return compiled
+
+
+def _store_compiled(
+    text_url: str,
+    xml_content: bytes,
+    pool: Optional[concurrent.futures.Executor] = None,
+) -> CompiledBill:
+    """Compile a text version's XML and cache the result."""
+    with _stage("compile") as attributes:
+        compiled = _run_parser(pool, compile_bill, xml_content)
+        attributes["compiled_bytes"] = len(compiled)
+    entry = _cache_entry(text_url + COMPILED_SUFFIX)
+    if entry is not None:
+        _write_cache_entry(
+            entry["cache_dir"],
+            entry["body_path"],
+            entry["meta_path"],
+            compiled,
+            httpx.Headers(),
+        )
+    return CompiledBill(compiled)
+
+
+def _compiled_content_by_mode(
+    compiled: CompiledBill, parsed_argument: ParsedArgument
+) -> str:
+    """Render a non-full mode from a CompiledBill."""
+    with _stage("parse", mode=parsed_argument["mode"], compiled=True):
+        mode = parsed_argument["mode"]
+
+        if mode == "toc":
+            return compiled.toc()
+
+        elif mode == "section":
+            return compiled.sections(
+                _selected_sections(parsed_argument, compiled.outline)
+            )
+
+        elif mode == "text":
+            return compiled.text()
+
+        elif mode == "chunks":
+            return _serialize_chunks(compiled.nodes(), parsed_argument)
+
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+
+
+def _view_fragments(
+    text_url: str, content: str, parsed_argument: ParsedArgument
+) -> Union[llm.Fragment, List[llm.Fragment]]:
+    """
+    Wrap a rendered view in fragment(s). Chunked views are stored as a JSON
+    list of [content, anchor] pairs and become one fragment per chunk.
+    """
+    if parsed_argument["mode"] == "chunks":
+        return [
+            llm.Fragment(content=chunk, source=text_url + anchor)
+            for chunk, anchor in json.loads(content)
+        ]
+    return llm.Fragment(
+        content=content, source=text_url + _source_suffix(parsed_argument)
+    )
+
+
+def _source_suffix(parsed_argument: ParsedArgument) -> str:
+    """Return the fragment source anchor for the requested mode."""
+    mode = parsed_argument["mode"]
+
+    if mode == "full":
+        return "#full"
+
+    elif mode == "toc":
+        return "#toc"
+
+    elif mode == "section":
+        if parsed_argument["level"]:
+            return "#" + "-".join(parsed_argument["level"])
+        if parsed_argument["heading"]:
+            return "#heading-" + "-".join(parsed_argument["heading"])
+        return f"#section-{','.join(parsed_argument['section'] or [])}"
+
+    elif mode == "text":
+        return "#text"
+
+    elif mode == "json":
+        return "#json"
+
+    elif mode == "chunks":
+        if parsed_argument["chunks"] is not None:
+            return f"#chunks-{parsed_argument['chunks']}"
+        return f"#budget-{parsed_argument['budget']}"
+
+    elif mode == "diff":
+        old, new = parsed_argument["diff"] or [None, None]
+        return f"#diff-{old}..{new}" if new else f"#diff-{old}"
+
+    elif mode in API_MODES:
+        return f"#{mode}"
+
+    elif mode == "views":
+        return "#" + "+".join(
+            _source_suffix(view)[1:] for view in parsed_argument["views"] or []
+        )
+
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+
+
+def _stream_content_by_mode(
+    chunks: Iterable[bytes], parsed_argument: ParsedArgument
+) -> tuple[str, str]:
+    """Parse a stream of XML chunks according to the specified mode."""
+    with _stage("parse", mode=parsed_argument["mode"], streamed=True):
+        mode = parsed_argument["mode"]
+
+        if mode == "full":
+            content = b"".join(chunks).decode("utf-8")
+
+        elif mode == "toc":
+            content = stream_xml_toc(chunks)
+
+        elif mode == "section" and _has_selectors(parsed_argument):
+            # Ranges and levels are resolved against the whole outline
+            content = _parse_xml_selection(b"".join(chunks), parsed_argument)
+
+        elif mode == "section":
+            content = stream_xml_sections(chunks, parsed_argument["section"] or [])
+
+        elif mode == "text":
+            content = stream_xml_text(chunks)
+
+        elif mode == "chunks":
+            content = _serialize_chunks(stream_xml_structure(chunks), parsed_argument)
+
+        elif mode == "json":
+            content = _serialize_tree(stream_xml_tree(chunks))
+
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+
+        return content, _source_suffix(parsed_argument)
+
+
+def _parse_content_by_mode(
+    xml_content: Union[str, bytes], parsed_argument: ParsedArgument
+) -> tuple[str, str]:
+    """Parse XML content according to the specified mode."""
+    with _stage("parse", mode=parsed_argument["mode"]):
+        mode = parsed_argument["mode"]
+
+        if mode == "full":
+            # The one mode that needs the XML as text
+            content = (
+                xml_content
+                if isinstance(xml_content, str)
+                else xml_content.decode("utf-8")
+            )
+
+        elif mode == "toc":
+            content = parse_xml_toc(xml_content)
+
+        elif mode == "section":
+            content = _parse_xml_selection(xml_content, parsed_argument)
+
+        elif mode == "text":
+            content = parse_xml_text(xml_content)
+
+        elif mode == "chunks":
+            content = _serialize_chunks(
+                parse_xml_structure(xml_content), parsed_argument
+            )
+
+        elif mode == "json":
+            content = _serialize_tree(parse_xml_tree(xml_content))
+
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+
+        return content, _source_suffix(parsed_argument)
+
+
+def _parse_views(
+    xml_content: Union[str, bytes], views: List[ParsedArgument]
+) -> List[str]:
+    """
+    Render several views of one bill's XML. Table of contents, section and
+    text views all read the one tree _document_root() parses; chunks and
+    json views build their outline in a streaming pass of their own.
+    """
+    with _stage("parse", mode="views", views=len(views)):
+        contents = []
+        for view in views:
+            mode = view["mode"]
+            if mode == "toc":
+                contents.append(_tree_toc(_document_root(xml_content)))
+            elif mode == "section":
+                contents.append(_parse_xml_selection(xml_content, view))
+            elif mode == "text":
+                contents.append(_tree_text(_document_root(xml_content)))
+            else:
+                contents.append(_parse_content_by_mode(xml_content, view)[0])
+        return contents
+
+
+def _has_selectors(parsed_argument: ParsedArgument) -> bool:
+    """Whether a section request uses ranges, a level or headings, not just numbers."""
+    return bool(parsed_argument["level"] or parsed_argument["heading"]) or any(
+        ".." in section for section in parsed_argument["section"] or []
+    )
+
+
+def _selected_sections(
+    parsed_argument: ParsedArgument, outline: Callable[[], _OutlineIndex]
+) -> List[str]:
+    """
+    Expand a section request's ranges, level or heading query into section
+    numbers. The outline index is only built (by calling outline) when there
+    are any.
+    """
+    sections = parsed_argument["section"] or []
+    if not _has_selectors(parsed_argument):
+        return sections
+
+    index = outline()
+    if parsed_argument["level"]:
+        return index.level(parsed_argument["level"])
+    if parsed_argument["heading"]:
+        return index.headings(parsed_argument["heading"])
+    selected = []
+    for section in sections:
+        if ".." in section:
+            selected.extend(index.range(*section.split("..", 1)))
+        else:
+            selected.append(section)
+    return selected
+
+
+def _parse_xml_selection(
+    xml_content: Union[str, bytes], parsed_argument: ParsedArgument
+) -> str:
+    """Extract the sections a section request selects from bill XML."""
+    return parse_xml_section(
+        xml_content,
+        _selected_sections(parsed_argument, lambda: _outline_index(xml_content)),
+    )
+
+
+def _serialize_chunks(nodes: List[BillNode], parsed_argument: ParsedArgument) -> str:
+    """Chunk a bill's structure and serialize it as a cacheable view."""
+    return json.dumps(
+        chunk_structure(
+            nodes, budget=parsed_argument["budget"], chunks=parsed_argument["chunks"]
+        )
+    )
+
+
+def _serialize_tree(tree: BillTree) -> str:
+    """Serialize a bill tree for the json mode, keeping non-ASCII text as is."""
+    return json.dumps(tree, ensure_ascii=False)
+
+
+def _debug_save_response(data: Union[dict, str, bytes], filename: str) -> None:
+    """Save API response to file if DEBUG mode is enabled."""
+    if not DEBUG:
+        return
+
+    os.makedirs("debug-responses", exist_ok=True)
+    filepath = os.path.join("debug-responses", filename)
+
+    if isinstance(data, bytes):
+        with open(filepath, "wb") as f:
+            f.write(data)
+    elif isinstance(data, str):
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(data)
+    else:
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+_trace_hooks: List[Callable[[TraceRecord], None]] = []
+_current_stage: contextvars.ContextVar[Optional[TraceRecord]] = contextvars.ContextVar(
+    "_current_stage", default=None
+)
+
+
+def add_trace_hook(hook: Callable[[TraceRecord], None]) -> None:
+    """
+    Call hook with a TraceRecord each time a loading stage finishes.
+
+    Stages nest (bill_loader > fetch_bill_data > http_get, ...), linked by
+    parent_span_id. Exceptions raised by the hook are logged, not propagated.
+    """
+    _trace_hooks.append(hook)
+
+
+def remove_trace_hook(hook: Callable[[TraceRecord], None]) -> None:
+    """Stop calling a hook registered with add_trace_hook."""
+    _trace_hooks.remove(hook)
+
+
+@contextlib.contextmanager
+def _stage(name: str, **attributes) -> Iterator[dict]:
+    """
+    Time a loading stage, yielding its attributes dict for counters.
+
+    The record is emitted when the stage exits (see _emit_trace); a stage
+    that raises gets an "error" attribute naming the exception type.
+    """
+    parent = _current_stage.get()
+    start_time_ns = time.time_ns()
+    start = time.perf_counter_ns()
+    record = TraceRecord(
+        name=name,
+        trace_id=parent["trace_id"] if parent else os.urandom(16).hex(),
+        span_id=os.urandom(8).hex(),
+        parent_span_id=parent["span_id"] if parent else None,
+        start_time_ns=start_time_ns,
+        end_time_ns=start_time_ns,
+        duration_ms=0.0,
+        attributes=attributes,
+    )
+    token = _current_stage.set(record)
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _current_stage.reset(token)
+        elapsed = time.perf_counter_ns() - start
+        record["end_time_ns"] = start_time_ns + elapsed
+        record["duration_ms"] = elapsed / 1e6
+        _emit_trace(record)
+
+
+def _count(name: str, amount: int = 1) -> None:
+    """Add amount to a counter attribute of the innermost running stage."""
+    record = _current_stage.get()
+    if record is not None:
+        attributes = record["attributes"]
+        attributes[name] = attributes.get(name, 0) + amount
+
+
+def _count_bytes(chunks: Iterable[bytes], attributes: dict) -> Iterator[bytes]:
+    """Pass chunks through, adding their size to attributes["bytes_downloaded"]."""
+    for chunk in chunks:
+        attributes["bytes_downloaded"] = attributes.get("bytes_downloaded", 0) + len(
+            chunk
+        )
+        yield chunk
+
+
+def _emit_trace(record: TraceRecord) -> None:
+    """Send a finished stage to the logger, TRACE_FILE and trace hooks."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "%s took %.1f ms %s",
+            record["name"],
+            record["duration_ms"],
+            json.dumps(record["attributes"], default=str),
+        )
+
+    if TRACE_FILE:
+        line = json.dumps(record, default=str) + "\n"
+        if TRACE_FILE == "-":
+            sys.stderr.write(line)
+        else:
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    for hook in list(_trace_hooks):
+        try:
+            hook(record)
+        except Exception:
+            logger.exception("Trace hook %r failed", hook)
+
+
+def _redact_url(url: str) -> str:
+    """Drop the API key from a URL so it can be logged or hashed."""
+    return str(httpx.URL(url).copy_remove_param("api_key"))
+
+
+def _cache_dir() -> Optional[str]:
+    """Return the cache directory, or None if caching is disabled."""
+    if CACHE_DISABLED:
+        return None
+    if CACHE_DIR:
+        return CACHE_DIR
+    return str(llm.user_dir() / "us-legislation-cache")
+
+
+def _cache_key(url: str) -> str:
+    """Content-address a URL, ignoring the API key so it never hits the disk."""
+    normalized = _redact_url(url)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _cache_paths(cache_dir: str, url: str) -> tuple[str, str]:
+    """Return the (body, metadata) file paths for a cached URL."""
+    key = _cache_key(url)
+    base = os.path.join(cache_dir, key[:2], key)
+    return base + ".body", base + ".json"
+
+
+def _cached_get(
+    client: httpx.Client, url: str, max_age: Optional[float] = None
+) -> bytes:
+    """
+    GET a URL through the on-disk cache.
+
+    Fresh entries (younger than CACHE_TTL) are served without touching the
+    network. Stale entries are revalidated with If-None-Match /
+    If-Modified-Since, so an unchanged resource costs a 304 rather than a
+    full download. Every hit refreshes the entry's mtime, which drives LRU
+    eviction once the cache grows past CACHE_MAX_BYTES. Requests are rate
+    limited and retried (see _get_with_retries), except that a stale entry,
+    when there is one, is served right away if the request fails.
+
+    Args:
+        max_age: Seconds an entry stays fresh, defaults to CACHE_TTL. Use
+                 IMMUTABLE for versioned URLs whose content never changes,
+                 or 0 to always revalidate.
+
+    Raises:
+        httpx.HTTPStatusError: If the request fails
+    """
+    with _stage("http_get", url=_redact_url(url)) as attributes:
+        entry = _cache_entry(url)
+        body = _fresh_cache_body(entry, max_age)
+        if body is not None:
+            attributes["cache"] = "hit"
+            return body
+        if _missing_api_key(url):
+            return _keyless_cache_body(entry, attributes)
+
+        try:
+            response = _get_with_retries(
+                client,
+                url,
+                _revalidation_headers(entry),
+                attributes,
+                _retries(entry),
+            )
+        except httpx.TransportError:
+            body = _stale_cache_body(entry, attributes)
+            if body is None:
+                raise
+            return body
+        if response.status_code in RETRY_STATUSES:
+            body = _stale_cache_body(entry, attributes)
+            if body is not None:
+                return body
+        attributes.update(_response_attributes(response))
+        return _store_response(entry, response)
+
+
+async def _async_cached_get(
+    client: httpx.AsyncClient, url: str, max_age: Optional[float] = None
+) -> bytes:
+    """
+    Async counterpart of _cached_get, sharing the same on-disk cache. Cache
+    reads and writes (and any eviction they trigger) run in worker threads,
+    off the event loop.
+    """
+    with _stage("http_get", url=_redact_url(url)) as attributes:
+        entry = await asyncio.to_thread(_cache_entry, url)
+        body = await asyncio.to_thread(_fresh_cache_body, entry, max_age)
+        if body is not None:
+            attributes["cache"] = "hit"
+            return body
+        if _missing_api_key(url):
+            return await asyncio.to_thread(_keyless_cache_body, entry, attributes)
+
+        try:
+            response = await _async_get_with_retries(
+                client,
+                url,
+                _revalidation_headers(entry),
+                attributes,
+                _retries(entry),
+            )
+        except httpx.TransportError:
+            body = await asyncio.to_thread(_stale_cache_body, entry, attributes)
+            if body is None:
+                raise
+            return body
+        if response.status_code in RETRY_STATUSES:
+            body = await asyncio.to_thread(_stale_cache_body, entry, attributes)
+            if body is not None:
+                return body
+        attributes.update(_response_attributes(response))
+        return await asyncio.to_thread(_store_response, entry, response)
+
+
+def _retries(entry: Optional[_CacheEntry]) -> int:
+    """Retries worth waiting for: none when a stale entry can be served instead."""
+    return 0 if entry is not None and entry["meta"] is not None else HTTP_RETRIES
+
+
+def _get_with_retries(
+    client: httpx.Client,
+    url: str,
+    headers: dict,
+    attributes: dict,
+    retries: int = HTTP_RETRIES,
+) -> httpx.Response:
+    """
+    GET url once the host's rate limit allows, retrying network errors and
+    429/5xx responses up to retries times, after the delay _retry_delay
+    picks. A body cut off mid-download is resumed with a Range request (see
+    _Download), so a dropped connection near the end of a large bill does
+    not start over.
+
+    Returns:
+        The final response, whose status may still be an error once
+        retries run out
+
+    Raises:
+        httpx.TransportError: If the last attempt failed without a response
+    """
+    download = _Download()
+    for attempt in itertools.count():
+        time.sleep(_rate_limiter.reserve(url))
+        response = None
+        try:
+            with client.stream(
+                "GET", url, headers={**headers, **download.resume_headers()}
+            ) as response:
+                if download.start(response):
+                    for chunk in response.iter_raw():
+                        download.add(chunk)
+                else:
+                    response.read()
+        except httpx.TransportError as e:
+            delay = _retry_delay(attempt, retries)
+            if delay is None:
+                raise
+            error = e
+        else:
+            if download.accepted:
+                return download.response(response)
+            # A 206 for another range than requested is retried from scratch
+            delay = _retry_delay(
+                attempt, retries, response if response.status_code != 206 else None
+            )
+            if delay is None:
+                return response
+            error = response.status_code
+        _note_retry(url, attempt, delay, error, response, attributes, download)
+        time.sleep(delay)
+
+
+async def _async_get_with_retries(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict,
+    attributes: dict,
+    retries: int = HTTP_RETRIES,
+) -> httpx.Response:
+    """
+    Async counterpart of _get_with_retries. The rate limiter's SQLite
+    transaction can wait on other processes, so it runs in a worker thread.
+    """
+    download = _Download()
+    for attempt in itertools.count():
+        await asyncio.sleep(await asyncio.to_thread(_rate_limiter.reserve, url))
+        response = None
+        try:
+            async with client.stream(
+                "GET", url, headers={**headers, **download.resume_headers()}
+            ) as response:
+                if download.start(response):
+                    async for chunk in response.aiter_raw():
+                        download.add(chunk)
+                else:
+                    await response.aread()
+        except httpx.TransportError as e:
+            delay = _retry_delay(attempt, retries)
+            if delay is None:
+                raise
+            error = e
+        else:
+            if download.accepted:
+                return download.response(response)
+            # A 206 for another range than requested is retried from scratch
+            delay = _retry_delay(
+                attempt, retries, response if response.status_code != 206 else None
+            )
+            if delay is None:
+                return response
+            error = response.status_code
+        await asyncio.to_thread(
+            _note_retry, url, attempt, delay, error, response, attributes, download
+        )
+        await asyncio.sleep(delay)
+
+
+def _stream_with_retries(
+    client: httpx.Client,
+    url: str,
+    attributes: dict,
+    retries: int = HTTP_RETRIES,
+) -> Iterator[bytes]:
+    """
+    Yield url's body chunk by chunk, rate limited and retried like
+    _get_with_retries. A failure mid-body is resumed with a Range request
+    when the body is not content-encoded and has a validator, so every byte
+    is yielded once; otherwise the part already yielded cannot be taken
+    back and the error is raised.
+
+    Raises:
+        httpx.HTTPStatusError: If the response is an error once retries run out
+        httpx.TransportError: If the last attempt failed without a response,
+                              or the body could not be resumed
+    """
+    download = _Download(buffered=False)
+    interrupted: Optional[httpx.TransportError] = None
+    for attempt in itertools.count():
+        time.sleep(_rate_limiter.reserve(url))
+        response = None
+        try:
+            with client.stream(
+                "GET", url, headers=download.resume_headers()
+            ) as response:
+                if download.received and not download.resumes(response):
+                    if response.status_code not in RETRY_STATUSES:
+                        # The server restarted the body, so give up below
+                        download.validator = None
+                        raise interrupted
+                    response.read()
+                elif download.start(response):
+                    if "Content-Encoding" in response.headers:
+                        # Ranges count encoded bytes, iter_bytes yields decoded ones
+                        download.validator = None
+                        chunks = response.iter_bytes(STREAM_CHUNK_SIZE)
+                    else:
+                        chunks = response.iter_raw()
+                    for chunk in chunks:
+                        download.add(chunk)
+                        yield chunk
+                    return
+                else:
+                    response.read()
+        except httpx.TransportError as e:
+            if download.received and not download.validator:
+                raise
+            delay = _retry_delay(attempt, retries)
+            if delay is None:
+                raise
+            error = interrupted = e
+        else:
+            # A 206 for another range than requested is retried from scratch
+            delay = _retry_delay(
+                attempt, retries, response if response.status_code != 206 else None
+            )
+            if delay is None:
+                response.raise_for_status()
+                raise interrupted or httpx.RemoteProtocolError(
+                    f"Unexpected {response.status_code} response",
+                    request=response.request,
+                )
+            error = response.status_code
+        _note_retry(url, attempt, delay, error, response, attributes, download)
+        time.sleep(delay)
+
+
+class _Download:
+    """
+    Body of a GET accumulated across attempts. After a failure mid-body, the
+    next attempt asks for the rest with Range and If-Range, which the server
+    only honors while the resource still matches the validator (ETag or
+    Last-Modified) of the part already received. An unbuffered download only
+    counts the bytes, for callers that consume them as they arrive.
+    """
+
+    def __init__(self, buffered: bool = True):
+        self.buffered = buffered
+        self.chunks: List[bytes] = []
+        self.received = 0
+        self.headers: Optional[httpx.Headers] = None
+        self.validator: Optional[str] = None
+        self.accepted = False
+
+    def add(self, chunk: bytes) -> None:
+        """Append a chunk of the (still encoded) body."""
+        if self.buffered:
+            self.chunks.append(chunk)
+        self.received += len(chunk)
+
+    def resume_headers(self) -> dict:
+        """Headers asking for the missing rest of the body, if resumable."""
+        if not self.received or not self.validator:
+            return {}
+        return {"Range": f"bytes={self.received}-", "If-Range": self.validator}
+
+    def start(self, response: httpx.Response) -> bool:
+        """
+        Whether response carries (the rest of) the body to accumulate; any
+        other response discards what was received so far.
+        """
+        if response.status_code == 206 and self.resumes(response):
+            self.accepted = True
+            return True
+        self.chunks, self.received = [], 0
+        self.accepted = response.status_code == 200
+        if not self.accepted:
+            return False
+        self.headers = response.headers
+        etag = response.headers.get("ETag")
+        # If-Range requires a strong validator
+        self.validator = (
+            etag
+            if etag and not etag.startswith("W/")
+            else response.headers.get("Last-Modified")
+        )
+        return True
+
+    def resumes(self, response: httpx.Response) -> bool:
+        """Whether a 206 response continues where the received body ends."""
+        content_range = response.headers.get("Content-Range", "")
+        return bool(self.received) and content_range.startswith(
+            f"bytes {self.received}-"
+        )
+
+    def response(self, response: httpx.Response) -> httpx.Response:
+        """The whole body as a 200 response with the first response's headers."""
+        return httpx.Response(
+            200,
+            headers=self.headers,
+            content=b"".join(self.chunks),
+            request=response.request,
+        )
+
+
+def _retry_delay(
+    attempt: int, retries: int, response: Optional[httpx.Response] = None
+) -> Optional[float]:
+    """
+    Seconds to wait before retrying after attempt (counting from 0) failed
+    with response, or with a network error when response is None. None means
+    give up: all retries were used, the status is not worth retrying, or
+    Retry-After asks for longer than RETRY_MAX_WAIT.
+
+    Without Retry-After the wait is random up to an exponentially growing
+    cap ("full jitter"), so clients that failed together retry apart.
+    """
+    if attempt >= retries:
+        return None
+    if response is not None:
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            return retry_after if retry_after <= RETRY_MAX_WAIT else None
+    return random.uniform(0, min(RETRY_MAX_WAIT, RETRY_BACKOFF * 2**attempt))
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds from a Retry-After header, given as seconds or an HTTP date."""
+    value = response.headers.get("Retry-After", "").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def _note_retry(
+    url: str,
+    attempt: int,
+    delay: float,
+    error,
+    response: Optional[httpx.Response],
+    attributes: dict,
+    download: _Download,
+) -> None:
+    """Log and trace a retry; a 429 also holds back other requests to the host."""
+    logger.info(
+        "GET %s failed (%s), retrying in %.1fs", _redact_url(url), error, delay
+    )
+    attributes["retries"] = attempt + 1
+    if download.received:
+        attributes["resume_from"] = download.received
+    if response is not None and response.status_code == 429:
+        _rate_limiter.pause(url, delay)
+
+
+def _response_attributes(response: httpx.Response) -> dict:
+    """Trace attributes for a response that went past the cache."""
+    return {
+        "cache": "revalidated" if response.status_code == 304 else "miss",
+        "status": response.status_code,
+        "bytes_downloaded": len(response.content),
+    }
+
+
+class _CacheEntry(TypedDict):
+    """Location and metadata of a (possibly absent) cache entry."""
+
+    cache_dir: str
+    body_path: str
+    meta_path: str
+    meta: Optional[dict]
+
+
+def _cache_entry(url: str) -> Optional[_CacheEntry]:
+    """Look up the cache entry for a URL, or None if caching is disabled."""
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return None
+
+    body_path, meta_path = _cache_paths(cache_dir, url)
+    meta = _read_cache_meta(meta_path)
+    if meta is not None and not os.path.exists(body_path):
+        meta = None
+    return _CacheEntry(
+        cache_dir=cache_dir, body_path=body_path, meta_path=meta_path, meta=meta
+    )
+
+
+def _fresh_cache_body(
+    entry: Optional[_CacheEntry], max_age: Optional[float] = None
+) -> Optional[bytes]:
+    """Return the cached body if the entry is younger than max_age (CACHE_TTL)."""
+    if entry is None or entry["meta"] is None:
+        return None
+    if max_age is None:
+        max_age = CACHE_TTL
+    if time.time() - entry["meta"].get("fetched_at", 0) >= max_age:
+        return None
+    return _read_cache_body(entry["body_path"])
+
+
+def _stale_cache_body(
+    entry: Optional[_CacheEntry], attributes: dict
+) -> Optional[bytes]:
+    """
+    Fall back to an expired entry when the network is unreachable or the
+    server keeps failing, so cached and bulk-ingested bills keep working.
+    """
+    if entry is None or entry["meta"] is None:
+        return None
+    logger.warning("Request failed, serving stale cache entry")
+    attributes["cache"] = "stale"
+    return _read_cache_body(entry["body_path"])
+
+
+def _keyless_cache_body(entry: Optional[_CacheEntry], attributes: dict) -> bytes:
+    """
+    Without an API key an expired entry cannot be revalidated, so serve it
+    like an offline request would.
+
+    Raises:
+        ValueError: If nothing is cached, see _require_api_key
+    """
+    body = _stale_cache_body(entry, attributes)
+    if body is None:
+        _require_api_key()
+    return body
+
+
+def _revalidation_headers(entry: Optional[_CacheEntry]) -> dict:
+    """Build conditional request headers from a stale entry's validators."""
+    headers = {}
+    if entry is None or entry["meta"] is None:
+        return headers
+    if entry["meta"].get("etag"):
+        headers["If-None-Match"] = entry["meta"]["etag"]
+    if entry["meta"].get("last_modified"):
+        headers["If-Modified-Since"] = entry["meta"]["last_modified"]
+    return headers
+
+
+def _store_response(entry: Optional[_CacheEntry], response: httpx.Response) -> bytes:
+    """Resolve a response against the cache: reuse on 304, store on 200."""
+    if entry is not None and entry["meta"] is not None and response.status_code == 304:
+        entry["meta"]["fetched_at"] = time.time()
+        _write_cache_meta(entry["meta_path"], entry["meta"])
+        return _read_cache_body(entry["body_path"])
+
+    response.raise_for_status()
+    body = response.content
+    if entry is not None:
+        _write_cache_entry(
+            entry["cache_dir"],
+            entry["body_path"],
+            entry["meta_path"],
+            body,
+            response.headers,
+        )
+    return body
+
+
+def _record_text_versions(
+    parsed_argument: ParsedArgument, bill_data: dict
+) -> List[dict]:
+    """
+    Remember a bill's text versions, returning the ones not seen before.
+
+    Each bill gets a small JSON file under versions/ in the cache directory
+    listing every (date, type, url) it has been seen with.
+    """
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return []
+
+    path = os.path.join(
+        cache_dir,
+        "versions",
+        f"{parsed_argument['congress']}-"
+        f"{parsed_argument['bill_type']}{parsed_argument['bill_number']}.json",
+    )
+    known = _read_cache_meta(path) or {"versions": []}
+    known_urls = {version["url"] for version in known["versions"]}
+
+    new_versions = []
+    for version in bill_data.get("textVersions", []):
+        url = _extract_xml_url(version)
+        if url and url not in known_urls:
+            known_urls.add(url)
+            new_versions.append(
+                {"date": version.get("date"), "type": version.get("type"), "url": url}
+            )
+
+    if new_versions:
+        known["versions"].extend(new_versions)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_cache_meta(path, known)
+    return new_versions
+
+
+@contextlib.contextmanager
+def _search_db() -> Iterator[Optional[sqlite3.Connection]]:
+    """Open the search index in the cache directory, or None if caching is disabled."""
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        yield None
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    db = sqlite3.connect(os.path.join(cache_dir, SEARCH_DB))
+    with db:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS bills ("
+            "bill_id TEXT PRIMARY KEY, text_url TEXT NOT NULL, "
+            "indexed INTEGER NOT NULL DEFAULT 0)"
+        )
+        db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5("
+            "bill_id UNINDEXED, text_url UNINDEXED, anchor UNINDEXED, "
+            "context UNINDEXED, text)"
+        )
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _register_search_document(parsed_argument: ParsedArgument, text_url: str) -> None:
+    """
+    Queue a bill's text version for the search index.
+
+    Indexing is deferred to the next search so a fetch only pays for one
+    small write. A new text version replaces the bill's indexed sections.
+    """
+    _register_search_documents([(parsed_argument, text_url)])
+
+
+def _register_search_documents(
+    documents: List[tuple[ParsedArgument, str]],
+) -> None:
+    """
+    Queue (parsed_argument, text_url) pairs for the search index in one
+    transaction. Search is a side feature of loading bills, so an SQLite
+    error (no FTS5 in this build, a database locked by another writer) is
+    logged and the bills stay unindexed; billsearch reports it instead.
+    """
+    try:
+        with _search_db() as db:
+            if db is None:
+                return
+            with db:
+                for parsed_argument, text_url in documents:
+                    _queue_search_document(db, parsed_argument, text_url)
+    except sqlite3.Error:
+        logger.warning("Could not queue bills for search", exc_info=True)
+
+
+def _queue_search_document(
+    db: sqlite3.Connection, parsed_argument: ParsedArgument, text_url: str
+) -> None:
+    """Queue a text version in an open search index, inside the caller's transaction."""
+    bill_id = (
+        f"{parsed_argument['bill_type']}{parsed_argument['bill_number']}"
+        f"-{parsed_argument['congress']}"
+    )
+    row = db.execute(
+        "SELECT text_url FROM bills WHERE bill_id = ?", (bill_id,)
+    ).fetchone()
+    if row is not None and row[0] == text_url:
+        return
+    db.execute("DELETE FROM sections WHERE bill_id = ?", (bill_id,))
+    db.execute(
+        "INSERT OR REPLACE INTO bills (bill_id, text_url) VALUES (?, ?)",
+        (bill_id, text_url),
+    )
+
+
+def _update_search_index(db: sqlite3.Connection) -> int:
+    """
+    Index the sections of queued bills whose XML or CompiledBill is cached.
+    Returns the number of sections added.
+    """
+    added = 0
+    pending = db.execute("SELECT bill_id, text_url FROM bills WHERE indexed = 0")
+    for bill_id, text_url in pending.fetchall():
+        nodes = _cached_structure(text_url)
+        if nodes is None:
+            continue
+
+        rows = [
+            (
+                bill_id,
+                text_url,
+                _section_anchor([node]),
+                "\n".join(nodes[i]["label"] for i in _ancestors(nodes, node)),
+                node["text"],
+            )
+            for node in nodes
+            if node["kind"] == "section" and node["number"]
+        ]
+        with db:
+            db.executemany(
+                "INSERT INTO sections (bill_id, text_url, anchor, context, text) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.execute("UPDATE bills SET indexed = 1 WHERE bill_id = ?", (bill_id,))
+        added += len(rows)
+    return added
+
+
+def _cached_structure(text_url: str) -> Optional[List[BillNode]]:
+    """Outline of a text version from the cache, without any network request."""
+    compiled = _load_compiled(text_url)
+    if compiled is not None:
+        return compiled.nodes()
+
+    entry = _cache_entry(text_url)
+    if entry is None or entry["meta"] is None:
+        return None
+    return parse_xml_structure(_read_cache_body(entry["body_path"]))
+
+
+def _search_sections(
+    db: sqlite3.Connection, query: str, limit: int
+) -> List[tuple[str, str, str, str, str]]:
+    """Run an FTS5 query, retrying as quoted plain words if it is not valid syntax."""
+    sql = (
+        "SELECT bill_id, text_url, anchor, context, text FROM sections "
+        "WHERE sections MATCH ? ORDER BY rank LIMIT ?"
+    )
+    try:
+        return db.execute(sql, (query, limit)).fetchall()
+    except sqlite3.OperationalError:
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        plain = " ".join('"' + word + '"' for word in words)
+        return db.execute(sql, (plain, limit)).fetchall()
+
+
+def _cached_view(text_url: str, source_suffix: str) -> Optional[str]:
+    """
+    Return a previously rendered view (toc, sections, ...) of a bill version.
+
+    Text version URLs are immutable, so renderings never go stale; they are
+    only dropped by LRU eviction. The full XML is not duplicated as a view.
+    """
+    if source_suffix == "#full":
+        return None
+    entry = _cache_entry(text_url + source_suffix)
+    if entry is None or entry["meta"] is None:
+        return None
+    return _read_cache_body(entry["body_path"]).decode("utf-8")
+
+
+def _store_view(text_url: str, source_suffix: str, content: str) -> None:
+    """Cache a rendered view of a bill version, see _cached_view."""
+    if source_suffix == "#full":
+        return
+    entry = _cache_entry(text_url + source_suffix)
+    if entry is None:
+        return
+    _write_cache_entry(
+        entry["cache_dir"],
+        entry["body_path"],
+        entry["meta_path"],
+        content.encode("utf-8"),
+        httpx.Headers(),
+    )
+
+
+def _read_cache_meta(meta_path: str) -> Optional[dict]:
+    """Read a cache entry's metadata, treating corrupt entries as misses."""
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache_meta(meta_path: str, meta: dict) -> None:
+    """Atomically write a cache entry's metadata."""
+    _write_atomically(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def _write_atomically(path: str, data: bytes) -> None:
+    """
+    Write a file through a uniquely named temporary file, so concurrent
+    writers of the same path (threads or processes) never share one and
+    readers only ever see a complete file.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=os.path.basename(path), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_cache_body(body_path: str) -> bytes:
+    """Read a cached body and mark it as recently used."""
+    with open(body_path, "rb") as f:
+        body = f.read()
+    os.utime(body_path)
+    return body
+
+
+def _write_cache_entry(
+    cache_dir: str,
+    body_path: str,
+    meta_path: str,
+    body: bytes,
+    headers: httpx.Headers,
+    evict: bool = True,
+) -> None:
+    """
+    Store a response body and its validators, then enforce the size bound
+    unless evict is False (bulk writers evict once at the end).
+    """
+    os.makedirs(os.path.dirname(body_path), exist_ok=True)
+    replaced = _file_size(body_path)
+    _write_atomically(body_path, body)
+
+    _write_cache_meta(
+        meta_path,
+        {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "fetched_at": time.time(),
+        },
+    )
+    if not evict:
+        return
+    total = _add_cache_bytes(cache_dir, len(body) - replaced)
+    total += _file_size(os.path.join(cache_dir, SEARCH_DB))
+    if total > CACHE_MAX_BYTES:
+        _evict_cache(cache_dir, keep=body_path)
+
+
+def _remove_cache_entry(entry: _CacheEntry) -> None:
+    """Delete a cache entry's files and take its body off the running size."""
+    size = _file_size(entry["body_path"])
+    for path in (entry["body_path"], entry["meta_path"]):
+        with contextlib.suppress(OSError):
+            os.remove(path)
+    _add_cache_bytes(entry["cache_dir"], -size)
+
+
+def _file_size(path: str) -> int:
+    """Size of a file, 0 if it does not exist."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+@contextlib.contextmanager
+def _cache_size_db(cache_dir: str) -> Iterator[sqlite3.Connection]:
+    """
+    Open the cache size table inside an IMMEDIATE transaction, like
+    _rate_limit_db. The total is only a hint that eviction corrects, so
+    commits are not synced to disk.
+    """
+    db = sqlite3.connect(
+        os.path.join(cache_dir, CACHE_SIZE_DB), timeout=30, isolation_level=None
+    )
+    try:
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("CREATE TABLE IF NOT EXISTS size (bytes INTEGER NOT NULL)")
+        db.execute("BEGIN IMMEDIATE")
+        yield db
+        db.execute("COMMIT")
+    finally:
+        db.close()
+
+
+def _add_cache_bytes(cache_dir: str, delta: int) -> int:
+    """
+    Add delta to the running size of the cached bodies and return the new
+    total, so a write only walks the cache when it goes over the limit. A
+    cache without a total yet is measured once.
+    """
+    with _cache_size_db(cache_dir) as db:
+        row = db.execute("SELECT bytes FROM size").fetchone()
+        if row is None:
+            total = sum(size for _, size, _ in _cache_bodies(cache_dir))
+            db.execute("INSERT INTO size VALUES (?)", (total,))
+        else:
+            total = max(0, row[0] + delta)
+            db.execute("UPDATE size SET bytes = ?", (total,))
+    return total
+
+
+def _cache_bodies(cache_dir: str) -> List[tuple[float, int, str]]:
+    """List the (mtime, size, path) of every cached body."""
+    entries = []
+    for dirpath, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            if not filename.endswith(".body"):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def _evict_cache(cache_dir: str, keep: Optional[str] = None) -> None:
+    """
+    Measure the cache, search index included, and if it is over
+    CACHE_MAX_BYTES remove least recently used entries until it is back
+    under CACHE_EVICT_TO of the limit. Resets the running size total.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with _cache_size_db(cache_dir) as db:
+        entries = _cache_bodies(cache_dir)
+        bodies = sum(size for _, size, _ in entries)
+        _evict_entries(
+            entries, bodies + _file_size(os.path.join(cache_dir, SEARCH_DB)), keep
+        )
+        db.execute("DELETE FROM size")
+        db.execute(
+            "INSERT INTO size VALUES (?)",
+            (sum(size for _, size, path in entries if os.path.exists(path)),),
+        )
+
+
+def _evict_entries(
+    entries: List[tuple[float, int, str]], total: int, keep: Optional[str]
+) -> None:
+    """Remove the oldest entries (except keep) while total is over the target."""
+    if total <= CACHE_MAX_BYTES:
+        return
+    target = CACHE_MAX_BYTES * CACHE_EVICT_TO
+    for _, size, path in sorted(entries):
+        if path == keep:
+            continue
+        for stale in (path, path[: -len(".body")] + ".json"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        total -= size
+        if total <= target:
+            break
+
+
+if __name__ == "__main__":
+    click.Group(commands=[serve_command])()
@@ -0,0 +1,24 @@
+import pytest
+
+import llm_fragments_us_legislation
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Give every test its own empty on-disk cache."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(llm_fragments_us_legislation, "CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(llm_fragments_us_legislation, "CACHE_DISABLED", False)
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def api_key(monkeypatch):
+    """Requests are mocked, but loading a bill requires some API key."""
+    monkeypatch.setattr(llm_fragments_us_legislation, "CONGRESS_API_KEY", "test-key")
+
+
+@pytest.fixture(autouse=True)
+def no_retry_backoff(monkeypatch):
+    """Failed requests are still retried, just without waiting in between."""
+    monkeypatch.setattr(llm_fragments_us_legislation, "RETRY_BACKOFF", 0)
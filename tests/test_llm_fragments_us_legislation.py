@@ -1,15 +1,48 @@
+import asyncio
+import concurrent.futures
 import pytest
 import httpx
 import respx
 from pathlib import Path
 from llm.plugins import load_plugins, pm
+import json
+import sqlite3
+import subprocess
+import sys
 import textwrap
+import threading
+import time
+import zipfile
+
+import llm
+from click.testing import CliRunner
+from llm.cli import cli
+
+import llm_fragments_us_legislation
 
 from llm_fragments_us_legislation import (
+    add_trace_hook,
+    async_bill_loader,
     bill_loader,
+    billsearch_loader,
+    chunk_structure,
+    compile_bill,
+    CompiledBill,
+    diff_structures,
+    estimate_tokens,
+    parse_xml_structure,
+    expand_bill_arguments,
+    load_bill_tree,
+    load_bills,
+    refresh_bills,
+    remove_trace_hook,
     parse_argument,
+    parse_xml_text,
     parse_xml_toc,
+    parse_xml_tree,
     parse_xml_section,
+    stream_xml_sections,
+    stream_xml_toc,
 )
 
 
@@ -35,13 +68,50 @@ def test_plugin_is_installed():
     assert "llm_fragments_us_legislation" in names
 
 
+def test_plugin_registers_without_api_key(monkeypatch):
+    monkeypatch.setattr(llm_fragments_us_legislation, "CONGRESS_API_KEY", None)
+    load_plugins()
+    assert "bill" in llm.get_fragment_loaders()
+    with pytest.raises(ValueError, match="Missing CONGRESS_API_KEY"):
+        bill_loader("hr1-119")
+
+
+def test_plugin_import_defers_httpx():
+    code = (
+        "import sys, llm_fragments_us_legislation as bills; "
+        "assert 'httpx._client' not in sys.modules; "
+        "print(bills.httpx.Client.__name__)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout == "Client\n"
+
+
 @pytest.mark.parametrize(
     "input_arg,expected_bill_type,expected_bill_number,expected_congress,expected_mode,expected_section",
     [
         ("hr1-119", "hr", "1", "119", "full", None),
         ("s5-118", "s", "5", "118", "full", None),
         ("hr1-119:toc", "hr", "1", "119", "toc", None),
+        ("hr1-119:text", "hr", "1", "119", "text", None),
+        ("hr1-119:chunks-4", "hr", "1", "119", "chunks", None),
+        ("hr1-119:budget-50000", "hr", "1", "119", "chunks", None),
         ("hr1-119:section-1", "hr", "1", "119", "section", ["1"]),
+        ("hr1-119:section-80101..80151", "hr", "1", "119", "section", ["80101..80151"]),
+        ("hr1-119:section-1,3..5", "hr", "1", "119", "section", ["1", "3..5"]),
+        ("hr1-119:title-VIII", "hr", "1", "119", "section", None),
+        ("hr1-119:subtitle-viii-a", "hr", "1", "119", "section", None),
+        ("hr1-119:diff-ih..eh", "hr", "1", "119", "diff", None),
+        ("hr1-119:json", "hr", "1", "119", "json", None),
+        ("hr1-119:toc+section-1,2+text", "hr", "1", "119", "views", None),
+        ("hr1-119:summary", "hr", "1", "119", "summary", None),
+        ("hr1-119:META", "hr", "1", "119", "meta", None),
+        ("hr1-119:actions", "hr", "1", "119", "actions", None),
+        ("hr1-119:cosponsors", "hr", "1", "119", "cosponsors", None),
+        ("hr1-119:heading-work requirement", "hr", "1", "119", "section", None),
+        ("hr1-119:diff-IH", "hr", "1", "119", "diff", None),
+        ("hr1-119:diff-2025-05-20..eh", "hr", "1", "119", "diff", None),
         ("hr1-119:section-1,3,5", "hr", "1", "119", "section", ["1", "3", "5"]),
         ("s5-118:section-42", "s", "5", "118", "section", ["42"]),
         (
@@ -83,6 +153,19 @@ def test_parse_argument(
         "hr-119:",
         "hr-119:invalid",
         "hr-119:section-",
+        "hr1-119:chunks-0",
+        "hr1-119:budget-",
+        "hr1-119:diff-",
+        "hr1-119:section-1..",
+        "hr1-119:section-1,,2",
+        "hr1-119:title-",
+        "hr1-119:clause-a",
+        "hr1-119:diff-ih..",
+        "hr1-119:toc+",
+        "hr1-119:toc+diff-ih",
+        "hr1-119:toc+meta",
+        "hr1-119:heading-",
+        "hr1-119:heading- -",
     ],
 )
 def test_parse_argument_invalid(invalid_input):
@@ -204,6 +287,450 @@ def test_bill_loader_toc_mode():
     assert fragment.source == formatted_text_url + "#toc"
 
 
+@respx.mock
+def test_bill_loader_text_mode():
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><section><enum>1.</enum><header>Short title</header>"
+            "<text>This Act may be cited as the <quote>Test Act</quote>.</text>"
+            "</section></bill>",
+        )
+    )
+
+    fragment = bill_loader("hr1-119:text")
+    assert str(fragment) == (
+        "SEC. 1. Short title.\n  This Act may be cited as the “Test Act”.\n"
+    )
+    assert fragment.source == formatted_text_url + "#text"
+
+    assert str(bill_loader("hr1-119:text")) == str(fragment)
+    assert text_route.call_count == 1
+
+
+@respx.mock
+def test_bill_loader_chunks_mode():
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><title><enum>I</enum><header>First</header>"
+            "<section><enum>101.</enum><text>One</text></section>"
+            "<section><enum>102.</enum><text>Two</text></section></title>"
+            "<title><enum>II</enum><header>Second</header>"
+            "<section><enum>201.</enum><text>Three</text></section></title></bill>",
+        )
+    )
+
+    for _ in range(2):
+        fragments = bill_loader("hr1-119:chunks-2")
+        assert [f.source for f in fragments] == [
+            formatted_text_url + "#section-101..102",
+            formatted_text_url + "#section-201",
+        ]
+        assert str(fragments[1]) == "TITLE II—SECOND\nSEC. 201.\n  Three\n"
+
+
+@respx.mock
+def test_bill_loader_json_mode():
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry idref='T1' level='title'>Title I—First"
+            "</toc-entry></toc><title id='T1'><enum>I</enum><header>First</header>"
+            "<section id='S101'><enum>101.</enum><text>One</text></section>"
+            "</title></bill>",
+        )
+    )
+
+    fragment = bill_loader("hr1-119:json")
+    assert fragment.source == formatted_text_url + "#json"
+    tree = json.loads(str(fragment))
+    assert tree["toc"] == [
+        {"role": "title", "designator": "Title I", "label": "First", "idref": "T1"}
+    ]
+    (title,) = tree["nodes"]
+    assert (title["id"], title["label"]) == ("T1", "TITLE I—FIRST")
+    assert title["children"] == [
+        {
+            "kind": "section",
+            "number": "101",
+            "id": "S101",
+            "identifier": None,
+            "heading": "",
+            "label": "SEC. 101.",
+            "text": "SEC. 101.\n  One\n",
+            "children": [],
+        }
+    ]
+
+    assert load_bill_tree("hr1-119") == tree
+    assert text_route.call_count == 1
+    with pytest.raises(ValueError, match="remove the 'toc' option"):
+        load_bill_tree("hr1-119:toc")
+
+
+@respx.mock
+def test_load_bill_tree_caches_json_view():
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200, text="<bill><section><enum>1.</enum><text>One</text></section></bill>"
+        )
+    )
+
+    tree = load_bill_tree("hr1-119:json")
+    assert [node["number"] for node in tree["nodes"]] == ["1"]
+    assert json.loads(str(bill_loader("hr1-119:json"))) == tree
+    assert text_route.call_count == 1
+
+
+@respx.mock
+def test_bill_loader_serves_new_modes_from_compiled_bill(monkeypatch):
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc>"
+            "<section><enum>1.</enum><text>Short title text</text></section></bill>",
+        )
+    )
+
+    assert "Sec. 1. Short title." in str(bill_loader("hr1-119:toc"))
+    # The second mode needing this version's XML compiles it
+    assert "Short title text" in str(bill_loader("hr1-119:text"))
+
+    # Further modes come from the compiled bill, not the XML
+    def fail(*args):
+        raise AssertionError("XML should not be parsed again")
+
+    monkeypatch.setattr("llm_fragments_us_legislation.parse_xml_section", fail)
+    monkeypatch.setattr("llm_fragments_us_legislation._section_index", fail)
+    assert "Short title text" in str(bill_loader("hr1-119:section-1"))
+    assert text_route.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "compiled_body", [b"BILLC001" + bytes(24), b"", b"BILLC00"], ids=str
+)
+@respx.mock
+def test_bill_loader_recompiles_unreadable_compiled_bill(compiled_body):
+    from llm_fragments_us_legislation import (
+        COMPILED_SUFFIX,
+        _cache_entry,
+        _load_compiled,
+        _rendered_before,
+        _write_cache_entry,
+    )
+
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc>"
+            "<section><enum>1.</enum><text>Short title text</text></section></bill>",
+        )
+    )
+    # E.g. a file compiled by an older version of this plugin
+    entry = _cache_entry(formatted_text_url + COMPILED_SUFFIX)
+    _write_cache_entry(
+        entry["cache_dir"],
+        entry["body_path"],
+        entry["meta_path"],
+        compiled_body,
+        httpx.Headers(),
+    )
+    _rendered_before(formatted_text_url)
+
+    assert "Sec. 1. Short title." in str(bill_loader("hr1-119:toc"))
+    assert text_route.call_count == 1
+    assert "Sec. 1. Short title." in _load_compiled(formatted_text_url).toc()
+    assert "Short title text" in str(bill_loader("hr1-119:section-1"))
+    assert text_route.call_count == 1
+
+
+@respx.mock
+def test_bill_loader_composite_views(monkeypatch):
+    formatted_text_url = "https://some.text.url"
+    api_route = mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc>"
+            "<section><enum>1.</enum><text>One</text></section>"
+            "<section><enum>2.</enum><text>Two</text></section></bill>",
+        )
+    )
+
+    fragments = bill_loader("hr1-119:toc+section-2+chunks-2")
+    assert [fragment.source for fragment in fragments] == [
+        formatted_text_url + "#toc",
+        formatted_text_url + "#section-2",
+        formatted_text_url + "#section-1",
+        formatted_text_url + "#section-2",
+    ]
+    assert "Sec. 1. Short title." in str(fragments[0])
+    assert str(fragments[1]) == "2.Two"
+    assert api_route.call_count == text_route.call_count == 1
+
+    # Each view was cached as if it had been requested on its own
+    def fail(*args):
+        raise AssertionError("XML should not be parsed again")
+
+    monkeypatch.setattr("llm_fragments_us_legislation._parse_content_by_mode", fail)
+    assert str(bill_loader("hr1-119:section-2")) == "2.Two"
+    assert text_route.call_count == 1
+
+
+def test_parse_views_matches_single_views():
+    with open(Path(__file__).parent / "fixtures/hr1968-119_text.xml") as f:
+        xml_content = f.read()
+    views = parse_argument("hr1968-119:toc+title-a-iii+section-1101,1103+text")[
+        "views"
+    ]
+
+    assert llm_fragments_us_legislation._parse_views(xml_content, views) == [
+        llm_fragments_us_legislation._parse_content_by_mode(xml_content, view)[0]
+        for view in views
+    ]
+
+
+@respx.mock
+def test_bill_loader_summary_mode():
+    summaries_route = respx.get(
+        "https://api.congress.gov/v3/bill/119/hr/1/summaries"
+    ).mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "summaries": [
+                    {
+                        "actionDate": "2025-05-22",
+                        "actionDesc": "Passed House",
+                        "text": "<p><strong>One Big Beautiful Bill Act</strong></p>"
+                        "<p>This bill reduces taxes &amp; spending.</p>"
+                        "<ul><li>Extends tax cuts</li><li>Cuts Medicaid</li></ul>",
+                        "updateDate": "2025-06-01T12:00:00Z",
+                    },
+                    {
+                        "actionDate": "2025-05-20",
+                        "actionDesc": "Introduced in House",
+                        "text": "<p>Older summary</p>",
+                        "updateDate": "2025-05-21T12:00:00Z",
+                    },
+                ]
+            },
+        )
+    )
+
+    fragment = bill_loader("hr1-119:summary")
+    assert str(fragment) == (
+        "CRS summary of HR1-119 (Passed House, 2025-05-22)\n\n"
+        "One Big Beautiful Bill Act\n\n"
+        "This bill reduces taxes & spending.\n\n"
+        "- Extends tax cuts\n"
+        "- Cuts Medicaid\n"
+    )
+    assert fragment.source == "https://api.congress.gov/v3/bill/119/hr/1/summaries"
+    assert str(bill_loader("hr1-119:summary")) == str(fragment)
+    assert summaries_route.call_count == 1
+
+
+@respx.mock
+def test_bill_loader_meta_mode():
+    respx.get("https://api.congress.gov/v3/bill/119/hr/1").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "bill": {
+                    "title": "One Big Beautiful Bill Act",
+                    "introducedDate": "2025-05-20",
+                    "sponsors": [{"fullName": "Rep. Arrington, Jodey C. [R-TX-19]"}],
+                    "policyArea": {"name": "Economics and Public Finance"},
+                    "latestAction": {
+                        "actionDate": "2025-07-04",
+                        "text": "Became Public Law No: 119-21.",
+                    },
+                    "laws": [{"number": "119-21", "type": "Public Law"}],
+                }
+            },
+        )
+    )
+    mock_text_versions("https://some.text.url")
+    expected = (
+        "HR1-119: One Big Beautiful Bill Act\n"
+        "Introduced: 2025-05-20\n"
+        "Sponsor: Rep. Arrington, Jodey C. [R-TX-19]\n"
+        "Policy area: Economics and Public Finance\n"
+        "Latest action: 2025-07-04 Became Public Law No: 119-21.\n"
+        "Law: Public Law 119-21\n"
+        "\n"
+        "Text versions:\n"
+        "  2024-05-01\n"
+    )
+
+    fragment = bill_loader("hr1-119:meta")
+    assert str(fragment) == expected
+    assert fragment.source == "https://api.congress.gov/v3/bill/119/hr/1"
+    # Batch loads fetch the same endpoints, here from the cache
+    (batched,) = load_bills(["hr1-119:meta"])
+    assert str(batched) == expected
+
+
+@respx.mock
+def test_bill_loader_actions_mode_reads_every_page(monkeypatch):
+    monkeypatch.setattr("llm_fragments_us_legislation.PAGE_SIZE", 2)
+    actions = [
+        {"actionDate": f"2025-07-0{day}", "text": f"Action {day}"}
+        for day in range(5, 0, -1)
+    ]
+
+    def page(request):
+        offset = int(request.url.params["offset"])
+        assert request.url.params["limit"] == "2"
+        return httpx.Response(
+            200,
+            json={
+                "actions": actions[offset : offset + 2],
+                "pagination": {"count": len(actions)},
+            },
+        )
+
+    route = respx.get("https://api.congress.gov/v3/bill/119/hr/1/actions").mock(
+        side_effect=page
+    )
+
+    fragment = bill_loader("hr1-119:actions")
+    assert str(fragment) == (
+        "Actions of HR1-119 (5)\n\n"
+        "2025-07-05 Action 5\n"
+        "2025-07-04 Action 4\n"
+        "2025-07-03 Action 3\n"
+        "2025-07-02 Action 2\n"
+        "2025-07-01 Action 1\n"
+    )
+    assert fragment.source == "https://api.congress.gov/v3/bill/119/hr/1/actions"
+    assert route.call_count == 3
+    # Each page is cached on its own
+    assert str(bill_loader("hr1-119:actions")) == str(fragment)
+    assert route.call_count == 3
+
+
+@respx.mock
+def test_load_bills_amendments_and_cosponsors():
+    respx.get("https://api.congress.gov/v3/bill/119/hr/1/amendments").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "amendments": [
+                    {
+                        "type": "SAMDT",
+                        "number": "2360",
+                        "purpose": "In the nature of a substitute.",
+                        "latestAction": {
+                            "actionDate": "2025-07-01",
+                            "text": "Amendment SA 2360 agreed to in Senate.",
+                        },
+                    }
+                ],
+                "pagination": {"count": 1},
+            },
+        )
+    )
+    respx.get("https://api.congress.gov/v3/bill/119/hr/1/cosponsors").mock(
+        return_value=httpx.Response(
+            200, json={"cosponsors": [], "pagination": {"count": 0}}
+        )
+    )
+
+    amendments, cosponsors = load_bills(["hr1-119:amendments", "hr1-119:cosponsors"])
+    assert str(amendments) == (
+        "Amendments of HR1-119 (1)\n\n"
+        "SAMDT 2360: In the nature of a substitute.\n"
+        "  Latest action: 2025-07-01 Amendment SA 2360 agreed to in Senate.\n"
+    )
+    assert str(cosponsors) == "Cosponsors of HR1-119 (0)\n\n(no cosponsors recorded)\n"
+
+
+@respx.mock
+def test_sync_loaders_work_inside_a_running_event_loop():
+    respx.get("https://api.congress.gov/v3/bill/119/hr/1/cosponsors").mock(
+        return_value=httpx.Response(
+            200, json={"cosponsors": [], "pagination": {"count": 0}}
+        )
+    )
+    mock_text_versions("https://some.text.url")
+    respx.get("https://some.text.url").mock(
+        return_value=httpx.Response(200, text="Full bill text here")
+    )
+
+    async def main():
+        # E.g. a notebook cell calling the sync API
+        return bill_loader("hr1-119:cosponsors"), load_bills(["hr1-119"])
+
+    cosponsors, (text,) = asyncio.run(main())
+    assert str(cosponsors).startswith("Cosponsors of HR1-119 (0)")
+    assert str(text) == "Full bill text here"
+
+
+@respx.mock
+def test_bill_loader_diff_mode():
+    ih_url = "https://www.congress.gov/119/bills/hr1/BILLS-119hr1ih.xml"
+    eh_url = "https://www.congress.gov/119/bills/hr1/BILLS-119hr1eh.xml"
+    respx.get("https://api.congress.gov/v3/bill/119/hr/1/text").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "textVersions": [
+                    {
+                        "date": "2025-05-22T04:00:00Z",
+                        "formats": [{"type": "Formatted XML", "url": eh_url}],
+                    },
+                    {
+                        "date": "2025-05-16T04:00:00Z",
+                        "formats": [{"type": "Formatted XML", "url": ih_url}],
+                    },
+                ]
+            },
+        )
+    )
+    respx.get(ih_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><section><enum>1.</enum><text>Same</text></section>"
+            "<section><enum>2.</enum><text>Before</text></section></bill>",
+        )
+    )
+    respx.get(eh_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><section><enum>1.</enum><text>Same</text></section>"
+            "<section><enum>2.</enum><text>After</text></section></bill>",
+        )
+    )
+
+    (fragment,) = load_bills(["hr1-119:diff-ih..eh"])
+    assert str(bill_loader("hr1-119:diff-ih..eh")) == str(fragment)
+    assert fragment.source == eh_url + "#diff-ih..eh"
+    assert str(fragment) == (
+        "Changes from IH to EH: 1 sections changed, 0 added, 0 removed.\n\n"
+        "=== SEC. 2. (changed)\n@@ -1,2 +1,2 @@\n SEC. 2.\n-  Before\n+  After"
+    )
+    by_date = bill_loader("hr1-119:diff-2025-05-16")
+    assert str(by_date).startswith("Changes from 2025-05-16 to latest: 1 sections")
+
+    with pytest.raises(ValueError, match="No XML text version 'enr'.*Available: eh, ih"):
+        bill_loader("hr1-119:diff-enr")
+
+
 @respx.mock
 def test_bill_loader_section_mode():
     api_url = "https://api.congress.gov/v3/bill/119/hr/1/text"
@@ -245,6 +772,27 @@ class TestParseXML:
         with open(Path(__file__).parent / "fixtures/hr1968-119_text.xml") as f:
             return "\n".join(f.readlines())
 
+    @pytest.fixture
+    def two_division_text(self):
+        """Section numbering restarts in each division, as in omnibus bills."""
+        return (
+            "<bill><legis-body>"
+            "<division><enum>A</enum><header>Alpha</header>"
+            "<title><enum>I</enum><header>Alpha one</header>"
+            "<section><enum>101.</enum><header>Alpha section</header>"
+            "<text>AAA</text></section></title></division>"
+            "<division><enum>B</enum><header>Beta</header>"
+            "<title><enum>I</enum><header>Beta one</header>"
+            "<section><enum>101.</enum><header>Beta section</header>"
+            "<text>BBB</text></section>"
+            "<section><enum>102.</enum><header>Beta other</header>"
+            "<text>CCC</text>"
+            "<quoted-block><section><enum>101.</enum><text>Quoted</text></section>"
+            "<section><enum>9.</enum><text>Only quoted</text></section>"
+            "</quoted-block></section></title></division>"
+            "</legis-body></bill>"
+        )
+
     def test_parse_xml_toc_hr1_119(self, hr1_119_text):
         actual = parse_xml_toc(hr1_119_text)
         assert isinstance(actual, str)
@@ -295,6 +843,281 @@ class TestParseXML:
         result = parse_xml_section(hr1_119_text, ["110101"])
         assert "No tax on tips" in result
 
+    def test_parse_xml_section_prefers_bill_sections_over_quoted(self):
+        xml_content = """<bill><legis-body>
+            <section><enum>1.</enum><header>Amendment</header>
+                <quoted-block><section><enum>2.</enum><text>Quoted law</text></section></quoted-block>
+            </section>
+            <section><enum>2.</enum><header>Real section</header></section>
+        </legis-body></bill>"""
+        result = parse_xml_section(xml_content, ["2"])
+        assert "Real section" in result
+        assert "Quoted law" not in result
+
+    def test_stream_xml_sections_matches_parse_xml_section(self, hr1_119_text):
+        sections = ["80121", "110101", "80101"]
+        chunks = (hr1_119_text[i : i + 4096] for i in range(0, len(hr1_119_text), 4096))
+        assert stream_xml_sections(chunks, sections) == parse_xml_section(
+            hr1_119_text, sections
+        )
+
+    def test_parsers_read_undecoded_bytes(self, hr1968_119_text):
+        xml_bytes = hr1968_119_text.encode("utf-8")
+        assert parse_xml_toc(xml_bytes) == parse_xml_toc(hr1968_119_text)
+        assert parse_xml_text(xml_bytes) == parse_xml_text(hr1968_119_text)
+        assert parse_xml_section(xml_bytes, ["3105"]) == parse_xml_section(
+            hr1968_119_text, ["3105"]
+        )
+        full, _ = llm_fragments_us_legislation._parse_content_by_mode(
+            xml_bytes, parse_argument("hr1968-119")
+        )
+        assert full == hr1968_119_text
+
+    def test_stream_xml_toc_stops_after_toc(self):
+        chunks = iter(
+            [
+                "<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc>",
+                "<section></not-well-formed>",
+            ]
+        )
+        assert "Sec. 1. Short title." in stream_xml_toc(chunks)
+        assert next(chunks) == "<section></not-well-formed>"
+
+    def test_sections_with_repeated_numbers(self, two_division_text):
+        # Every section of the bill with the number, never the quoted one
+        expected = "101.Alpha sectionAAA\n\n101.Beta sectionBBB"
+        assert parse_xml_section(two_division_text, ["101"]) == expected
+        chunks = [two_division_text[i : i + 50] for i in range(0, len(two_division_text), 50)]
+        assert stream_xml_sections(chunks, ["101"]) == expected
+        compiled = CompiledBill(compile_bill(two_division_text))
+        assert compiled.sections(["101"]) == expected
+        # Quoted sections stand in for numbers the bill itself lacks
+        for parse in (
+            lambda sections: parse_xml_section(two_division_text, sections),
+            lambda sections: stream_xml_sections([two_division_text], sections),
+            compiled.sections,
+        ):
+            assert parse(["9", "101"]) == expected + "\n\n9.Only quoted"
+
+    def test_parse_xml_text_hr1968(self, hr1968_119_text):
+        actual = parse_xml_text(hr1968_119_text)
+        assert "<" not in actual
+        assert "139 STAT." not in actual
+        assert "\nDIVISION C—OTHER MATTERS\n" in actual
+        assert "\n  SEC. 3105. EXTENSION OF TEMPORARY ORDER" in actual
+        assert "\n    (a) Statutory PAYGO Scorecards.— The budgetary" in actual
+        assert len(actual) < len(hr1968_119_text) / 2
+
+    def test_parse_xml_text_hr1(self, hr1_119_text):
+        actual = parse_xml_text(hr1_119_text)
+        assert actual.startswith("119th CONGRESS\n1st Session\nH. R. 1\n")
+        assert "\nSEC. 1. Short title.\n  This Act may be cited as the “One Big Beautiful Bill Act”.\n" in actual
+        assert "\nTITLE I—COMMITTEE ON AGRICULTURE\n" in actual
+        assert "\n    SEC. 10001. Thrifty food plan.\n" in actual
+        assert "\n      (b) Sunset Provision.—The exceptions" in actual
+
+    def test_parse_xml_structure_hr1(self, hr1_119_text):
+        nodes = parse_xml_structure(hr1_119_text)
+        title = next(n for n in nodes if n["kind"] == "title")
+        assert title["label"] == "TITLE I—COMMITTEE ON AGRICULTURE"
+        section = next(n for n in nodes if n["number"] == "10001")
+        assert section["kind"] == "section"
+        assert section["heading"] == "Thrifty food plan"
+        assert nodes[section["parent"]]["label"] == "Subtitle A—Nutrition"
+        assert section["text"].startswith("SEC. 10001. Thrifty food plan.\n")
+
+    def test_parse_xml_tree_hr1(self, hr1_119_text):
+        tree = parse_xml_tree(hr1_119_text)
+        nodes = parse_xml_structure(hr1_119_text)
+
+        def walk(tree_nodes):
+            for node in tree_nodes:
+                yield node
+                yield from walk(node["children"])
+
+        flattened = list(walk(tree["nodes"]))
+        assert [(n["kind"], n["number"], n["text"]) for n in flattened] == [
+            (n["kind"], n["number"], n["text"]) for n in nodes
+        ]
+        title = tree["nodes"][2]
+        assert (title["kind"], title["heading"]) == ("title", "Committee on Agriculture")
+        subtitle = title["children"][0]
+        assert subtitle["children"][0]["label"] == "SEC. 10001. Thrifty food plan."
+
+        # Every section-level TOC entry points at a section of the tree
+        ids = {n["id"] for n in flattened}
+        entries = [item for item in tree["toc"] if item["role"] == "section"]
+        assert entries[2] == {
+            "role": "section",
+            "designator": "Sec. 10001",
+            "label": "Thrifty food plan.",
+            "idref": subtitle["children"][0]["id"],
+        }
+        assert all(item["idref"] in ids for item in entries)
+
+    def test_parse_xml_tree_uslm(self, hr1968_119_text):
+        tree = parse_xml_tree(hr1968_119_text)
+        assert tree["nodes"][0]["identifier"] == "/us/pl/119/4/s1"
+        assert tree["toc"][0] == {
+            "role": "section",
+            "designator": "Sec. 1",
+            "label": "Short title.",
+            "idref": None,
+        }
+
+    def test_parse_xml_structure_ignores_dublin_core_titles(self, hr1968_119_text):
+        nodes = parse_xml_structure(hr1968_119_text)
+        assert all(n["label"] for n in nodes if n["kind"] == "title")
+
+    def test_chunk_structure_by_budget(self, hr1_119_text):
+        nodes = parse_xml_structure(hr1_119_text)
+        sections = [n for n in nodes if n["kind"] == "section"]
+        chunks = chunk_structure(nodes, budget=20000)
+
+        assert len(chunks) > 1
+        anchors = [anchor for _, anchor in chunks]
+        assert anchors[0].startswith("#section-1..")
+        assert anchors[-1].endswith("..113001")
+        largest = max(estimate_tokens(n["text"]) for n in sections)
+        for content, _ in chunks:
+            assert estimate_tokens(content) <= max(20000, largest) + 100
+
+    def test_chunk_structure_by_count(self, hr1_119_text):
+        nodes = parse_xml_structure(hr1_119_text)
+        chunks = chunk_structure(nodes, chunks=4)
+        assert len(chunks) == 4
+        sizes = [estimate_tokens(content) for content, _ in chunks]
+        assert max(sizes) < 1.5 * min(sizes)
+        # Chunks open with the levels their first section sits in
+        assert chunks[1][0].startswith("TITLE ")
+
+    def test_diff_structures_reports_only_changed_sections(self, hr1_119_text):
+        old = parse_xml_structure(hr1_119_text)
+        amended = hr1_119_text.replace("Thrifty food plan", "Frugal food plan")
+        new = [dict(n) for n in parse_xml_structure(amended)]
+        removed = next(n for n in new if n["number"] == "10002")
+        removed["number"] = "10002a"
+
+        diff = diff_structures(old, new, "IH", "EH")
+
+        assert diff.startswith(
+            "Changes from IH to EH: 2 sections changed, 1 added, 1 removed."
+        )
+        assert "=== SEC. 2. Table of contents. (changed)\n@@" in diff
+        assert "=== SEC. 10001. Frugal food plan. (changed)\n@@" in diff
+        assert "\n-SEC. 10001. Thrifty food plan.\n+SEC. 10001. Frugal food plan." in diff
+        assert "(added)\nSEC. 10002." in diff
+        assert diff.endswith("(removed)")
+        assert len(diff) < 10000
+        assert diff_structures(old, old).endswith("0 sections changed, 0 added, 0 removed.")
+
+    def test_parse_xml_section_by_range_and_level(self, hr1_119_text):
+        def select(spec):
+            return llm_fragments_us_legislation._parse_content_by_mode(
+                hr1_119_text, parse_argument(f"hr1-119:{spec}")
+            )
+
+        subtitle, source = select("subtitle-viii-a")
+        assert source == "#subtitle-viii-a"
+        assert subtitle == parse_xml_section(
+            hr1_119_text,
+            ["80101", "80102", "80103", "80104", "80105", "80111", "80112", "80121",
+             "80131", "80141", "80142", "80143", "80144", "80151", "80152", "80161",
+             "80171", "80172", "80173", "80181", "80182"],
+        )
+        # Range endpoints need not exist
+        assert select("section-80100..80151")[0] == select("section-80101..80151")[0]
+        assert select("section-80101..80151")[0] in subtitle
+        assert select("title-viii")[0].startswith(subtitle)
+
+        with pytest.raises(ValueError, match="'subtitle-a' matches 6 subtitles"):
+            select("subtitle-a")
+        with pytest.raises(ValueError, match="No title 'title-xc'"):
+            select("title-xc")
+        with pytest.raises(ValueError, match="No sections found in range 5..9"):
+            select("section-5..9")
+
+    def test_parse_xml_section_by_heading(self, hr1_119_text):
+        def select(spec):
+            return llm_fragments_us_legislation._parse_content_by_mode(
+                hr1_119_text, parse_argument(f"hr1-119:{spec}")
+            )
+
+        engagement, source = select("heading-Community-Engagement")
+        assert source == "#heading-community-engagement"
+        assert engagement == parse_xml_section(hr1_119_text, ["44141"])
+        # Words match by prefix, anywhere in the section's or its levels'
+        # headings; this section's own heading also mentions Medicaid
+        assert select("heading-medic engag")[0] == engagement
+        assert select("heading-work requirement")[0] == parse_xml_section(
+            hr1_119_text, ["10002", "10008"]
+        )
+
+        with pytest.raises(ValueError, match="No section headings match 'zzz'"):
+            select("heading-zzz")
+
+    def test_selectors_with_repeated_numbers(self, two_division_text):
+        compiled = CompiledBill(compile_bill(two_division_text))
+        for spec, expected in [
+            ("division-a", "101.Alpha sectionAAA"),
+            ("division-b", "101.Beta sectionBBB\n\n102.Beta other"),
+            ("title-b-i", "101.Beta sectionBBB\n\n102.Beta other"),
+            ("title-a-i", "101.Alpha sectionAAA"),
+            ("heading-beta section", "101.Beta sectionBBB"),
+            ("heading-alpha", "101.Alpha sectionAAA"),
+            ("heading-beta", "101.Beta sectionBBB\n\n102.Beta other"),
+        ]:
+            parsed_argument = parse_argument(f"hr1-119:{spec}")
+            content, _ = llm_fragments_us_legislation._parse_content_by_mode(
+                two_division_text, parsed_argument
+            )
+            assert content.startswith(expected)
+            assert (
+                llm_fragments_us_legislation._compiled_content_by_mode(
+                    compiled, parsed_argument
+                )
+                == content
+            )
+
+    def test_compiled_bill_matches_xml_parsers(
+        self, hr1968_119_text, tmp_path, monkeypatch
+    ):
+        path = tmp_path / "hr1968.bin"
+        path.write_bytes(compile_bill(hr1968_119_text))
+        compiled = CompiledBill.open(str(path))
+
+        assert compiled.toc() == parse_xml_toc(hr1968_119_text)
+        assert compiled.text() == parse_xml_text(hr1968_119_text)
+        assert compiled.nodes() == parse_xml_structure(hr1968_119_text)
+        assert compiled.sections(["3106", "3105"]) == parse_xml_section(
+            hr1968_119_text, ["3106", "3105"]
+        )
+        # Selectors use the index stored at compile time, not the node records
+        monkeypatch.setattr(CompiledBill, "nodes", None)
+        for spec in ("title-a-iii", "section-1101..1103", "heading-appropri"):
+            parsed_argument = parse_argument(f"hr1968-119:{spec}")
+            assert llm_fragments_us_legislation._compiled_content_by_mode(
+                compiled, parsed_argument
+            ) == llm_fragments_us_legislation._parse_content_by_mode(
+                hr1968_119_text, parsed_argument
+            )[0]
+        with pytest.raises(ValueError, match="Missing: 9999"):
+            compiled.sections(["9999"])
+        # A reloaded index answers heading queries like the XML one
+        outline = llm_fragments_us_legislation._outline_index(hr1968_119_text)
+        stored = CompiledBill(compile_bill(hr1968_119_text)).outline()
+        assert stored.words == outline.words
+        assert stored.headings(["approp"]) == outline.headings(["approp"])
+
+    def test_compiled_bill_without_toc(self):
+        compiled = CompiledBill(compile_bill("<bill><section><enum>1.</enum></section></bill>"))
+        with pytest.raises(ValueError, match="No table of contents"):
+            compiled.toc()
+
+    def test_parse_xml_section_reports_missing(self, hr1968_119_text):
+        with pytest.raises(ValueError, match="Missing: 9999"):
+            parse_xml_section(hr1968_119_text, ["3105", "9999"])
+
 
 @respx.mock
 def test_bill_loader_api_error():
@@ -333,3 +1156,773 @@ def test_bill_loader_text_fetch_error():
         ValueError, match=f"Failed to fetch bill text from {formatted_text_url}"
     ):
         bill_loader("hr1-119")
+
+
+def mock_text_versions(formatted_text_url, **kwargs):
+    return respx.get("https://api.congress.gov/v3/bill/119/hr/1/text").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "textVersions": [
+                    {
+                        "date": "2024-05-01",
+                        "formats": [
+                            {"type": "Formatted XML", "url": formatted_text_url}
+                        ],
+                    },
+                ]
+            },
+            **kwargs,
+        )
+    )
+
+
+@respx.mock
+def test_bill_loader_serves_repeat_requests_from_cache():
+    formatted_text_url = "https://some.text.url"
+    api_route = mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(200, text="Full bill text here")
+    )
+
+    first = bill_loader("hr1-119")
+    second = bill_loader("hr1-119")
+
+    assert str(first) == str(second) == "Full bill text here"
+    assert api_route.call_count == 1
+    assert text_route.call_count == 1
+
+
+@respx.mock
+def test_bill_loader_streams_when_cache_disabled(monkeypatch):
+    monkeypatch.setattr("llm_fragments_us_legislation.CACHE_DISABLED", True)
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc></bill>",
+        )
+    )
+
+    fragment = bill_loader("hr1-119:toc")
+    assert "Sec. 1. Short title." in str(fragment)
+    assert fragment.source == formatted_text_url + "#toc"
+
+
+@respx.mock
+def test_bill_loader_cache_does_not_store_api_key(isolated_cache, monkeypatch):
+    monkeypatch.setattr(
+        "llm_fragments_us_legislation.CONGRESS_API_KEY", "secret-api-key"
+    )
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(200, text="Full bill text here")
+    )
+
+    bill_loader("hr1-119")
+
+    for path in isolated_cache.rglob("*"):
+        if path.is_file():
+            assert b"secret-api-key" not in path.read_bytes()
+
+
+@respx.mock
+def test_bill_loader_revalidates_stale_entries(monkeypatch):
+    monkeypatch.setattr("llm_fragments_us_legislation.CACHE_TTL", 0)
+    formatted_text_url = "https://some.text.url"
+    text_versions = {
+        "textVersions": [
+            {
+                "date": "2024-05-01",
+                "formats": [{"type": "Formatted XML", "url": formatted_text_url}],
+            },
+        ]
+    }
+    api_route = respx.get("https://api.congress.gov/v3/bill/119/hr/1/text").mock(
+        side_effect=[
+            httpx.Response(200, json=text_versions, headers={"ETag": '"v1"'}),
+            httpx.Response(304),
+        ]
+    )
+    text_route = respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(200, text="Full bill text here")
+    )
+
+    bill_loader("hr1-119")
+    fragment = bill_loader("hr1-119")
+
+    assert str(fragment) == "Full bill text here"
+    assert api_route.calls[1].request.headers["If-None-Match"] == '"v1"'
+    # Text version URLs are immutable, so the XML is never revalidated
+    assert text_route.call_count == 1
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record (instead of sleeping) every non-zero wait."""
+    waits = []
+    monkeypatch.setattr(time, "sleep", lambda seconds: seconds and waits.append(seconds))
+    return waits
+
+
+@respx.mock
+def test_bill_loader_retries_rate_limited_and_failed_requests(sleeps, trace_records):
+    formatted_text_url = "https://some.text.url"
+    api_route = mock_text_versions(formatted_text_url)
+    api_route.side_effect = [
+        httpx.Response(429, headers={"Retry-After": "7"}),
+        httpx.Response(503),
+        httpx.ConnectTimeout("timed out"),
+        api_route.return_value,
+    ]
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(200, text="Full bill text here")
+    )
+
+    assert str(bill_loader("hr1-119")) == "Full bill text here"
+    assert api_route.call_count == 4
+    assert sleeps[0] == 7
+    (api_get, _) = [r for r in trace_records if r["name"] == "http_get"]
+    assert api_get["attributes"]["retries"] == 3
+
+
+@respx.mock
+def test_bill_loader_gives_up_on_long_retry_after(sleeps):
+    api_route = respx.get("https://api.congress.gov/v3/bill/119/hr/1/text").mock(
+        return_value=httpx.Response(429, headers={"Retry-After": "3600"})
+    )
+
+    with pytest.raises(ValueError, match="429"):
+        bill_loader("hr1-119")
+    assert api_route.call_count == 1
+    assert sleeps == []
+
+
+class _DroppedStream(httpx.SyncByteStream):
+    """A body whose connection drops after its first part."""
+
+    def __init__(self, first_part: bytes):
+        self.first_part = first_part
+
+    def __iter__(self):
+        yield self.first_part
+        raise httpx.ReadError("Connection reset by peer")
+
+
+@respx.mock
+def test_bill_loader_resumes_interrupted_downloads(sleeps):
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    xml_content = "<bill><section><enum>1.</enum><text>One</text></section></bill>"
+    text_route = respx.get(formatted_text_url).mock(
+        side_effect=[
+            httpx.Response(
+                200,
+                headers={"ETag": '"v1"'},
+                stream=_DroppedStream(xml_content[:20].encode()),
+            ),
+            httpx.Response(
+                206,
+                headers={"Content-Range": f"bytes 20-{len(xml_content) - 1}/*"},
+                content=xml_content[20:].encode(),
+            ),
+        ]
+    )
+
+    assert str(bill_loader("hr1-119")) == xml_content
+    resumed = text_route.calls[1].request
+    assert resumed.headers["Range"] == "bytes=20-"
+    assert resumed.headers["If-Range"] == '"v1"'
+
+
+@respx.mock
+def test_bill_loader_retries_streamed_xml_without_cache(sleeps, monkeypatch):
+    monkeypatch.setattr("llm_fragments_us_legislation.CACHE_DISABLED", True)
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    xml_content = (
+        "<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc>"
+        "<section><enum>1.</enum><text>One</text></section></bill>"
+    )
+    text_route = respx.get(formatted_text_url).mock(
+        side_effect=[
+            httpx.Response(503, headers={"Retry-After": "2"}),
+            httpx.Response(
+                200,
+                headers={"ETag": '"v1"'},
+                stream=_DroppedStream(xml_content[:30].encode()),
+            ),
+            httpx.Response(
+                206,
+                headers={"Content-Range": f"bytes 30-{len(xml_content) - 1}/*"},
+                content=xml_content[30:].encode(),
+            ),
+        ]
+    )
+
+    fragment = bill_loader("hr1-119:section-1")
+    assert str(fragment) == parse_xml_section(xml_content, ["1"])
+    assert text_route.call_count == 3
+    assert sleeps[0] == 2
+    assert text_route.calls[2].request.headers["Range"] == "bytes=30-"
+
+
+@respx.mock
+def test_load_bills_retries_failed_requests(sleeps):
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    text_route = respx.get(formatted_text_url).mock(
+        side_effect=[
+            httpx.Response(502),
+            httpx.Response(200, text="Full bill text here"),
+        ]
+    )
+
+    (fragment,) = load_bills(["hr1-119"])
+    assert str(fragment) == "Full bill text here"
+    assert text_route.call_count == 2
+
+
+def test_rate_limiter_is_shared_between_processes(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    url = "https://api.congress.gov/v3/bill/119/hr/1/text"
+    # Separate instances share buckets through the cache, like processes do
+    limiters = [
+        llm_fragments_us_legislation._RateLimiter({"api.congress.gov": 1.0}, burst=2)
+        for _ in range(2)
+    ]
+
+    assert [limiter.reserve(url) for limiter in limiters * 2] == [0, 0, 1, 2]
+    assert limiters[0].reserve("https://www.congress.gov/bill.xml") == 0
+    now += 3
+    assert limiters[1].reserve(url) == 0
+    limiters[0].pause(url, 10)
+    assert limiters[1].reserve(url) == 11
+
+
+@pytest.fixture
+def sidecar(tmp_path, monkeypatch):
+    """A sidecar serving from a thread, which bill_loader is set up to ask."""
+    socket_path = str(tmp_path / "sidecar.sock")
+    server = llm_fragments_us_legislation._sidecar_server(socket_path, 1024 * 1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(llm_fragments_us_legislation, "SIDECAR_SOCKET", socket_path)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@respx.mock
+def test_bill_loader_asks_sidecar_first(sidecar, trace_records):
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200, text="<bill><section><enum>1.</enum><text>One</text></section></bill>"
+        )
+    )
+
+    fragment = bill_loader("hr1-119:text")
+    assert str(fragment) == "SEC. 1.\n  One\n"
+    assert fragment.source == formatted_text_url + "#text"
+    again = bill_loader("HR1-119:text")
+    assert (str(again), again.source) == (str(fragment), fragment.source)
+
+    names = [record["name"] for record in trace_records]
+    assert names.count("sidecar") == 2
+    # Only the first request was loaded, by the sidecar; the second came
+    # from its memory
+    assert names.count("bill_loader") == 1
+
+    with pytest.raises(ValueError, match="Invalid section specification"):
+        bill_loader("hr1-119:bogus")
+
+
+@respx.mock
+def test_bill_loader_without_sidecar_loads_locally(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        llm_fragments_us_legislation, "SIDECAR_SOCKET", str(tmp_path / "missing.sock")
+    )
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(200, text="Full bill text here")
+    )
+
+    assert str(bill_loader("hr1-119")) == "Full bill text here"
+
+
+def test_sidecar_cache_drops_least_recently_used():
+    cache = llm_fragments_us_legislation._SidecarCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("A") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (b"aaaa", None, b"cccc")
+    cache.put("d", b"d" * 11)
+    assert cache.get("d") is None
+    assert cache.size == 8
+
+
+@respx.mock
+def test_billsearch_finds_sections_of_fetched_bills():
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    with open(Path(__file__).parent / "fixtures/hr1-119_text.xml") as f:
+        respx.get(formatted_text_url).mock(
+            return_value=httpx.Response(200, text=f.read())
+        )
+
+    with pytest.raises(ValueError, match="No fetched bills match"):
+        billsearch_loader("medicaid")
+
+    bill_loader("hr1-119:toc")
+    fragments = billsearch_loader('medicaid "community engagement"')
+
+    assert 0 < len(fragments) <= 10
+    top = fragments[0]
+    assert top.source == formatted_text_url + "#section-44141"
+    assert str(top).startswith("hr1-119\nTITLE IV")
+    assert "community engagement" in str(top).lower()
+
+    # Invalid FTS5 syntax falls back to plain words
+    assert billsearch_loader("community engagement (")[0].source == top.source
+
+
+@respx.mock
+def test_billsearch_replaces_sections_of_new_text_versions():
+    mock_text_versions("https://first.version")
+    respx.get("https://first.version").mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><section><enum>1.</enum><text>Old pelican</text></section></bill>",
+        )
+    )
+    bill_loader("hr1-119:text")
+    assert billsearch_loader("pelican")[0].source == "https://first.version#section-1"
+
+    mock_text_versions("https://second.version", headers={"Cache-Control": "no-cache"})
+    respx.get("https://second.version").mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><section><enum>2.</enum><text>New heron</text></section></bill>",
+        )
+    )
+    refresh_bills(["hr1-119:text"])
+
+    assert billsearch_loader("heron")[0].source == "https://second.version#section-2"
+    with pytest.raises(ValueError):
+        billsearch_loader("pelican")
+
+
+@respx.mock
+def test_bill_loader_survives_unavailable_search_index(monkeypatch):
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc></bill>",
+        )
+    )
+    connect = sqlite3.connect
+
+    def connect_without_fts5(path, *args, **kwargs):
+        if str(path).endswith("search.db"):
+            raise sqlite3.OperationalError("no such module: fts5")
+        return connect(path, *args, **kwargs)
+
+    monkeypatch.setattr(sqlite3, "connect", connect_without_fts5)
+
+    assert "Sec. 1. Short title." in str(bill_loader("hr1-119:toc"))
+    (fragment,) = load_bills(["hr1-119:toc"])
+    assert "Sec. 1. Short title." in str(fragment)
+    with pytest.raises(sqlite3.OperationalError, match="fts5"):
+        billsearch_loader("short title")
+
+
+@pytest.fixture
+def trace_records():
+    records = []
+    add_trace_hook(records.append)
+    yield records
+    remove_trace_hook(records.append)
+
+
+@respx.mock
+def test_bill_loader_traces_stages(trace_records, monkeypatch):
+    monkeypatch.setattr(
+        "llm_fragments_us_legislation.CONGRESS_API_KEY", "secret-api-key"
+    )
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    xml = (
+        "<bill><section><enum>1.</enum></section>"
+        "<section><enum>2.</enum><text>Second</text></section></bill>"
+    )
+    respx.get(formatted_text_url).mock(return_value=httpx.Response(200, text=xml))
+
+    bill_loader("hr1-119:section-2")
+
+    by_name = {}
+    for record in trace_records:
+        by_name.setdefault(record["name"], []).append(record)
+    root = by_name["bill_loader"][0]
+    assert root["parent_span_id"] is None
+    assert {r["trace_id"] for r in trace_records} == {root["trace_id"]}
+    assert by_name["fetch_bill_data"][0]["parent_span_id"] == root["span_id"]
+
+    api_get, xml_get = by_name["http_get"]
+    assert "secret-api-key" not in api_get["attributes"]["url"]
+    assert xml_get["attributes"]["cache"] == "miss"
+    assert xml_get["attributes"]["bytes_downloaded"] == len(xml)
+    assert by_name["parse"][0]["attributes"]["sections_scanned"] == 2
+    assert all(r["duration_ms"] >= 0 for r in trace_records)
+
+    trace_records.clear()
+    bill_loader("hr1-119:section-2")
+    (api_get,) = [r for r in trace_records if r["name"] == "http_get"]
+    assert api_get["attributes"]["cache"] == "hit"
+    (content,) = [r for r in trace_records if r["name"] == "fetch_and_parse_content"]
+    assert content["attributes"]["view_cache"] == "hit"
+
+
+@respx.mock
+def test_bill_loader_traces_failed_stage(trace_records):
+    respx.get("https://api.congress.gov/v3/bill/119/hr/1/text").mock(
+        return_value=httpx.Response(500)
+    )
+
+    with pytest.raises(ValueError):
+        bill_loader("hr1-119")
+
+    assert {r["name"]: r["attributes"].get("error") for r in trace_records} == {
+        "http_get": "HTTPStatusError",
+        "fetch_bill_data": "ValueError",
+        "bill_loader": "ValueError",
+    }
+
+
+@respx.mock
+def test_bill_loader_writes_trace_file(tmp_path, monkeypatch):
+    trace_file = tmp_path / "trace.jsonl"
+    monkeypatch.setattr("llm_fragments_us_legislation.TRACE_FILE", str(trace_file))
+    monkeypatch.setattr("llm_fragments_us_legislation.CACHE_DISABLED", True)
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc></bill>",
+        )
+    )
+
+    bill_loader("hr1-119:toc")
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [r["name"] for r in records][-1] == "bill_loader"
+    (parse,) = [r for r in records if r["name"] == "parse"]
+    assert parse["attributes"] == {"mode": "toc", "streamed": True}
+    (content,) = [r for r in records if r["name"] == "fetch_and_parse_content"]
+    assert content["attributes"]["bytes_downloaded"] > 0
+
+
+@respx.mock
+def test_cache_evicts_least_recently_used(isolated_cache, monkeypatch):
+    from llm_fragments_us_legislation import _cached_get
+
+    monkeypatch.setattr("llm_fragments_us_legislation.CACHE_MAX_BYTES", 15)
+    respx.get("https://example.com/a").mock(return_value=httpx.Response(200, text="a" * 10))
+    respx.get("https://example.com/b").mock(return_value=httpx.Response(200, text="b" * 10))
+
+    with httpx.Client() as client:
+        _cached_get(client, "https://example.com/a")
+        _cached_get(client, "https://example.com/b")
+
+    bodies = [p.read_bytes() for p in isolated_cache.rglob("*.body")]
+    assert bodies == [b"b" * 10]
+
+
+def test_cache_concurrent_writes_of_one_entry(isolated_cache):
+    from llm_fragments_us_legislation import _cached_view, _store_view
+
+    text_url = "https://some.text.url"
+    barrier = threading.Barrier(8)
+
+    def store(i):
+        barrier.wait()
+        for _ in range(20):
+            _store_view(text_url, "#toc", str(i) * 1000)
+
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        list(pool.map(store, range(8)))
+
+    view = _cached_view(text_url, "#toc")
+    assert len(view) == 1000 and len(set(view)) == 1
+    assert not list(isolated_cache.rglob("*.tmp"))
+
+
+def test_cache_size_is_tracked_without_walking(isolated_cache, monkeypatch):
+    from llm_fragments_us_legislation import _store_view
+
+    monkeypatch.setattr("llm_fragments_us_legislation.CACHE_MAX_BYTES", 2500)
+    _store_view("https://some.text.url/1", "#toc", "a" * 1000)
+    walks = []
+    real_walk = llm_fragments_us_legislation.os.walk
+    monkeypatch.setattr(
+        "llm_fragments_us_legislation.os.walk",
+        lambda *args: walks.append(args) or real_walk(*args),
+    )
+
+    _store_view("https://some.text.url/1", "#toc", "b" * 1000)
+    _store_view("https://some.text.url/2", "#toc", "c" * 1000)
+    assert walks == []
+    assert len(list(isolated_cache.rglob("*.body"))) == 2
+
+    # The search index counts toward the limit, but is never evicted
+    (isolated_cache / "search.db").write_bytes(b"x" * 1000)
+    _store_view("https://some.text.url/3", "#toc", "d" * 100)
+    assert len(walks) == 1
+    bodies = sorted(p.read_text()[0] for p in isolated_cache.rglob("*.body"))
+    assert bodies == ["c", "d"]
+
+
+@pytest.mark.parametrize(
+    "argument,expected",
+    [
+        ("hr1-119", ["hr1-119"]),
+        ("hr1-hr3-119:toc", ["hr1-119:toc", "hr2-119:toc", "hr3-119:toc"]),
+        ("hr1-119,s5-118:section-1", ["hr1-119:section-1", "s5-118:section-1"]),
+    ],
+)
+def test_expand_bill_arguments(argument, expected):
+    assert expand_bill_arguments(argument) == expected
+
+
+@pytest.mark.parametrize("invalid_input", ["hr5-hr1-119", "hr1-s5-119", "hr1-hr5000-119"])
+def test_expand_bill_arguments_invalid(invalid_input):
+    with pytest.raises(ValueError):
+        expand_bill_arguments(invalid_input)
+
+
+@respx.mock
+def test_load_bills_returns_fragments_in_order():
+    for number in (1, 2, 3):
+        text_url = f"https://some.text.url/{number}"
+        respx.get(f"https://api.congress.gov/v3/bill/119/hr/{number}/text").mock(
+            return_value=httpx.Response(
+                200,
+                json={
+                    "textVersions": [
+                        {
+                            "date": "2024-05-01",
+                            "formats": [{"type": "Formatted XML", "url": text_url}],
+                        },
+                    ]
+                },
+            )
+        )
+        respx.get(text_url).mock(
+            return_value=httpx.Response(200, text=f"Bill {number} text")
+        )
+
+    fragments = load_bills(["hr1-hr3-119"], max_concurrency=2)
+    assert [str(f) for f in fragments] == ["Bill 1 text", "Bill 2 text", "Bill 3 text"]
+    assert fragments[2].source == "https://some.text.url/3#full"
+
+    assert [str(f) for f in bill_loader("hr1-119,hr3-119")] == [
+        "Bill 1 text",
+        "Bill 3 text",
+    ]
+
+
+@respx.mock
+def test_async_bill_loader_parses_off_the_event_loop(monkeypatch):
+    formatted_text_url = "https://some.text.url"
+    mock_text_versions(formatted_text_url)
+    respx.get(formatted_text_url).mock(
+        return_value=httpx.Response(
+            200,
+            text="<bill><toc><toc-entry>Sec. 1. Short title.</toc-entry></toc>"
+            "<section><enum>1.</enum><text>Short title text</text></section></bill>",
+        )
+    )
+    parse_xml_toc = llm_fragments_us_legislation.parse_xml_toc
+    parse_threads = []
+
+    def record_thread(xml_content):
+        parse_threads.append(threading.current_thread())
+        return parse_xml_toc(xml_content)
+
+    monkeypatch.setattr("llm_fragments_us_legislation.parse_xml_toc", record_thread)
+    # Nor do the blocking rate limiter, cache and search index calls
+    blocking_threads = []
+    for name in (
+        "_write_cache_entry",
+        "_read_cache_body",
+        "_record_text_versions",
+        "_register_search_document",
+    ):
+        original = getattr(llm_fragments_us_legislation, name)
+
+        def record(*args, original=original, **kwargs):
+            blocking_threads.append(threading.current_thread())
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(f"llm_fragments_us_legislation.{name}", record)
+    reserve = llm_fragments_us_legislation._rate_limiter.reserve
+    monkeypatch.setattr(
+        llm_fragments_us_legislation._rate_limiter,
+        "reserve",
+        lambda url: blocking_threads.append(threading.current_thread()) or reserve(url),
+    )
+
+    async def main():
+        return await asyncio.gather(
+            async_bill_loader("hr1-119:toc"), async_bill_loader("hr1-119:section-1")
+        )
+
+    toc, section = asyncio.run(main())
+    assert "Sec. 1. Short title." in str(toc)
+    assert toc.source == formatted_text_url + "#toc"
+    assert "Short title text" in str(section)
+    assert parse_threads and threading.main_thread() not in parse_threads
+    assert blocking_threads and threading.main_thread() not in blocking_threads
+
+
+@respx.mock
+def test_load_bills_parses_in_worker_processes(monkeypatch):
+    submitted = []
+    start_methods = []
+
+    class SpyPool(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *args, mp_context=None, **kwargs):
+            start_methods.append(mp_context and mp_context.get_start_method())
+            super().__init__(*args, mp_context=mp_context, **kwargs)
+
+        def submit(self, fn, *args, **kwargs):
+            submitted.append(fn.__name__)
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", SpyPool)
+    for number in (1, 2):
+        text_url = f"https://some.text.url/{number}"
+        respx.get(f"https://api.congress.gov/v3/bill/119/hr/{number}/text").mock(
+            return_value=httpx.Response(
+                200,
+                json={
+                    "textVersions": [
+                        {
+                            "date": "2024-05-01",
+                            "formats": [{"type": "Formatted XML", "url": text_url}],
+                        },
+                    ]
+                },
+            )
+        )
+        respx.get(text_url).mock(
+            return_value=httpx.Response(
+                200,
+                text=f"<bill><toc><toc-entry>Sec. 1. Bill {number}.</toc-entry>"
+                "</toc></bill>",
+            )
+        )
+
+    fragments = load_bills(["hr1-hr2-119:toc"], parse_workers=2)
+
+    assert "Bill 1." in str(fragments[0])
+    assert "Bill 2." in str(fragments[1])
+    assert submitted == ["_parse_content_by_mode", "_parse_content_by_mode"]
+    assert start_methods == ["spawn"]
+
+
+@respx.mock
+def test_load_bills_reports_failures():
+    respx.get("https://api.congress.gov/v3/bill/119/hr/1/text").mock(
+        return_value=httpx.Response(404)
+    )
+
+    with pytest.raises(ValueError, match="Failed to fetch bill hr1-119"):
+        load_bills(["hr1-119"])
+
+
+@respx.mock
+def test_refresh_bills_only_downloads_new_versions():
+    toc_xml = "<bill><toc><toc-entry>Sec. 1. {}.</toc-entry></toc></bill>"
+    api_route = respx.get("https://api.congress.gov/v3/bill/119/hr/1/text")
+    v1_route = respx.get("https://some.text.url/ih").mock(
+        return_value=httpx.Response(200, text=toc_xml.format("Introduced"))
+    )
+    v2_route = respx.get("https://some.text.url/eh").mock(
+        return_value=httpx.Response(200, text=toc_xml.format("Engrossed"))
+    )
+    ih = {
+        "date": "2024-05-01",
+        "type": "Introduced in House",
+        "formats": [{"type": "Formatted XML", "url": "https://some.text.url/ih"}],
+    }
+    eh = {
+        "date": "2024-06-01",
+        "type": "Engrossed in House",
+        "formats": [{"type": "Formatted XML", "url": "https://some.text.url/eh"}],
+    }
+
+    api_route.mock(return_value=httpx.Response(200, json={"textVersions": [ih]}))
+    first = refresh_bills(["hr1-119:toc"])
+    second = refresh_bills(["hr1-119:toc"])
+    assert [v["url"] for v in first["hr1-119:toc"]] == ["https://some.text.url/ih"]
+    assert second == {"hr1-119:toc": []}
+    assert v1_route.call_count == 1
+
+    api_route.mock(return_value=httpx.Response(200, json={"textVersions": [ih, eh]}))
+    third = refresh_bills(["hr1-119:toc"])
+    assert [v["type"] for v in third["hr1-119:toc"]] == ["Engrossed in House"]
+    assert v2_route.call_count == 1
+    assert "Engrossed" in str(bill_loader("hr1-119:toc"))
+    assert v1_route.call_count == v2_route.call_count == 1
+
+
+@respx.mock
+def test_ingest_bulk_data_serves_bills_offline(tmp_path, monkeypatch):
+    monkeypatch.setattr("llm_fragments_us_legislation.CACHE_TTL", 0)
+    # Neither the network nor an API key is needed for ingested bills
+    monkeypatch.setattr("llm_fragments_us_legislation.CONGRESS_API_KEY", None)
+    respx.route().mock(side_effect=httpx.ConnectError("offline"))
+    fixtures = Path(__file__).parent / "fixtures"
+    bulk_zip = tmp_path / "BILLS-119-1-hr.zip"
+    with zipfile.ZipFile(bulk_zip, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.write(fixtures / "hr1-119_text.xml", "BILLS-119hr1eh.xml")
+        archive.write(fixtures / "hr1968-119_text.xml", "BILLS-119hr1968enr.xml")
+        archive.writestr("BILLS-119hres5ih.xml", "<resolution/>")
+    (tmp_path / "loose").mkdir()
+    (tmp_path / "loose" / "BILLS-119hr1ih.xml").write_text(
+        '<bill xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        "<dublinCore><dc:date>2025-05-16</dc:date></dublinCore>"
+        "<section><enum>1.</enum><text>Introduced</text></section></bill>"
+    )
+
+    result = CliRunner().invoke(
+        cli, ["bills", "ingest", str(bulk_zip), str(tmp_path / "loose")]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Ingested 3 text versions of 2 bills" in result.output
+    assert "skipped 1 files" in result.output
+    # The engrossed version (May 22) is the latest one
+    toc = bill_loader("hr1-119:toc")
+    assert toc.source == (
+        "https://www.congress.gov/119/bills/hr1/BILLS-119hr1eh.xml#toc"
+    )
+    assert "Sec. 10001. Thrifty food plan." in str(toc)
+    assert "SEC. 3105" in str(bill_loader("hr1968-119:section-3105"))
+    assert "\n-  Introduced\n" in str(bill_loader("hr1-119:diff-ih..eh"))
+    assert billsearch_loader("thrifty food plan")[0].source.endswith(
+        "BILLS-119hr1eh.xml#section-10001"
+    )
+    (fragment,) = load_bills(["hr1968-119:toc"])
+    assert "Sec. 3105" in str(fragment)
+    with pytest.raises(ValueError, match="Missing CONGRESS_API_KEY"):
+        bill_loader("hr2-119:toc")